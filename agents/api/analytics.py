@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException
+from typing import Optional
+from models.analytics import MoodTrendResponse
+from services.mood_analytics import get_mood_trend
+
+router = APIRouter(prefix="/analytics", tags=["Mood Analytics"])
+
+
+@router.get("/mood-trend", response_model=MoodTrendResponse)
+async def mood_trend(user_id: str, days: int = 90, source: Optional[str] = None):
+    """
+    Mood trend of a user over the last `days` days.
+
+    Served from daily aggregates, so the cost depends on the window, not on
+    the length of the user's history. `source` limits it to diary, face,
+    voice or canvas moods.
+    """
+    try:
+        return await get_mood_trend(user_id, days, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error computing mood trend: {str(e)}"
+        )
@@ -12,7 +12,7 @@ from models.chat import (
     TranslationResponse,
 )
 from middleware.auth import get_current_user
-from config.limiter import limiter
+from config.limiter import limiter, cost_limiter
 
 
 router = APIRouter(prefix="/chat", tags=["Mental Health Assistant"])
@@ -23,6 +23,7 @@ chat_histories = {}
 
 @router.post("/", response_model=ChatResponse)
 @limiter.limit("5/minute")
+@cost_limiter.limit("chat")
 async def chat(request: Request, input: ChatRequest, user = Depends(get_current_user)):
     """
     Chat with the mental health assistant.
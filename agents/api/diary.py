@@ -1,15 +1,33 @@
-from fastapi import APIRouter, Depends, Request, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Request, HTTPException, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional
 from services.diary_pg import (
     DiaryEntry,
     StoredDiaryEntry,
+    DiaryEntryPage,
     MoodAnalysis,
     analyze_diary_entry,
     store_diary_entry,
     search_diary_entries,
+    list_diary_entries,
+    get_diary_entry,
+    wait_for_analysis,
 )
+from services.diary_import import (
+    DiaryImportRequest,
+    DiaryImportStatus,
+    import_entries,
+    get_import_status,
+    parse_ndjson,
+)
+from services.diary_images import image_storage_key
+from services.media_images import MIME_TYPES
+from services.s3_storage_adapter import media_storage
+from services.usage_accounting import BudgetExceededError
 from middleware.auth import get_current_user
-from config.limiter import limiter
+from config.limiter import limiter, cost_limiter
+from config.settings import settings
 
 
 router = APIRouter(prefix="/diary", tags=["Personal Journal with Emotional Knowledge Base"])
@@ -17,31 +35,166 @@ router = APIRouter(prefix="/diary", tags=["Personal Journal with Emotional Knowl
 
 @router.post("/analyze", response_model=MoodAnalysis)
 @limiter.limit("10/minute")
+@cost_limiter.limit("diary")
 async def analyze_diary(request: Request, entry: DiaryEntry, user = Depends(get_current_user)):
     """Analyze a diary entry and return mood analysis."""
     try:
-        return analyze_diary_entry(entry)
+        return await analyze_diary_entry(entry)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in mood analysis: {str(e)}")
 
 
 @router.post("/store", response_model=StoredDiaryEntry)
-async def store_diary(entry: DiaryEntry):
-    """Store a diary entry in AstraDB with mood analysis."""
+@cost_limiter.limit("diary")
+async def store_diary(request: Request, entry: DiaryEntry):
+    """Store a diary entry; mood analysis runs in the background (status "pending")."""
     try:
-        return store_diary_entry(entry)
+        return await store_diary_entry(entry)
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error storing diary entry: {str(e)}"
         )
 
 
+@router.post("/import", response_model=DiaryImportStatus)
+@cost_limiter.limit("diary")
+async def import_diary(
+    request: Request, user_id: Optional[str] = None, import_id: Optional[str] = None
+):
+    """
+    Import many diary entries at once; analysis runs in the background.
+
+    Accepts either a JSON DiaryImportRequest, or an application/x-ndjson stream
+    of {"content", "date", "seq"?, "created_at"?} lines with user_id and
+    import_id as query parameters. Re-send with the same import_id to resume.
+    """
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            if not user_id:
+                raise ValueError("user_id query parameter is required for NDJSON uploads")
+            return await import_entries(user_id, parse_ndjson(request.stream()), import_id)
+        body = DiaryImportRequest.model_validate_json(await request.body())
+        return await import_entries(body.user_id, body.entries, body.import_id or import_id)
+    except BudgetExceededError:
+        raise  # cost_limiter answers 429
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error importing diary entries: {str(e)}"
+        )
+
+
+@router.get("/import/{import_id}", response_model=DiaryImportStatus)
+async def import_progress(import_id: str, user_id: str):
+    """Progress of a bulk import."""
+    status = await get_import_status(import_id, user_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return status
+
+
 @router.get("/search", response_model=List[StoredDiaryEntry])
-async def search_diary(query: str, user_id: str, limit: int = 5):
-    """Search diary entries using semantic search."""
+async def search_diary(query: str, user_id: str, limit: int = 5, mode: str = "auto"):
+    """Search diary entries (auto, vector, keyword or hybrid mode)."""
     try:
-        return search_diary_entries(query, user_id, limit)
+        return await search_diary_entries(query, user_id, limit, mode)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error searching diary entries: {str(e)}"
         )
+
+
+@router.get("/entries", response_model=DiaryEntryPage)
+async def list_entries(
+    user_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_content: bool = True,
+):
+    """List diary entries newest first with cursor-based pagination."""
+    try:
+        return await list_diary_entries(user_id, limit, cursor, include_content)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error listing diary entries: {str(e)}"
+        )
+
+
+@router.get("/entries/{entry_id}", response_model=StoredDiaryEntry)
+async def get_entry(entry_id: str, user_id: str, wait: float = 0):
+    """
+    Get a diary entry and its analysis status.
+
+    With wait > 0 the request is held (long polling) until analysis finishes
+    or wait seconds pass.
+    """
+    try:
+        wait = min(max(wait, 0), settings.DIARY_ANALYSIS_WAIT_TIMEOUT)
+        if wait:
+            entry = await wait_for_analysis(entry_id, user_id, wait)
+        else:
+            entry = await get_diary_entry(entry_id, user_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error retrieving diary entry: {str(e)}"
+        )
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+    return entry
+
+
+@router.get("/entries/{entry_id}/events")
+async def entry_events(entry_id: str, user_id: str):
+    """
+    Server-sent events stream that emits the entry once its analysis finishes.
+
+    Emits an "analysis" event with the entry, or a "timeout" event with its
+    current state if analysis is still pending after the wait timeout.
+    """
+    entry = await get_diary_entry(entry_id, user_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Diary entry not found")
+
+    async def stream():
+        result = entry
+        if result.analysis_status not in ("completed", "failed"):
+            yield ": waiting\n\n"
+            result = await wait_for_analysis(
+                entry_id, user_id, settings.DIARY_ANALYSIS_WAIT_TIMEOUT
+            )
+        event = "analysis" if result.analysis_status in ("completed", "failed") else "timeout"
+        yield f"event: {event}\ndata: {result.model_dump_json()}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/images/{user_id}/{filename}")
+async def get_diary_image(request: Request, user_id: str, filename: str):
+    """Serve an image extracted from diary content. Images are content-addressed and immutable."""
+    key = image_storage_key(user_id, filename)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{filename.split(".")[0]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    image_bytes = await media_storage.get_file(key)
+    if image_bytes is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return Response(
+        content=image_bytes,
+        media_type=MIME_TYPES[filename.rsplit(".", 1)[1]],
+        headers=headers,
+    )
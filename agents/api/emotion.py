@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from typing import Optional
 import io
 import numpy as np
 
@@ -28,7 +29,7 @@ router = APIRouter(prefix="/emotion", tags=["Emotion Detection and Analysis"])
 
 
 @router.post("/detect-face-emotion", response_model=EmotionDetectionResult)
-async def detect_emotion(file: UploadFile = File(...)):
+async def detect_emotion(file: UploadFile = File(...), user_id: Optional[str] = None):
     """
     Analyze facial emotion from uploaded image
     """
@@ -74,6 +75,7 @@ async def detect_emotion(file: UploadFile = File(...)):
             note="Automatically detected from facial expression",
             source="face",
             timestamp=datetime.datetime.now(),
+            user_id=user_id,
         )
         await add_to_emotion_journal(entry)
     except Exception as e:
@@ -83,7 +85,7 @@ async def detect_emotion(file: UploadFile = File(...)):
 
 
 @router.post("/analyze-voice", response_model=EmotionDetectionResult)
-async def analyze_voice_endpoint(file: UploadFile = File(...)):
+async def analyze_voice_endpoint(file: UploadFile = File(...), user_id: Optional[str] = None):
     """
     Analyze voice tone from uploaded audio file
     """
@@ -116,6 +118,7 @@ async def analyze_voice_endpoint(file: UploadFile = File(...)):
                 note="Automatically detected from voice",
                 source="voice",
                 timestamp=datetime.datetime.now(),
+                user_id=user_id,
             )
             await add_to_emotion_journal(entry)
         except Exception as e:
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 import datetime
 from models.emotion import EmotionJournalEntry, EmotionJournalResponse
+from services.mood_analytics import record_mood
 
 # Global variable to store emotion journal entries
 emotion_journal = []
@@ -108,4 +109,7 @@ async def add_to_emotion_journal(entry: EmotionJournalEntry):
     if len(emotion_journal) > 30:
         emotion_journal = emotion_journal[-30:]
 
+    # Persist into the user's daily mood aggregates
+    await record_mood(entry.user_id, entry.source, entry.emotion, entry.score, entry.timestamp)
+
     return entry_dict
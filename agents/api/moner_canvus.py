@@ -3,20 +3,47 @@ Moner Canvus - Mental Health Drawing Canvas
 FastAPI router for handling drawing session analysis and storage
 """
 
-from fastapi import APIRouter, HTTPException, Request
-from typing import Any, List
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel, ValidationError
+from typing import Any, Dict, List, Optional, Type
 import logging
 
 from services.moner_canvus_gemini import (
     MonerCanvusPayload,
+    CompactMonerCanvusPayload,
     AnalysisResponse,
     StoredCanvusSession,
+    CanvusSessionPage,
+    CanvusSearchResult,
+    CanvusTimeline,
+    CanvusEmotionTrajectory,
     analyze_with_gemini,
+    canvas_content_hash,
+    find_cached_analysis,
+    find_recent_analysis,
     store_canvus_session,
+    summarise_session,
     get_user_sessions,
+    get_user_sessions_page,
     get_session_by_id,
+    get_session_timeline,
+    get_session_emotions,
+    search_user_sessions,
 )
-from config.limiter import limiter
+from services.canvas_analysis_cache import CanvasFingerprint, canvas_analysis_cache, metadata_digest
+from services.canvas_upload import (
+    CanvasUploadChunk,
+    CanvasUploadFinalize,
+    CanvasUploadOpen,
+    CanvasUploadStatus,
+    CompactCanvasUploadChunk,
+    canvas_upload_store,
+)
+from services.canvas_images import canvas_image_key
+from services.media_images import MIME_TYPES
+from services.content_dedup import dedup_stats
+from services.s3_storage_adapter import media_storage
+from config.limiter import limiter, cost_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -25,19 +52,127 @@ router = APIRouter(
     tags=["Moner Canvus - Creative Expression Analysis"],
 )
 
+COMPACT_CONTENT_TYPE = "application/vnd.moner-canvus.compact+json"
+
+
+def _inline_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """JSON schema of a model with its $defs inlined (openapi_extra cannot add components)."""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+
+    return resolve(schema)
 
-@router.post("/sessions", response_model=AnalysisResponse)
+
+def _request_body(model: Type[BaseModel], compact_model: Type[BaseModel]) -> Dict[str, Any]:
+    """
+    openapi_extra documenting a body read from the raw request, JSON or
+    compact by content type.
+    """
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": _inline_schema(model)},
+                COMPACT_CONTENT_TYPE: {"schema": _inline_schema(compact_model)},
+            },
+        }
+    }
+
+
+async def _read_payload(request: Request) -> MonerCanvusPayload:
+    """Parse a session body, JSON or compact by content type (400 if invalid)."""
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(COMPACT_CONTENT_TYPE):
+            return CompactMonerCanvusPayload.model_validate_json(body).to_payload()
+        return MonerCanvusPayload.model_validate_json(body)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid session payload: {str(e)}")
+
+
+async def _analyse_session(payload: MonerCanvusPayload, content_hash: str) -> AnalysisResponse:
+    """Analyse (or reuse the analysis of) a session and store it."""
+    user_id = payload.metadata.userId
+    summary, dhash = await summarise_session(payload)
+    fingerprint = (
+        CanvasFingerprint(user_id, metadata_digest(summary), dhash) if dhash is not None else None
+    )
+    
+    async def analyse_and_store():
+        # Identical re-submissions reuse the stored analysis
+        result = await find_cached_analysis(user_id, payload, content_hash)
+        if result is None:
+            # Analyze with Gemini
+            result = await analyze_with_gemini(payload, summary)
+        
+        # Store the session in database
+        stored = await store_canvus_session(user_id, payload, result, content_hash, fingerprint)
+        if stored:
+            logger.info(f"Session stored with ID: {stored.id}")
+        else:
+            logger.warning("Session analyzed but not stored (database unavailable)")
+        return result, stored.id if stored else None
+    
+    if fingerprint is None:
+        result, stored_id = await analyse_and_store()
+    else:
+        # Retries and re-submissions within the window reuse the analysis
+        result, stored_id, cached = await canvas_analysis_cache.run(
+            fingerprint,
+            analyse_and_store,
+            lambda: find_recent_analysis(
+                fingerprint, canvas_analysis_cache.max_distance, canvas_analysis_cache.ttl_seconds
+            ),
+        )
+        if cached:
+            dedup_stats["analyses_skipped"] += 1
+            logger.info(f"Returning cached analysis of stored session {stored_id}")
+    
+    logger.info(
+        f"Analysis complete for session {payload.metadata.sessionId}: "
+        f"tags={result.tags}, highDistress={result.riskFlags.isHighDistress}"
+    )
+    
+    return result.model_copy(
+        update={"sessionId": payload.metadata.sessionId, "storedSessionId": stored_id}
+    )
+
+
+@router.post(
+    "/sessions",
+    response_model=AnalysisResponse,
+    openapi_extra=_request_body(MonerCanvusPayload, CompactMonerCanvusPayload),
+)
 @limiter.limit("10/minute")
-async def create_session(
-    request: Request,
-    payload: MonerCanvusPayload,
-) -> AnalysisResponse:
+@cost_limiter.limit("moner_canvus")
+async def create_session(request: Request) -> AnalysisResponse:
     """
     Analyze a Moner Canvus drawing session and store it.
     
     Receives the drawing image, stroke data, and emotion snapshots,
     then uses Gemini AI to provide emotional insights.
+    
+    The body is a MonerCanvusPayload (application/json), or a
+    CompactMonerCanvusPayload with stroke points packed as base64 int16
+    deltas (application/vnd.moner-canvus.compact+json), which is smaller and
+    parses without a Python object per point.
+    
+    Re-submissions of the same drawing within CANVAS_ANALYSIS_CACHE_SECONDS
+    (client retries) return the earlier analysis and its storedSessionId
+    without another Gemini call or stored session.
+    
+    Long sessions can be sent in chunks while drawing instead (POST /uploads).
     """
+    payload = await _read_payload(request)
     try:
         # Get user ID from payload metadata
         user_id = payload.metadata.userId
@@ -55,27 +190,95 @@ async def create_session(
                 detail="No drawing image provided"
             )
         
-        # Analyze with Gemini
-        result = await analyze_with_gemini(payload)
+        return await _analyse_session(payload, canvas_content_hash(payload))
         
-        # Store the session in database
-        stored = store_canvus_session(user_id, payload, result)
-        if stored:
-            logger.info(f"Session stored with ID: {stored.id}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error analyzing Moner Canvus session: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to analyze drawing: {str(e)}"
+        )
+
+
+@router.post("/uploads", response_model=CanvasUploadStatus)
+@limiter.limit("10/minute")
+async def open_upload(request: Request, body: CanvasUploadOpen) -> CanvasUploadStatus:
+    """
+    Start a chunked upload of a session, for long sessions: append events
+    with POST /uploads/{upload_id}/chunks while drawing, then analyse with
+    POST /uploads/{upload_id}/finalize.
+    """
+    return canvas_upload_store.open(body).status()
+
+
+@router.get("/uploads/{upload_id}", response_model=CanvasUploadStatus)
+async def upload_status(upload_id: str, user_id: str = "anonymous") -> CanvasUploadStatus:
+    """Progress of a chunked upload; resume from next_seq."""
+    upload = canvas_upload_store.get(upload_id, user_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload.status()
+
+
+@router.post(
+    "/uploads/{upload_id}/chunks",
+    response_model=CanvasUploadStatus,
+    openapi_extra=_request_body(CanvasUploadChunk, CompactCanvasUploadChunk),
+)
+@limiter.limit("120/minute")
+async def append_upload_chunk(
+    request: Request, upload_id: str, user_id: str = "anonymous"
+) -> CanvasUploadStatus:
+    """
+    Append a CanvasUploadChunk (application/json) or CompactCanvasUploadChunk
+    (application/vnd.moner-canvus.compact+json) of complete strokes, erases
+    and emotion snapshots. Chunks are numbered from 0; a re-sent chunk is
+    ignored.
+    """
+    upload = canvas_upload_store.get(upload_id, user_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith(COMPACT_CONTENT_TYPE):
+            chunk = CompactCanvasUploadChunk.model_validate_json(body)
         else:
-            logger.warning("Session analyzed but not stored (database unavailable)")
-        
+            chunk = CanvasUploadChunk.model_validate_json(body)
+        canvas_upload_store.add_chunk(upload, chunk)
+    except (ValueError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid upload chunk: {str(e)}")
+    return upload.status()
+
+
+@router.post("/uploads/{upload_id}/finalize", response_model=AnalysisResponse)
+@limiter.limit("10/minute")
+@cost_limiter.limit("moner_canvus")
+async def finalize_upload(
+    request: Request, upload_id: str, body: CanvasUploadFinalize, user_id: str = "anonymous"
+) -> AnalysisResponse:
+    """
+    Finish a chunked upload with the final image and analyse it like
+    POST /sessions. The statistics were computed as the chunks arrived.
+    """
+    upload = canvas_upload_store.get(upload_id, user_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if not body.finalImageBase64:
+        raise HTTPException(status_code=400, detail="No drawing image provided")
+    try:
+        payload, content_hash = upload.to_payload(body)
         logger.info(
-            f"Analysis complete for session {payload.metadata.sessionId}: "
-            f"tags={result.tags}, highDistress={result.riskFlags.isHighDistress}"
+            f"Analyzing uploaded Moner Canvus session: {payload.metadata.sessionId} "
+            f"(user: {user_id}, chunks: {upload.next_seq}, strokes: {upload.strokes.stroke_count}, "
+            f"emotions: {upload.emotions.count})"
         )
-        
+        result = await _analyse_session(payload, content_hash)
+        canvas_upload_store.finish(upload)
         return result
-        
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error analyzing Moner Canvus session: {e}", exc_info=True)
+        logger.error(f"Error analyzing uploaded Moner Canvus session: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Failed to analyze drawing: {str(e)}"
@@ -94,7 +297,7 @@ async def list_sessions(
     Returns sessions sorted by creation date, newest first.
     """
     try:
-        sessions = get_user_sessions(user_id, limit)
+        sessions = await get_user_sessions(user_id, limit)
         logger.info(f"Returning {len(sessions)} sessions for user {user_id}")
         return sessions
         
@@ -106,6 +309,78 @@ async def list_sessions(
         )
 
 
+@router.get("/sessions/page", response_model=CanvusSessionPage)
+async def list_sessions_page(
+    request: Request,
+    user_id: str = "anonymous",
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_image: bool = False,
+) -> CanvusSessionPage:
+    """
+    Get Moner Canvus sessions for a user with cursor-based pagination.
+    
+    Pass the returned next_cursor to fetch the following page. Inline
+    thumbnails are omitted unless include_image is set; full images are
+    served from each session's image_url.
+    """
+    try:
+        return await get_user_sessions_page(user_id, limit, cursor, include_image)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error fetching sessions page: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch sessions: {str(e)}"
+        )
+
+
+@router.get("/search", response_model=List[CanvusSearchResult])
+async def search_sessions(
+    request: Request,
+    q: str,
+    user_id: str = "anonymous",
+    limit: int = 5,
+) -> List[CanvusSearchResult]:
+    """
+    Find a user's drawings by how they felt ("drawings where I felt calm").
+    
+    Matches the query against the embedded analysis of each session, closest
+    first.
+    """
+    try:
+        return await search_user_sessions(user_id, q, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching sessions: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to search sessions: {str(e)}"
+        )
+
+
+@router.get("/timeline", response_model=CanvusTimeline)
+async def session_timeline(
+    request: Request,
+    user_id: str = "anonymous",
+    weeks: int = 12,
+) -> CanvusTimeline:
+    """
+    Weekly summary of a user's sessions: counts, tags, high-distress flags
+    and dominant camera emotions. Weeks without sessions are omitted.
+    """
+    try:
+        return await get_session_timeline(user_id, weeks)
+    except Exception as e:
+        logger.error(f"Error building session timeline: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to build timeline: {str(e)}"
+        )
+
+
 @router.get("/sessions/{session_id}", response_model=StoredCanvusSession)
 async def get_session(
     request: Request,
@@ -116,7 +391,7 @@ async def get_session(
     Get a specific Moner Canvus session by ID.
     """
     try:
-        session = get_session_by_id(session_id, user_id)
+        session = await get_session_by_id(session_id, user_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
         
@@ -132,6 +407,56 @@ async def get_session(
         )
 
 
+@router.get("/sessions/{session_id}/emotions", response_model=CanvusEmotionTrajectory)
+async def get_session_emotion_trajectory(
+    request: Request,
+    session_id: str,
+    user_id: str = "anonymous",
+) -> CanvusEmotionTrajectory:
+    """
+    The session's camera emotions over time, downsampled for plotting.
+    Empty if the camera was not used.
+    """
+    try:
+        trajectory = await get_session_emotions(session_id, user_id)
+        if trajectory is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        return trajectory
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching emotions of session {session_id}: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to fetch session emotions: {str(e)}"
+        )
+
+
+@router.get("/images/{user_id}/{filename}")
+async def get_canvas_image(request: Request, user_id: str, filename: str):
+    """Serve a stored drawing or its thumbnail. Images are content-addressed and immutable."""
+    key = canvas_image_key(user_id, filename)
+    if key is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    etag = f'"{filename.split(".")[0]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    image_bytes = await media_storage.get_file(key)
+    if image_bytes is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    return Response(
+        content=image_bytes,
+        media_type=MIME_TYPES[filename.rsplit(".", 1)[1]],
+        headers=headers,
+    )
+
+
 @router.get("/health")
 async def health_check() -> dict[str, Any]:
     """Health check endpoint for Moner Canvus service."""
@@ -2,12 +2,24 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
 from slowapi import _rate_limit_exceeded_handler
 from utils.logger import logger
 from config.settings import settings
-from config.limiter import limiter
+from config.limiter import limiter, cost_limiter
+from services.database import check_connection, dispose_engines, get_pool_metrics
+from services.diary_pg import analysis_worker, recover_pending_entries
+from services.diary_import import import_worker, recover_imports
+from services.content_dedup import dedup_stats
+from services.canvas_analysis_cache import canvas_analysis_cache
+from services.canvas_upload import canvas_upload_store
+from services.kb_index import knowledge_base_index
+from services.embeddings_adapter import embedding_cache_stats, get_embeddings, warm_up_embeddings
+from services.gemini_client import gemini_client
+from services.image_preprocessing import preprocessing_stats
 from dotenv import load_dotenv
 from api import (
     profiling,
@@ -19,15 +31,46 @@ from api import (
     feedback,
     kyc,
     moner_canvus,
+    analytics,
 )
 import uvicorn
 
 load_dotenv()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown of shared resources."""
+    await check_connection()
+    await asyncio.to_thread(warm_up_embeddings)
+    await gemini_client.start()
+    await analysis_worker.start()
+    await import_worker.start()
+    try:
+        await recover_pending_entries()
+        await recover_imports()
+    except Exception as e:
+        logger.error(f"Failed to re-queue pending diary analyses: {str(e)}")
+    if settings.KB_INDEX_ENABLED:
+        try:
+            await knowledge_base_index.refresh()
+        except Exception as e:
+            logger.error(f"Failed to load knowledge base index, using database search: {str(e)}")
+        knowledge_base_index.start_refresh(settings.KB_INDEX_REFRESH_SECONDS)
+    yield
+    await knowledge_base_index.stop_refresh()
+    get_embeddings().flush()
+    await import_worker.stop()
+    await analysis_worker.stop()
+    await gemini_client.close()
+    await dispose_engines()
+
+
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
     description="An advanced mental health support assistant powered by AI",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -43,6 +86,7 @@ app.add_middleware(
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
+app.middleware("http")(cost_limiter.inject_headers)
 
 # Include routers with prefix
 # app.include_router(test.router, prefix=settings.API_PREFIX)
@@ -55,6 +99,7 @@ app.include_router(emotion.router, prefix=settings.API_PREFIX)
 app.include_router(feedback.router, prefix=settings.API_PREFIX)
 app.include_router(kyc.router, prefix=settings.API_PREFIX)
 app.include_router(moner_canvus.router, prefix=settings.API_PREFIX)
+app.include_router(analytics.router, prefix=settings.API_PREFIX)
 
 
 @app.exception_handler(Exception)
@@ -87,6 +132,43 @@ async def health_check():
     }
 
 
+@app.get("/health/kb")
+async def knowledge_base_health():
+    """In-memory knowledge base index size, version and search latency."""
+    return {
+        "index": knowledge_base_index.stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.get("/health/vision")
+async def vision_health():
+    """Gemini client counters and bytes saved by image preprocessing."""
+    return {
+        "gemini": gemini_client.stats,
+        "image_preprocessing": {
+            **preprocessing_stats,
+            "bytes_saved": preprocessing_stats["bytes_in"] - preprocessing_stats["bytes_out"],
+        },
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.get("/health/db")
+async def database_health():
+    """Database connection pool metrics."""
+    return {
+        "pools": get_pool_metrics(),
+        "diary_analysis_worker": analysis_worker.stats,
+        "diary_import_worker": import_worker.stats,
+        "content_dedup": dedup_stats,
+        "canvas_analysis_cache": canvas_analysis_cache.stats,
+        "canvas_uploads": {**canvas_upload_store.stats, "open": canvas_upload_store.open_count()},
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
 if __name__ == "__main__":
     import os
 
@@ -0,0 +1,108 @@
+"""
+Backfill the diary_entries table from existing vector store rows
+
+Copies diary entries stored only in langchain_pg_embedding metadata into the
+diary_entries table (run `python migrate.py` first). Safe to re-run: rows that
+already exist are skipped.
+
+Usage:
+    python backfill_diary_entries.py [--batch-size 500]
+"""
+
+import argparse
+import html
+import re
+import sys
+from datetime import datetime, timezone
+from sqlalchemy import text
+from services.database import get_sync_engine
+from utils.logger import logger
+
+
+def _parse_created_at(value: str) -> datetime:
+    created_at = datetime.fromisoformat(value)
+    # Legacy rows were written with naive datetime.utcnow()
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+def _plain_text(content: str) -> str:
+    return re.sub(r"\s+", " ", html.unescape(re.sub(r"<[^>]*>", " ", content or ""))).strip()
+
+
+def backfill(batch_size: int) -> int:
+    engine = get_sync_engine()
+    last_id = ""
+    copied = 0
+    scanned = 0
+
+    while True:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT e.id, e.document, e.cmetadata
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = 'diary_entries' AND e.id > :last_id
+                    ORDER BY e.id
+                    LIMIT :batch_size
+                """),
+                {"last_id": last_id, "batch_size": batch_size},
+            ).fetchall()
+
+        if not rows:
+            break
+
+        params = []
+        for row in rows:
+            metadata = row.cmetadata or {}
+            if not metadata.get("user_id") or not metadata.get("created_at"):
+                logger.warning(f"Skipping embedding {row.id}: missing user_id/created_at")
+                continue
+            params.append(
+                {
+                    "id": metadata.get("id", row.id),
+                    "user_id": metadata["user_id"],
+                    "entry_date": metadata.get("date", ""),
+                    "content": metadata.get("content", row.document),
+                    "plain_text": _plain_text(metadata.get("content", row.document)),
+                    "mood": metadata.get("mood"),
+                    "analysis": metadata.get("analysis"),
+                    "confidence": metadata.get("confidence"),
+                    "embedding_id": row.id,
+                    "created_at": _parse_created_at(metadata["created_at"]),
+                }
+            )
+
+        if params:
+            with engine.begin() as conn:
+                result = conn.execute(
+                    text("""
+                        INSERT INTO diary_entries (
+                            id, user_id, entry_date, content, plain_text, mood,
+                            analysis, confidence, embedding_id, created_at
+                        )
+                        VALUES (
+                            :id, :user_id, :entry_date, :content, :plain_text, :mood,
+                            :analysis, :confidence, :embedding_id, :created_at
+                        )
+                        ON CONFLICT (id) DO NOTHING
+                    """),
+                    params,
+                )
+                copied += max(result.rowcount, 0)
+
+        scanned += len(rows)
+        last_id = rows[-1].id
+        logger.info(f"Backfill progress: scanned={scanned}, copied={copied}")
+
+    logger.info(f"Backfill complete: scanned={scanned}, copied={copied}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill diary_entries from vector metadata")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    sys.exit(backfill(args.batch_size))
@@ -0,0 +1,134 @@
+"""
+Size and parse time of the JSON vs compact Moner Canvus payloads
+
+Builds synthetic sessions of increasing point counts and, for each format,
+reports the body size (raw and gzip) and the time to go from request bytes to
+the StrokeArrays used by the stroke analytics:
+- json:    MonerCanvusPayload.model_validate_json + StrokeArrays.from_strokes
+- compact: CompactMonerCanvusPayload.model_validate_json + to_payload (decode)
+
+Before the timings it checks that an edge-case stroke survives the compact
+round trip (see check_round_trip). No database or API keys are needed.
+
+Usage (from the agents directory):
+    python -m benchmarks.canvas_payload_benchmark [--points 10000 100000 300000] [--repeat 5]
+"""
+
+import argparse
+import gzip
+import json
+import time
+import numpy as np
+from services.moner_canvus_gemini import CompactMonerCanvusPayload, MonerCanvusPayload
+from services.stroke_encoding import encode_strokes
+
+POINTS_PER_STROKE = 150
+
+
+def _session(points: int, rng):
+    strokes = []
+    t = 0.0
+    for i in range(max(1, points // POINTS_PER_STROKE)):
+        xy = np.cumsum(rng.normal(0, 2.5, (POINTS_PER_STROKE, 2)), axis=0) + rng.uniform((50, 50), (850, 500))
+        times = t + np.cumsum(rng.uniform(8, 17, POINTS_PER_STROKE))
+        strokes.append({
+            "id": f"stroke-{i}",
+            "tool": "eraser" if i % 12 == 0 else "pen",
+            "color": "#1f2937",
+            "width": 4,
+            "points": [
+                {"x": round(float(x), 2), "y": round(float(y), 2), "t": round(float(pt), 1)}
+                for (x, y), pt in zip(xy, times)
+            ],
+            "createdAt": round(float(times[0]), 1),
+        })
+        t = float(times[-1]) + rng.uniform(200, 2000)
+    return {
+        "metadata": {
+            "userId": "benchmark", "sessionId": "benchmark", "startedAt": "", "endedAt": "",
+            "durationMs": t, "usedCamera": False, "clientVersion": "benchmark",
+        },
+        "strokes": strokes,
+        "erases": [],
+        "emotions": [],
+        "finalImageBase64": "data:image/png;base64,",
+    }
+
+
+def _time(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def check_round_trip() -> None:
+    """
+    A stroke far from the origin with an in-stroke pause longer than one
+    int16 step: only the point after the pause may be off, by the clamped
+    remainder, and every later point decodes exactly again.
+    """
+    points = [{"x": 4000.0 + i, "y": 3000.0 - i, "t": 1000.0 + 10 * i} for i in range(10)]
+    points += [{"x": 10.0 + i, "y": 20.0, "t": 41000.0 + 10 * i} for i in range(10)]
+    stroke = {"id": "edge", "tool": "pen", "color": "#000", "width": 2, "points": points, "createdAt": 1000.0}
+    session = _session(POINTS_PER_STROKE, np.random.default_rng(7))
+    session["strokes"] = [stroke]
+    parsed = MonerCanvusPayload.model_validate_json(json.dumps(session))
+    headers, packed = encode_strokes(parsed.strokes)
+    body = json.dumps({**session, "strokes": headers, "points": packed})
+
+    a = parsed.stroke_arrays()
+    b = CompactMonerCanvusPayload.model_validate_json(body).to_payload().stroke_arrays()
+    xy_error = np.abs(a.xy - b.xy).max(axis=1)
+    t_error = np.abs(a.t - b.t)
+    assert xy_error[:10].max() < 0.051 and t_error[:10].max() < 0.51, "points before the jump drifted"
+    assert xy_error[11:].max() < 0.051 and t_error[11:].max() < 0.51, "clamped step was not carried over"
+    print(
+        f"round trip ok: x0=4000 px and a 40 s pause; point after the pause off by "
+        f"{xy_error[10]:.1f} px, {t_error[10]:.0f} ms, later points exact"
+    )
+
+
+def run(point_counts, repeat: int) -> None:
+    check_round_trip()
+    rng = np.random.default_rng(7)
+    print(f"{'points':>8} {'format':8} {'bytes':>11} {'gzip':>10} {'parse ms':>9}")
+    for points in point_counts:
+        session = _session(points, rng)
+        json_body = json.dumps(session, separators=(",", ":")).encode()
+
+        parsed = MonerCanvusPayload.model_validate_json(json_body)
+        headers, packed = encode_strokes(parsed.strokes)
+        compact_body = json.dumps(
+            {**session, "strokes": headers, "points": packed}, separators=(",", ":")
+        ).encode()
+
+        def parse_json():
+            MonerCanvusPayload.model_validate_json(json_body).stroke_arrays()
+
+        def parse_compact():
+            CompactMonerCanvusPayload.model_validate_json(compact_body).to_payload().stroke_arrays()
+
+        for name, body, parse in (("json", json_body, parse_json), ("compact", compact_body, parse_compact)):
+            print(
+                f"{points:>8} {name:8} {len(body):>11,} {len(gzip.compress(body, 6)):>10,} "
+                f"{_time(parse, repeat):>9.1f}"
+            )
+
+        # Round trip: compact decoding matches the JSON points within quantisation
+        a = parsed.stroke_arrays()
+        b = CompactMonerCanvusPayload.model_validate_json(compact_body).to_payload().stroke_arrays()
+        print(
+            f"{'':>8} max error: xy {np.abs(a.xy - b.xy).max():.3f} px, "
+            f"t {np.abs(a.t - b.t).max():.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON vs compact canvas payload benchmark")
+    parser.add_argument("--points", type=int, nargs="+", default=[10000, 100000, 300000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.points, args.repeat)
@@ -0,0 +1,113 @@
+"""
+Peak memory and finalisation time of one-body vs chunked canvas uploads
+
+Builds synthetic sessions of increasing point counts (with 4 emotion
+snapshots per second) and, for each way of sending them, reports the peak
+Python heap (tracemalloc) and the time spent on the summary once the session
+is complete:
+- body:    MonerCanvusPayload.model_validate_json of the whole session +
+           compute_summary_statistics
+- chunked: CanvasUploadChunk.model_validate_json + CanvasUpload.add per chunk
+           of --chunk-strokes strokes, then to_payload (summary from the
+           accumulated state)
+
+The image analysis and Gemini call, identical for both, are not included.
+No database or API keys are needed.
+
+Usage (from the agents directory):
+    python -m benchmarks.canvas_upload_benchmark [--points 100000 500000] [--chunk-strokes 20]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+import numpy as np
+from benchmarks.canvas_payload_benchmark import _session
+from services.canvas_upload import CanvasUpload, CanvasUploadChunk, CanvasUploadFinalize, CanvasUploadOpen
+from services.moner_canvus_gemini import MonerCanvusPayload, compute_summary_statistics
+
+
+def _with_emotions(session, rng):
+    duration = session["metadata"]["durationMs"]
+    names = ("neutral", "happy", "sad", "angry", "fearful", "disgusted", "surprised")
+    session["metadata"]["usedCamera"] = True
+    session["emotions"] = [
+        {"t": round(float(t), 1), "emotions": dict(zip(names, np.round(rng.dirichlet(np.ones(7)), 4).tolist()))}
+        for t in np.arange(0, duration, 250.0)
+    ]
+    return session
+
+
+def _measure(fn):
+    """
+    (result, peak MiB, finalise ms) of fn, which returns (result, finalise ms).
+    Timed in a second, untraced run: tracemalloc slows allocations down.
+    """
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+    tracemalloc.stop()
+    result, final_ms = fn()
+    return result, peak, final_ms
+
+
+def run(point_counts, chunk_strokes: int) -> None:
+    rng = np.random.default_rng(11)
+    print(f"{'points':>8} {'upload':8} {'max body':>12} {'peak MiB':>9} {'finalise ms':>12}")
+    for points in point_counts:
+        session = _with_emotions(_session(points, rng), rng)
+        body = json.dumps(session, separators=(",", ":")).encode()
+
+        # Chunk bodies as a client would send them while drawing
+        strokes = session["strokes"]
+        emotions = session["emotions"]
+        chunks = []
+        for seq, lo in enumerate(range(0, len(strokes), chunk_strokes)):
+            batch = strokes[lo:lo + chunk_strokes]
+            until = strokes[lo + chunk_strokes]["createdAt"] if lo + chunk_strokes < len(strokes) else float("inf")
+            since = batch[0]["createdAt"] if lo else 0.0
+            chunks.append(
+                json.dumps(
+                    {"seq": seq, "strokes": batch, "emotions": [e for e in emotions if since <= e["t"] < until]},
+                    separators=(",", ":"),
+                ).encode()
+            )
+        finalize = CanvasUploadFinalize(endedAt="", durationMs=session["metadata"]["durationMs"], finalImageBase64="")
+        del session, strokes, emotions
+
+        def one_body():
+            payload = MonerCanvusPayload.model_validate_json(body)
+            started = time.perf_counter()
+            summary = compute_summary_statistics(payload)
+            return summary, (time.perf_counter() - started) * 1000
+
+        def chunked():
+            upload = CanvasUpload(
+                "benchmark",
+                CanvasUploadOpen(userId="benchmark", sessionId="benchmark", startedAt="", clientVersion="benchmark"),
+            )
+            for chunk in chunks:
+                upload.add(CanvasUploadChunk.model_validate_json(chunk))
+            started = time.perf_counter()
+            payload, _ = upload.to_payload(finalize)
+            summary = compute_summary_statistics(payload)
+            return summary, (time.perf_counter() - started) * 1000
+
+        # The request bodies themselves are not counted: one is held either way
+        results = []
+        for name, size, fn in (("body", len(body), one_body), ("chunked", max(map(len, chunks)), chunked)):
+            summary, peak, final_ms = _measure(fn)
+            results.append(summary)
+            print(f"{points:>8} {name:8} {size:>12,} {peak:>9.1f} {final_ms:>12.1f}")
+
+        exact, accumulated = (r["strokeDynamics"]["velocityPxPerSec"]["median"] for r in results)
+        print(f"{'':>8} median velocity: {exact} exact, {accumulated} accumulated")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One-body vs chunked canvas upload benchmark")
+    parser.add_argument("--points", type=int, nargs="+", default=[100000, 500000])
+    parser.add_argument("--chunk-strokes", type=int, default=20)
+    args = parser.parse_args()
+    run(args.points, args.chunk_strokes)
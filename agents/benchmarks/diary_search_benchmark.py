@@ -0,0 +1,67 @@
+"""
+Latency and recall comparison of diary search modes
+
+Runs every query of a labelled query set through each search mode and reports
+p50/p95 latency, recall@k against the labelled relevant entries, and how many
+embedding calls each mode needed.
+
+Query set format (JSON list):
+    [{"user_id": "...", "query": "dhaka trip", "relevant_ids": ["<entry id>", ...]}]
+
+Usage (from the agents directory):
+    python -m benchmarks.diary_search_benchmark queries.json [--k 5] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from services import diary_pg
+from services.database import dispose_engines
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(queries, k: int, repeat: int):
+    print(f"{'mode':8} {'p50 ms':>8} {'p95 ms':>8} {'recall@k':>9} {'embeds':>7}")
+    for mode in ("vector", "keyword", "hybrid", "auto"):
+        latencies = []
+        recalls = []
+        embeds_before = diary_pg.search_stats["vector_searches"]
+
+        for item in queries:
+            relevant = set(item.get("relevant_ids", []))
+            for _ in range(repeat):
+                started = time.perf_counter()
+                entries = await diary_pg.search_diary_entries(
+                    item["query"], item["user_id"], limit=k, mode=mode
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+            if relevant:
+                found = {entry.id for entry in entries}
+                recalls.append(len(found & relevant) / min(len(relevant), k))
+
+        embeds = diary_pg.search_stats["vector_searches"] - embeds_before
+        recall = statistics.mean(recalls) if recalls else float("nan")
+        print(
+            f"{mode:8} {_percentile(latencies, 50):8.1f} {_percentile(latencies, 95):8.1f} "
+            f"{recall:9.3f} {embeds:7d}"
+        )
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare diary search modes")
+    parser.add_argument("queries", help="Path to the labelled query set (JSON)")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.queries, encoding="utf-8") as f:
+        query_set = json.load(f)
+    asyncio.run(run(query_set, args.k, args.repeat))
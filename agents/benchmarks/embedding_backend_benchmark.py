@@ -0,0 +1,100 @@
+"""
+Latency and throughput of the embedding backends
+
+Compares the backends of services/embeddings_adapter.py (uncached) on mixed
+English and Bangla texts:
+- single query latency (p50/p95, sequential calls)
+- concurrent query throughput (asyncio.gather, exercises dynamic batching)
+- document batch throughput (embed_documents)
+- for local backends, mean cosine similarity to the first backend's vectors,
+  showing how closely int8 ONNX tracks the PyTorch model
+
+Usage (from the agents directory):
+    python -m benchmarks.embedding_backend_benchmark [--backends onnx huggingface cohere]
+        [--queries 50] [--concurrency 64] [--batch 96]
+"""
+
+import argparse
+import asyncio
+import time
+import numpy as np
+from services.embeddings_adapter import create_embeddings
+
+SAMPLE_TEXTS = [
+    "I can't sleep and keep worrying about tomorrow.",
+    "আজকে আমার খুব একা লাগছে, কারো সাথে কথা বলতে ইচ্ছে করছে না।",
+    "breathing exercises for panic attacks",
+    "পরীক্ষার আগে দুশ্চিন্তা কমানোর উপায়",
+    "Today was a good day, I went for a walk with my sister.",
+    "মাথা ব্যথা আর ক্লান্তি, কাজে মন বসছে না",
+    "how to support a friend with depression",
+    "anxiety",
+]
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _texts(count: int):
+    return [f"{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]} ({i})" for i in range(count)]
+
+
+async def bench(name: str, queries: int, concurrency: int, batch: int, reference):
+    model, _, _ = create_embeddings(name)
+    if hasattr(model, "warm_up"):
+        model.warm_up()
+    else:
+        model.embed_query("warm up")
+
+    latencies = []
+    for text in _texts(queries):
+        started = time.perf_counter()
+        model.embed_query(text)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(model.aembed_query(t) for t in _texts(concurrency)))
+    concurrent_qps = concurrency / (time.perf_counter() - started)
+
+    documents = _texts(batch)
+    started = time.perf_counter()
+    vectors = np.array(model.embed_documents(documents), dtype=np.float32)
+    batch_tps = batch / (time.perf_counter() - started)
+
+    agreement = ""
+    if reference is not None and reference.shape == vectors.shape:
+        a = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        b = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+        agreement = f"{float(np.mean(np.sum(a * b, axis=1))):.4f}"
+
+    print(
+        f"{name:12} {_percentile(latencies, 50):8.1f} {_percentile(latencies, 95):8.1f} "
+        f"{concurrent_qps:10.1f} {batch_tps:10.1f} {agreement:>9}"
+    )
+    return vectors
+
+
+async def run(backends, queries: int, concurrency: int, batch: int):
+    print(f"{'backend':12} {'p50 ms':>8} {'p95 ms':>8} {'conc q/s':>10} {'batch t/s':>10} {'cos vs 1st':>9}")
+    reference = None
+    for name in backends:
+        try:
+            vectors = await bench(name, queries, concurrency, batch, reference)
+        except Exception as e:
+            print(f"{name:12} unavailable: {e}")
+            continue
+        if reference is None:
+            reference = vectors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare embedding backends")
+    parser.add_argument("--backends", nargs="+", default=["huggingface", "onnx", "cohere"])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--batch", type=int, default=96)
+    args = parser.parse_args()
+    asyncio.run(run(args.backends, args.queries, args.concurrency, args.batch))
@@ -0,0 +1,107 @@
+"""
+Bytes and latency saved by preprocessing canvas images for Gemini
+
+Renders synthetic Moner Canvus exports (1800x1100 PNG on white, like the
+client's toDataURL with multiplier 2) with sparse, medium and dense drawings
+and reports, for the raw PNG and the GEMINI_CANVAS_BUDGET output:
+- bytes and dimensions
+- approximate Gemini image tokens (258 per 768x768 tile)
+- preprocessing time (best of 3) and estimated upload time at --uplink-mbps
+
+With --gemini (and GEMINI_API_KEY set) each image is also sent to Gemini both
+ways and the measured round trip is reported.
+
+Usage (from the agents directory):
+    python -m benchmarks.image_preprocessing_benchmark [--uplink-mbps 10] [--gemini]
+"""
+
+import argparse
+import asyncio
+import io
+import math
+import time
+import numpy as np
+from PIL import Image, ImageDraw
+from services.image_preprocessing import GEMINI_CANVAS_BUDGET, prepare_image
+
+CANVAS = (1800, 1100)
+DRAWINGS = {"sparse": (6, 0.35), "medium": (40, 0.6), "dense": (250, 0.95)}
+
+
+def _render(strokes: int, extent: float, rng) -> bytes:
+    image = Image.new("RGBA", CANVAS, (255, 255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    centre = np.array(CANVAS) / 2
+    span = np.array(CANVAS) * extent / 2
+    for _ in range(strokes):
+        start = rng.uniform(centre - span, centre + span)
+        path = start + np.cumsum(rng.normal(0, 6, (120, 2)), axis=0)
+        colour = tuple(int(c) for c in rng.integers(0, 200, 3)) + (255,)
+        draw.line([tuple(p) for p in path], fill=colour, width=int(rng.integers(4, 16)), joint="curve")
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def _tokens(width: int, height: int) -> int:
+    if width <= 384 and height <= 384:
+        return 258
+    return 258 * math.ceil(width / 768) * math.ceil(height / 768)
+
+
+async def _gemini_ms(images) -> list:
+    """Round trip of one Gemini call per (data, mime type), sequentially."""
+    from google.genai import types
+    from services.gemini_client import gemini_client
+
+    timings = []
+    for data, mime_type in images:
+        started = time.perf_counter()
+        await gemini_client.generate_content(
+            contents=[
+                types.Content(
+                    parts=[
+                        types.Part.from_bytes(data=data, mime_type=mime_type),
+                        types.Part.from_text(text="Describe this drawing in one sentence."),
+                    ]
+                )
+            ]
+        )
+        timings.append((time.perf_counter() - started) * 1000)
+    await gemini_client.close()
+    return timings
+
+
+def run(uplink_mbps: float, use_gemini: bool) -> None:
+    rng = np.random.default_rng(3)
+    rows = []
+    for name, (strokes, extent) in DRAWINGS.items():
+        png = _render(strokes, extent, rng)
+        prepared = min((prepare_image(png, GEMINI_CANVAS_BUDGET) for _ in range(3)), key=lambda p: p.elapsed_ms)
+        rows.append((name, "raw png", png, "image/png", CANVAS, 0.0))
+        rows.append(
+            (name, "prepared", prepared.data, prepared.mime_type, (prepared.width, prepared.height), prepared.elapsed_ms)
+        )
+    gemini_ms = asyncio.run(_gemini_ms([(row[2], row[3]) for row in rows])) if use_gemini else []
+
+    print(
+        f"{'drawing':8} {'variant':9} {'size':>10} {'bytes':>10} {'tokens':>7} "
+        f"{'prep ms':>8} {'upload ms':>10}" + (f" {'gemini ms':>10}" if use_gemini else "")
+    )
+    for i, (name, variant, data, mime_type, (width, height), prep_ms) in enumerate(rows):
+        upload_ms = len(data) * 8 / (uplink_mbps * 1e6) * 1000
+        line = (
+            f"{name:8} {variant:9} {f'{width}x{height}':>10} {len(data):>10,} "
+            f"{_tokens(width, height):>7} {prep_ms:>8.1f} {upload_ms:>10.1f}"
+        )
+        if use_gemini:
+            line += f" {gemini_ms[i]:>10.0f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Canvas image preprocessing benchmark")
+    parser.add_argument("--uplink-mbps", type=float, default=10.0)
+    parser.add_argument("--gemini", action="store_true", help="Also time real Gemini calls")
+    args = parser.parse_args()
+    run(args.uplink_mbps, args.gemini)
@@ -0,0 +1,164 @@
+"""
+Recall vs latency of HNSW search at different table sizes
+
+For each size, fills a scratch table with random unit vectors spread over a
+number of users, builds an HNSW index like manage_vector_indexes.py does, and
+compares index search against exact search (index scans disabled) for a
+range of ef_search values, both unfiltered and filtered to one user with and
+without iterative scans.
+
+Reports p50/p95 latency and recall@k against the exact result. The scratch
+table is dropped afterwards unless --keep is given.
+
+Usage (from the agents directory; 1M rows needs a few GB of disk):
+    python -m benchmarks.vector_index_benchmark [--sizes 10000 100000 1000000]
+        [--dim 1024] [--users 1000] [--queries 50] [--k 10]
+"""
+
+import argparse
+import io
+import time
+import numpy as np
+from sqlalchemy import text
+from services.database import get_sync_engine
+
+TABLE = "vector_index_benchmark"
+EF_SEARCH_VALUES = (20, 40, 80, 160, 320)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _vector_literal(vector) -> str:
+    return "[" + ",".join(f"{x:.6f}" for x in vector) + "]"
+
+
+def _random_unit_vectors(rng, count: int, dim: int) -> np.ndarray:
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def _load(conn, size: int, dim: int, users: int, rng, batch: int = 20000) -> None:
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(
+        text(f"CREATE TABLE {TABLE} (id BIGINT PRIMARY KEY, user_id VARCHAR, embedding vector({dim}))")
+    )
+    raw = conn.connection.dbapi_connection
+    with raw.cursor() as cursor:
+        for start in range(0, size, batch):
+            count = min(batch, size - start)
+            vectors = _random_unit_vectors(rng, count, dim)
+            owners = rng.integers(0, users, count)
+            buffer = io.StringIO()
+            for i in range(count):
+                buffer.write(f"{start + i}\tuser-{owners[i]}\t{_vector_literal(vectors[i])}\n")
+            buffer.seek(0)
+            cursor.copy_expert(f"COPY {TABLE} (id, user_id, embedding) FROM STDIN", buffer)
+    raw.commit()
+    conn.execute(text(f"CREATE INDEX ON {TABLE} (user_id)"))
+
+
+def _build_index(conn, m: int, ef_construction: int) -> float:
+    started = time.perf_counter()
+    conn.execute(text("SET maintenance_work_mem = '1GB'"))
+    conn.execute(
+        text(f"""
+            CREATE INDEX {TABLE}_hnsw ON {TABLE}
+            USING hnsw (embedding vector_cosine_ops)
+            WITH (m = {m}, ef_construction = {ef_construction})
+        """)
+    )
+    conn.execute(text(f"ANALYZE {TABLE}"))
+    return time.perf_counter() - started
+
+
+def _search(conn, query: str, k: int, user_id=None):
+    where = "WHERE user_id = :user_id" if user_id else ""
+    started = time.perf_counter()
+    rows = conn.execute(
+        text(f"""
+            SELECT id FROM {TABLE} {where}
+            ORDER BY embedding <=> CAST(:query AS vector)
+            LIMIT :k
+        """),
+        {"query": query, "k": k, "user_id": user_id},
+    ).fetchall()
+    return [row.id for row in rows], (time.perf_counter() - started) * 1000
+
+
+def _exact(conn, queries, k: int, users):
+    conn.execute(text("SET enable_indexscan = off"))
+    results = [
+        _search(conn, query, k, user_id)[0] for query, user_id in zip(queries, users)
+    ]
+    conn.execute(text("RESET enable_indexscan"))
+    return results
+
+
+def _measure(conn, queries, truth, k: int, users, label: str, ef_search: int):
+    latencies, recalls = [], []
+    conn.execute(text(f"SET hnsw.ef_search = {ef_search}"))
+    for query, user_id, expected in zip(queries, users, truth):
+        found, elapsed = _search(conn, query, k, user_id)
+        latencies.append(elapsed)
+        if expected:
+            recalls.append(len(set(found) & set(expected)) / len(expected))
+    recall = float(np.mean(recalls)) if recalls else float("nan")
+    print(
+        f"  {label:22} ef={ef_search:<4} p50 {_percentile(latencies, 50):7.2f} ms  "
+        f"p95 {_percentile(latencies, 95):7.2f} ms  recall@{k} {recall:.3f}"
+    )
+
+
+def run(sizes, dim: int, users: int, query_count: int, k: int, m: int,
+        ef_construction: int, keep: bool) -> None:
+    rng = np.random.default_rng(42)
+    engine = get_sync_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for size in sizes:
+            print(f"\n{size} rows, dim {dim}, {users} users")
+            started = time.perf_counter()
+            _load(conn, size, dim, users, rng)
+            print(f"  loaded in {time.perf_counter() - started:.1f}s")
+            print(f"  index built in {_build_index(conn, m, ef_construction):.1f}s")
+
+            queries = [_vector_literal(v) for v in _random_unit_vectors(rng, query_count, dim)]
+            no_user = [None] * query_count
+            some_user = [f"user-{u}" for u in rng.integers(0, users, query_count)]
+
+            truth = _exact(conn, queries, k, no_user)
+            truth_user = _exact(conn, queries, k, some_user)
+
+            for ef_search in EF_SEARCH_VALUES:
+                _measure(conn, queries, truth, k, no_user, "unfiltered", ef_search)
+            for scan in ("off", "relaxed_order"):
+                try:
+                    conn.execute(text(f"SET hnsw.iterative_scan = {scan}"))
+                except Exception:
+                    print("  (pgvector < 0.8: iterative scans unavailable)")
+                    break
+                for ef_search in EF_SEARCH_VALUES:
+                    _measure(conn, queries, truth_user, k, some_user,
+                             f"per-user, scan={scan}", ef_search)
+
+            if not keep:
+                conn.execute(text(f"DROP TABLE {TABLE}"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HNSW recall/latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", type=int, default=16)
+    parser.add_argument("--ef-construction", type=int, default=64)
+    parser.add_argument("--keep", action="store_true", help="Keep the last scratch table")
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.users, args.queries, args.k, args.m,
+        args.ef_construction, args.keep)
@@ -1,5 +1,12 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from config.settings import settings
+from middleware.cost_limiter import CostLimiter
 
 # Use RedisStorage("redis://localhost:6379") for production
 limiter = Limiter(key_func=get_remote_address)
+
+# Charges users by the LLM tokens and tool calls their requests consume
+cost_limiter = CostLimiter(
+    budgets=settings.COST_BUDGETS, enabled=settings.COST_LIMIT_ENABLED
+)
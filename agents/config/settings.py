@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 
@@ -33,6 +33,33 @@ class Settings(BaseSettings):
             return v.replace("postgres://", "postgresql://", 1)
         return v
 
+    # Connection pool (shared by all services, per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 5
+    DB_POOL_TIMEOUT: int = 30  # seconds
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_STATEMENT_CACHE_SIZE: int = 256
+
+    # pgvector HNSW indexes (created by manage_vector_indexes.py)
+    EMBEDDING_DIMENSION: int = 1024  # Cohere embed-multilingual-v3.0
+    VECTOR_HNSW_M: int = 16
+    VECTOR_HNSW_EF_CONSTRUCTION: int = 64
+    VECTOR_EF_SEARCH: int = 40  # Candidate list per search; higher = better recall, slower
+    # pgvector >= 0.8: keep scanning until filtered (per-user) results fill k; "off" disables
+    VECTOR_ITERATIVE_SCAN: str = "relaxed_order"
+    VECTOR_MAX_SCAN_TUPLES: int = 20000  # Upper bound for iterative scans
+    KB_SEARCH_K: int = 3  # Knowledge base passages per query
+
+    # In-memory knowledge base index (services/kb_index.py)
+    KB_INDEX_ENABLED: bool = True
+    KB_INDEX_QUANTIZE: bool = False  # int8 vectors: 4x smaller, approximate scores
+    KB_INDEX_REFRESH_SECONDS: int = 300  # How often the collection version is re-checked
+
+    # Knowledge base ingestion (setup_vector_store.py)
+    KB_SOURCE_DIR: str = "knowledge_base"  # Markdown, text, HTML and PDF sources
+    KB_CHUNK_SIZE: int = 1000  # Characters per chunk
+    KB_CHUNK_OVERLAP: int = 150
+
     GROQ_API_KEY: str
     TAVILY_API_KEY: str
 
@@ -46,10 +73,38 @@ class Settings(BaseSettings):
 
     # Google Gemini API for Moner Canvus analysis
     GEMINI_API_KEY: str = ""
+    GEMINI_MODEL: str = "gemini-2.5-flash"
+    GEMINI_TIMEOUT_SECONDS: float = 60.0  # Per attempt
+    GEMINI_MAX_CONCURRENCY: int = 4  # Analyses in flight per worker process
+    GEMINI_MAX_ATTEMPTS: int = 3
+    GEMINI_RETRY_DELAY: float = 1.0  # Seconds, doubled per attempt
+    CANVAS_THUMBNAIL_SIZE: int = 128  # Max thumbnail side in pixels
+    CANVAS_THUMBNAIL_QUALITY: int = 70  # WebP quality
+    GEMINI_IMAGE_MAX_SIDE: int = 768  # Drawings are trimmed and resized to fit before analysis
+    GEMINI_IMAGE_QUALITY: int = 80  # WebP quality of images sent to Gemini
+    REKOGNITION_IMAGE_MAX_SIDE: int = 1280
+    CANVAS_MIN_INK_COVERAGE: float = 0.002  # Below this a canvas counts as empty and skips Gemini
+    CANVAS_ANALYSIS_CACHE_SECONDS: int = 600  # Re-submissions within this window reuse the analysis
+    CANVAS_DHASH_MAX_DISTANCE: int = 4  # Bits of the 64-bit image hash that may differ
+    CANVAS_SEARCH_MAX_DISTANCE: float = 0.6  # Max cosine distance of session search results
+    CANVAS_EMOTION_SAMPLE_MS: int = 500  # Camera emotions are resampled to this fixed step
+    CANVAS_EMOTION_MAX_GRID: int = 14400  # Max fixed-rate samples; longer spans use a coarser step
+    CANVAS_EMOTION_MAX_POINTS: int = 240  # Max samples of the stored emotion series
+    CANVAS_EMOTION_MIN_SEGMENT_MS: int = 2000  # Shorter dominant-emotion runs are not transitions
+    CANVAS_UPLOAD_TTL_SECONDS: int = 3600  # Chunked uploads are dropped this long after their last chunk
+    CANVAS_UPLOAD_MAX_OPEN: int = 1000  # Open chunked uploads per worker; the least recently active give way
+    CANVAS_UPLOAD_MAX_CHUNK_POINTS: int = 50000  # Stroke points per upload chunk
+    CANVAS_UPLOAD_MAX_SIDE: int = 2048  # Max canvas side of an upload; its ink grid is held while open
+    CANVAS_UPLOAD_MAX_EMOTION_BINS: int = 1800  # Emotion time bins held per upload (15 min at 500 ms, then wider)
 
     # AWS S3 for temporary file storage (optional)
     USE_S3_STORAGE: bool = True
     S3_TEMP_BUCKET: str = "serenite-temp"
+    S3_MEDIA_BUCKET: str = "serenite-media"  # Persistent user media
+
+    # Public base URL of this API (e.g. https://api.example.com), used in links
+    # embedded in stored content; diary images stay inline until it is set
+    PUBLIC_BASE_URL: str = ""
 
     # Deployment mode
     USE_API_MODELS: bool = True
@@ -59,9 +114,64 @@ class Settings(BaseSettings):
     ASTRA_DB_APPLICATION_TOKEN: str = ""
     ASTRA_DB_API_ENDPOINT: str = ""
 
+    # Diary search
+    DIARY_VECTOR_SCORE_THRESHOLD: float = 0.35  # Max cosine distance kept
+    DIARY_KEYWORD_QUERY_MAX_TERMS: int = 2  # Shorter queries try full-text only
+    DIARY_RRF_K: int = 60  # Reciprocal rank fusion constant
+
+    # Background diary mood analysis
+    DIARY_ANALYSIS_CONCURRENCY: int = 2
+    DIARY_ANALYSIS_MAX_ATTEMPTS: int = 4
+    DIARY_ANALYSIS_RETRY_DELAY: float = 5.0  # Seconds, doubled per attempt
+    DIARY_ANALYSIS_STALE_SECONDS: int = 600  # Reclaim 'processing' rows after this
+    DIARY_ANALYSIS_WAIT_TIMEOUT: float = 30.0  # Max wait of the events endpoint
+    DIARY_AUTOSAVE_WINDOW_SECONDS: int = 900  # Same-day saves within this fold into one entry
+    DIARY_NEAR_DUPLICATE_RATIO: float = 0.9  # difflib ratio treated as the same entry
+    DIARY_REANALYSIS_DELAY_SECONDS: float = 30.0  # Quiet time after an autosave before re-analysis
+
+    # Bulk diary import
+    DIARY_IMPORT_MAX_ENTRIES: int = 5000  # Per import, across resumed uploads
+    DIARY_IMPORT_INSERT_BATCH: int = 200  # Rows per bulk insert
+    DIARY_IMPORT_PROCESS_BATCH: int = 32  # Rows claimed per worker iteration
+    DIARY_IMPORT_ANALYSIS_BATCH: int = 8  # Entries per LLM call
+    DIARY_IMPORT_ENTRY_CHARS: int = 2000  # Entry text sent per entry in a batch prompt
+    EMBEDDING_BATCH_SIZE: int = 96  # Texts per embedding call (Cohere's limit)
+
+    # Embedding backend: auto (Cohere if configured, else local), cohere, huggingface or onnx
+    EMBEDDING_BACKEND: str = "auto"
+    ONNX_EMBEDDING_MODEL_DIR: str = ""  # Defaults to agents/onnx_models/...-int8
+    ONNX_EMBEDDING_MAX_BATCH: int = 32
+    ONNX_EMBEDDING_MAX_WAIT_MS: float = 5.0  # Dynamic batching window
+    ONNX_EMBEDDING_WORKERS: int = 2  # Parallel inference threads
+
+    # Embedding cache (services/embeddings_adapter.py)
+    EMBEDDING_CACHE_SIZE: int = 10000  # In-memory LRU entries
+    EMBEDDING_CACHE_DIR: str = ""  # Directory for the memory-mapped store; empty disables it
+    EMBEDDING_CACHE_DISK_ENTRIES: int = 100000
+    EMBEDDING_COALESCE_MS: float = 5.0  # Window for batching concurrent query misses
+
+    # Mood analytics
+    ANALYTICS_TIMEZONE: str = "Asia/Dhaka"  # Defines days and time-of-day buckets
+    ANALYTICS_MAX_DAYS: int = 366
+
     # Cache settings
     CACHE_TTL: int = 3600  # 1 hour
 
+    # Cost-weighted rate limiting (budgets in LLM tokens per user and route)
+    COST_LIMIT_ENABLED: bool = True
+    COST_TOOL_CALL_TOKENS: int = 1000  # Charged per external tool call
+    COST_REQUEST_BASE_TOKENS: int = 50  # Minimum charge per request
+    # Charged up front per diary entry (or import batch of entries) queued for
+    # analysis: the worker's LLM calls run after the request, so their actual
+    # tokens are only logged
+    COST_DIARY_ANALYSIS_TOKENS: int = 1500
+    # "estimate" is reserved when a request starts and settled against its actual cost
+    COST_BUDGETS: Dict[str, Dict[str, float]] = {
+        "chat": {"capacity": 60000, "refill_per_minute": 6000, "estimate": 4000},
+        "diary": {"capacity": 20000, "refill_per_minute": 2000, "estimate": 1500},
+        "moner_canvus": {"capacity": 30000, "refill_per_minute": 3000, "estimate": 2500},
+    }
+
     # API settings
     API_PREFIX: str = "/api/v1"
     ALLOWED_HOSTS: List[str] = ["*"]
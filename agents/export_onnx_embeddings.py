@@ -0,0 +1,60 @@
+"""
+Export the multilingual embedding model to int8 ONNX
+
+Exports sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 with
+optimum, applies dynamic int8 quantisation and writes model_quantized.onnx and
+tokenizer.json for services/onnx_embeddings.py.
+
+Needs the export-only dependencies (not required at runtime):
+    pip install "optimum[onnxruntime]"
+
+Usage:
+    python export_onnx_embeddings.py [--output DIR] [--arch avx2|avx512|avx512_vnni|arm64]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+from services.onnx_embeddings import DEFAULT_MODEL_DIR, MODEL_FILE, MODEL_NAME
+from utils.logger import logger
+
+
+def export(output_dir: str, arch: str) -> int:
+    from optimum.onnxruntime import ORTModelForFeatureExtraction, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    from transformers import AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory() as fp32_dir:
+        logger.info(f"Exporting {MODEL_NAME} to ONNX")
+        model = ORTModelForFeatureExtraction.from_pretrained(MODEL_NAME, export=True)
+        model.save_pretrained(fp32_dir)
+
+        logger.info(f"Quantising to int8 ({arch}, dynamic)")
+        config = getattr(AutoQuantizationConfig, arch)(is_static=False, per_channel=False)
+        quantizer = ORTQuantizer.from_pretrained(fp32_dir)
+        quantizer.quantize(save_dir=output_dir, quantization_config=config)
+
+    produced = [f for f in os.listdir(output_dir) if f.endswith("_quantized.onnx")]
+    if produced and produced[0] != MODEL_FILE:
+        shutil.move(os.path.join(output_dir, produced[0]), os.path.join(output_dir, MODEL_FILE))
+
+    # Fast (Rust) tokenizer: the runtime reads tokenizer.json only
+    AutoTokenizer.from_pretrained(MODEL_NAME).save_pretrained(output_dir)
+
+    size = os.path.getsize(os.path.join(output_dir, MODEL_FILE)) / 1024 / 1024
+    logger.info(f"Wrote {os.path.join(output_dir, MODEL_FILE)} ({size:.0f} MiB)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export int8 ONNX embeddings")
+    parser.add_argument("--output", default=DEFAULT_MODEL_DIR)
+    parser.add_argument(
+        "--arch", default="avx2", choices=["avx2", "avx512", "avx512_vnni", "arm64"],
+        help="Target CPU instruction set for quantised kernels",
+    )
+    args = parser.parse_args()
+    sys.exit(export(args.output, args.arch))
@@ -0,0 +1,84 @@
+"""
+Move inline Moner Canvus images of existing sessions to media storage
+
+New sessions are stored this way on ingestion; this script applies the same
+change to sessions whose metadata still holds the full image_data, writing the
+image and a WebP thumbnail to media storage. Safe to re-run: rewritten rows no
+longer have image_data.
+
+Usage:
+    python extract_canvas_images.py [--batch-size 50]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+from sqlalchemy import text
+from services.canvas_images import store_canvas_image
+from services.database import get_async_engine, dispose_engines
+from services.media_images import image_extraction_enabled
+from utils.logger import logger
+
+
+async def extract(batch_size: int) -> int:
+    if not image_extraction_enabled():
+        logger.error("Set PUBLIC_BASE_URL to the absolute URL of this API first")
+        return 1
+
+    engine = get_async_engine()
+    last_id = ""
+    rewritten = 0
+    skipped = 0
+    saved_chars = 0
+
+    while True:
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    text("""
+                        SELECT id, cmetadata->>'user_id' AS user_id, cmetadata->>'image_data' AS image_data
+                        FROM langchain_pg_embedding
+                        WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'moner_canvus_sessions')
+                        AND cmetadata ? 'image_data' AND id > :last_id
+                        ORDER BY id
+                        LIMIT :batch_size
+                    """),
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+            ).fetchall()
+
+        if not rows:
+            break
+
+        for row in rows:
+            image = await store_canvas_image(row.user_id or "", row.image_data or "")
+            if image is None:
+                skipped += 1
+                continue
+            fields = {key: image[key] for key in ("image_file", "thumbnail_file", "thumbnail_data")}
+            async with engine.begin() as conn:
+                await conn.execute(
+                    text("""
+                        UPDATE langchain_pg_embedding
+                        SET cmetadata = (cmetadata - 'image_data') || CAST(:fields AS JSONB)
+                        WHERE id = :id
+                    """),
+                    {"fields": json.dumps(fields), "id": row.id},
+                )
+            rewritten += 1
+            saved_chars += len(row.image_data) - len(image["thumbnail_data"])
+
+        last_id = rows[-1].id
+        logger.info(f"Canvas image extraction progress: rewritten={rewritten}, skipped={skipped}, saved_chars={saved_chars}")
+
+    logger.info(f"Canvas image extraction complete: rewritten={rewritten}, skipped={skipped}, saved_chars={saved_chars}")
+    await dispose_engines()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline canvas images to media storage")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(extract(args.batch_size)))
@@ -0,0 +1,73 @@
+"""
+Move inline base64 images of existing diary entries to media storage
+
+New entries are rewritten on ingestion; this script applies the same rewrite to
+rows already in diary_entries (run backfill_diary_entries.py first). Safe to
+re-run: images are content-addressed and rewritten rows no longer match.
+
+Usage:
+    python extract_diary_images.py [--batch-size 50]
+"""
+
+import argparse
+import asyncio
+import sys
+from sqlalchemy import text
+from services.database import get_async_engine, dispose_engines
+from services.diary_images import extract_inline_images
+from services.media_images import image_extraction_enabled
+from utils.logger import logger
+
+
+async def extract(batch_size: int) -> int:
+    if not image_extraction_enabled():
+        logger.error("Set PUBLIC_BASE_URL to the absolute URL of this API first")
+        return 1
+
+    engine = get_async_engine()
+    last_id = ""
+    rewritten = 0
+    saved_chars = 0
+
+    while True:
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    text("""
+                        SELECT id, user_id, content
+                        FROM diary_entries
+                        WHERE id > :last_id AND content LIKE '%data:image/%'
+                        ORDER BY id
+                        LIMIT :batch_size
+                    """),
+                    {"last_id": last_id, "batch_size": batch_size},
+                )
+            ).fetchall()
+
+        if not rows:
+            break
+
+        for row in rows:
+            content = await extract_inline_images(row.content, row.user_id)
+            if content != row.content:
+                async with engine.begin() as conn:
+                    await conn.execute(
+                        text("UPDATE diary_entries SET content = :content WHERE id = :id"),
+                        {"content": content, "id": row.id},
+                    )
+                rewritten += 1
+                saved_chars += len(row.content) - len(content)
+
+        last_id = rows[-1].id
+        logger.info(f"Image extraction progress: rewritten={rewritten}, saved_chars={saved_chars}")
+
+    logger.info(f"Image extraction complete: rewritten={rewritten}, saved_chars={saved_chars}")
+    await dispose_engines()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move inline diary images to media storage")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(extract(args.batch_size)))
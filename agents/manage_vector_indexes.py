@@ -0,0 +1,172 @@
+"""
+Create and tune HNSW indexes for the pgvector collections
+
+All collections share langchain_pg_embedding, so each gets its own partial
+HNSW index (WHERE collection_id = ...): searches in one collection never walk
+another collection's graph, and each index can be rebuilt independently.
+
+HNSW needs a typed vector column. PGVector creates it untyped, so --create
+first converts it to vector(N) when every stored vector has N dimensions.
+
+Per-user searches filter on cmetadata->>'user_id'. The planner uses the
+(collection_id, user_id) btree index from migrations/002 for small users
+(exact search over their rows) and the HNSW index with iterative scans
+(settings.VECTOR_ITERATIVE_SCAN) otherwise.
+
+Usage:
+    python manage_vector_indexes.py --status
+    python manage_vector_indexes.py --create                  # all collections
+    python manage_vector_indexes.py --create --collection diary_entries
+    python manage_vector_indexes.py --rebuild --m 24 --ef-construction 128
+    python manage_vector_indexes.py --drop --collection diary_entries
+"""
+
+import argparse
+import re
+import sys
+from sqlalchemy import text
+from config.settings import settings
+from services.database import get_sync_engine
+from utils.logger import logger
+
+COLLECTIONS = ("mental_health_resources", "diary_entries", "moner_canvus_sessions")
+
+
+def _index_name(collection: str) -> str:
+    return f"ix_langchain_pg_embedding_hnsw_{re.sub(r'[^a-z0-9_]', '_', collection.lower())}"
+
+
+def _collection_ids(conn, names):
+    rows = conn.execute(
+        text("SELECT name, uuid FROM langchain_pg_collection WHERE name = ANY(:names)"),
+        {"names": list(names)},
+    )
+    return {row.name: str(row.uuid) for row in rows}
+
+
+def _column_dimension(conn):
+    """Declared dimension of the embedding column, or None if untyped."""
+    typmod = conn.execute(
+        text("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = 'langchain_pg_embedding'::regclass AND attname = 'embedding'
+        """)
+    ).scalar()
+    return typmod if typmod and typmod > 0 else None
+
+
+def _stored_dimensions(conn):
+    rows = conn.execute(
+        text("SELECT DISTINCT vector_dims(embedding) AS dims FROM langchain_pg_embedding")
+    )
+    return sorted(row.dims for row in rows)
+
+
+def _ensure_typed_column(conn) -> int:
+    """Convert the embedding column to vector(N). Returns N."""
+    declared = _column_dimension(conn)
+    if declared:
+        return declared
+
+    stored = _stored_dimensions(conn)
+    if len(stored) > 1:
+        raise RuntimeError(
+            f"Stored vectors have mixed dimensions {stored}; re-embed before indexing"
+        )
+    dimension = stored[0] if stored else settings.EMBEDDING_DIMENSION
+    logger.info(f"Converting langchain_pg_embedding.embedding to vector({dimension})")
+    conn.execute(
+        text(
+            f"ALTER TABLE langchain_pg_embedding "
+            f"ALTER COLUMN embedding TYPE vector({dimension})"
+        )
+    )
+    return dimension
+
+
+def status() -> int:
+    engine = get_sync_engine()
+    with engine.connect() as conn:
+        ids = _collection_ids(conn, COLLECTIONS)
+        print(f"embedding column: vector({_column_dimension(conn) or 'untyped'})")
+        print(f"hnsw.ef_search setting: {settings.VECTOR_EF_SEARCH}, "
+              f"iterative scan: {settings.VECTOR_ITERATIVE_SCAN}")
+        for name in COLLECTIONS:
+            if name not in ids:
+                print(f"{name:26} (collection not created)")
+                continue
+            rows = conn.execute(
+                text("SELECT count(*) FROM langchain_pg_embedding WHERE collection_id = :id"),
+                {"id": ids[name]},
+            ).scalar()
+            index = conn.execute(
+                text("""
+                    SELECT pg_size_pretty(pg_relation_size(c.oid)) AS size
+                    FROM pg_class c WHERE c.relname = :name
+                """),
+                {"name": _index_name(name)},
+            ).fetchone()
+            state = f"hnsw {index.size}" if index else "no ANN index"
+            print(f"{name:26} {rows:>10} rows  {state}")
+    return 0
+
+
+def create(collections, m: int, ef_construction: int, rebuild: bool = False) -> int:
+    engine = get_sync_engine()
+    with engine.begin() as conn:
+        ids = _collection_ids(conn, collections)
+        _ensure_typed_column(conn)
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("SET maintenance_work_mem = '512MB'"))
+        for name in collections:
+            if name not in ids:
+                logger.warning(f"Collection {name} does not exist yet; skipping")
+                continue
+            index = _index_name(name)
+            if rebuild:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index}"))
+            logger.info(f"Building HNSW index {index} (m={m}, ef_construction={ef_construction})")
+            # The collection id is inlined: partial index predicates cannot be parameters
+            conn.execute(
+                text(f"""
+                    CREATE INDEX CONCURRENTLY IF NOT EXISTS {index}
+                    ON langchain_pg_embedding
+                    USING hnsw (embedding vector_cosine_ops)
+                    WITH (m = {int(m)}, ef_construction = {int(ef_construction)})
+                    WHERE collection_id = '{ids[name]}'
+                """)
+            )
+        conn.execute(text("ANALYZE langchain_pg_embedding"))
+    logger.info("Vector indexes are up to date")
+    return 0
+
+
+def drop(collections) -> int:
+    engine = get_sync_engine()
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for name in collections:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {_index_name(name)}"))
+            logger.info(f"Dropped HNSW index for {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage pgvector HNSW indexes")
+    action = parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--status", action="store_true", help="Show collections and indexes")
+    action.add_argument("--create", action="store_true", help="Create missing indexes")
+    action.add_argument("--rebuild", action="store_true", help="Drop and recreate indexes")
+    action.add_argument("--drop", action="store_true", help="Drop indexes")
+    parser.add_argument("--collection", choices=COLLECTIONS, help="Limit to one collection")
+    parser.add_argument("--m", type=int, default=settings.VECTOR_HNSW_M)
+    parser.add_argument("--ef-construction", type=int, default=settings.VECTOR_HNSW_EF_CONSTRUCTION)
+    args = parser.parse_args()
+
+    selected = (args.collection,) if args.collection else COLLECTIONS
+    if args.status:
+        sys.exit(status())
+    if args.drop:
+        sys.exit(drop(selected))
+    sys.exit(create(selected, args.m, args.ef_construction, rebuild=args.rebuild))
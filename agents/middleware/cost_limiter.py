@@ -0,0 +1,198 @@
+"""
+Cost-weighted rate limiting
+
+A token-bucket limiter that charges each user the LLM tokens and external tool
+calls their request actually consumed (see services.usage_accounting), instead
+of counting requests. Budgets are configured per route in settings.COST_BUDGETS.
+
+The route's estimated cost is reserved before the handler runs, so concurrent
+requests of one user cannot all pass the budget check on the same remaining
+tokens, and the difference to the actual cost is settled when it returns or
+fails. Handlers that queue priced background work check it against the
+remaining budget first (usage_accounting.check_budget); a request that cannot
+afford it is rejected with 429 instead of driving the bucket into debt.
+
+Usage:
+    @router.post("/")
+    @limiter.limit("5/minute")
+    @cost_limiter.limit("chat")
+    async def chat(request: Request, ..., user = Depends(get_current_user)):
+        ...
+"""
+
+import asyncio
+import functools
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from slowapi.util import get_remote_address
+
+from config.settings import settings
+from services.usage_accounting import BudgetExceededError, usage_scope
+from utils.logger import logger
+
+
+class TokenBucket:
+    """A refilling budget of cost units. May go negative after an expensive request."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_per_second)
+        self.updated_at = now
+
+    def remaining(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def charge(self, cost: float) -> float:
+        """Take `cost` units; a negative cost gives units back, up to capacity."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - cost)
+        return self.tokens
+
+    def seconds_until(self, level: float) -> int:
+        """Seconds until the bucket holds at least `level` units."""
+        deficit = level - self.tokens
+        if deficit <= 0 or self.refill_per_second <= 0:
+            return 0
+        return math.ceil(deficit / self.refill_per_second)
+
+    def is_full(self) -> bool:
+        self._refill()
+        return self.tokens >= self.capacity
+
+
+class CostLimiter:
+    """Per-user, per-route token buckets charged by actual LLM and tool cost."""
+
+    MAX_BUCKETS = 10000
+
+    def __init__(self, budgets: Dict[str, Dict[str, float]], enabled: bool = True):
+        self.budgets = budgets
+        self.enabled = enabled
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _get_bucket(self, route: str, key: str) -> TokenBucket:
+        budget = self.budgets[route]
+        bucket = self._buckets.get((route, key))
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                self._evict_full_buckets()
+            bucket = TokenBucket(
+                capacity=budget["capacity"],
+                refill_per_second=budget["refill_per_minute"] / 60.0,
+            )
+            self._buckets[(route, key)] = bucket
+        return bucket
+
+    def _evict_full_buckets(self) -> None:
+        # A full bucket carries no state worth keeping
+        for bucket_key in [k for k, b in self._buckets.items() if b.is_full()]:
+            del self._buckets[bucket_key]
+
+    @staticmethod
+    def _identify(request: Request, kwargs: Dict[str, Any]) -> str:
+        user = kwargs.get("user") or kwargs.get("current_user")
+        if isinstance(user, dict) and user.get("id"):
+            return f"user:{user['id']}"
+        return f"ip:{get_remote_address(request)}"
+
+    def _headers(self, route: str, bucket: TokenBucket, cost: Optional[int] = None) -> Dict[str, str]:
+        headers = {
+            "X-CostBudget-Limit": str(int(bucket.capacity)),
+            "X-CostBudget-Remaining": str(max(int(bucket.tokens), 0)),
+            "X-CostBudget-Reset": str(bucket.seconds_until(bucket.capacity)),
+            "X-CostBudget-Route": route,
+        }
+        if cost is not None:
+            headers["X-CostBudget-Cost"] = str(cost)
+        return headers
+
+    def status(self, route: str, key: str) -> Dict[str, Any]:
+        """Return the current budget of a caller on a route."""
+        with self._lock:
+            bucket = self._get_bucket(route, key)
+            return {
+                "route": route,
+                "limit": int(bucket.capacity),
+                "remaining": max(int(bucket.remaining()), 0),
+                "reset_seconds": bucket.seconds_until(bucket.capacity),
+            }
+
+    def limit(self, route: str) -> Callable:
+        """Decorate an async endpoint with the cost budget of `route`."""
+        if route not in self.budgets:
+            raise ValueError(f"No cost budget configured for route '{route}'")
+
+        def decorator(func: Callable) -> Callable:
+            if not asyncio.iscoroutinefunction(func):
+                raise TypeError("cost_limiter.limit only supports async endpoints")
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.get("request")
+                if not self.enabled or not isinstance(request, Request):
+                    return await func(*args, **kwargs)
+
+                key = self._identify(request, kwargs)
+                reserved = self.budgets[route].get("estimate", 0)
+                with self._lock:
+                    bucket = self._get_bucket(route, key)
+                    if bucket.remaining() <= 0:
+                        headers = self._headers(route, bucket)
+                        headers["Retry-After"] = str(max(bucket.seconds_until(1), 1))
+                        logger.warning(f"Cost budget exhausted for {key} on route {route}")
+                        raise HTTPException(
+                            status_code=429,
+                            detail="Usage budget exceeded. Please try again later.",
+                            headers=headers,
+                        )
+                    budget = bucket.tokens + reserved - settings.COST_REQUEST_BASE_TOKENS
+                    bucket.charge(reserved)
+
+                with usage_scope() as usage:
+                    usage.budget = budget
+                    try:
+                        return await func(*args, **kwargs)
+                    except BudgetExceededError as e:
+                        logger.warning(f"Cost budget too small for {key} on route {route}: {e}")
+                        with self._lock:
+                            retry_after = bucket.seconds_until(min(e.required, bucket.capacity))
+                        raise HTTPException(
+                            status_code=429,
+                            detail=str(e),
+                            headers={"Retry-After": str(max(retry_after, 1))},
+                        )
+                    finally:
+                        cost = settings.COST_REQUEST_BASE_TOKENS + usage.total_cost
+                        with self._lock:
+                            bucket.charge(cost - reserved)
+                            request.state.cost_budget_headers = self._headers(
+                                route, bucket, cost
+                            )
+                        logger.info(
+                            f"Charged {cost} units to {key} on route {route}: {usage.to_dict()}"
+                        )
+
+            return wrapper
+
+        return decorator
+
+    async def inject_headers(self, request: Request, call_next):
+        """HTTP middleware that exposes the remaining budget on responses."""
+        response = await call_next(request)
+        headers = getattr(request.state, "cost_budget_headers", None)
+        if headers:
+            response.headers.update(headers)
+        return response
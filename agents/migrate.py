@@ -0,0 +1,74 @@
+"""
+Apply SQL migrations in migrations/ to the agents database
+
+Each file is applied once, in filename order, inside its own transaction and
+recorded in the agents_schema_migrations table.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --list     # show applied and pending migrations
+"""
+
+import argparse
+import os
+import sys
+from sqlalchemy import text
+from services.database import get_sync_engine
+from utils.logger import logger
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+
+def _available_migrations():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith(".sql"))
+
+
+def _applied_migrations(conn):
+    conn.execute(
+        text("""
+            CREATE TABLE IF NOT EXISTS agents_schema_migrations (
+                version VARCHAR PRIMARY KEY,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """)
+    )
+    return {row.version for row in conn.execute(text("SELECT version FROM agents_schema_migrations"))}
+
+
+def migrate(list_only: bool = False) -> int:
+    engine = get_sync_engine()
+    with engine.begin() as conn:
+        applied = _applied_migrations(conn)
+
+    pending = [m for m in _available_migrations() if m not in applied]
+
+    if list_only:
+        for name in _available_migrations():
+            status = "applied" if name in applied else "pending"
+            print(f"{status:8} {name}")
+        return 0
+
+    if not pending:
+        logger.info("Database schema is up to date")
+        return 0
+
+    for name in pending:
+        with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+            sql = f.read()
+        logger.info(f"Applying migration {name}")
+        with engine.begin() as conn:
+            conn.exec_driver_sql(sql)
+            conn.execute(
+                text("INSERT INTO agents_schema_migrations (version) VALUES (:version)"),
+                {"version": name},
+            )
+
+    logger.info(f"Applied {len(pending)} migration(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument("--list", action="store_true", help="List migration status")
+    args = parser.parse_args()
+    sys.exit(migrate(list_only=args.list))
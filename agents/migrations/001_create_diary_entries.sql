@@ -0,0 +1,26 @@
+-- First-class diary entries table.
+-- Listing used to scan the JSONB metadata of every user's embeddings and sort
+-- by an ISO string; this table gives typed columns and composite indexes so
+-- per-user listing stays flat as the collection grows.
+
+CREATE TABLE IF NOT EXISTS diary_entries (
+    id VARCHAR PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    entry_date VARCHAR NOT NULL,
+    content TEXT NOT NULL,
+    mood VARCHAR,
+    analysis TEXT,
+    confidence DOUBLE PRECISION,
+    -- Row in langchain_pg_embedding holding the vector for this entry
+    embedding_id VARCHAR REFERENCES langchain_pg_embedding (id) ON DELETE SET NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_diary_entries_user_created
+    ON diary_entries (user_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS ix_diary_entries_user_mood_created
+    ON diary_entries (user_id, mood, created_at DESC);
+
+CREATE INDEX IF NOT EXISTS ix_diary_entries_embedding
+    ON diary_entries (embedding_id);
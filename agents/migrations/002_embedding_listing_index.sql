@@ -0,0 +1,10 @@
+-- Keyset pagination index for listings still served from vector metadata
+-- (Moner Canvus sessions): per collection and user, newest first.
+
+CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_user_created
+    ON langchain_pg_embedding (
+        collection_id,
+        (cmetadata->>'user_id'),
+        (cmetadata->>'created_at') DESC,
+        id DESC
+    );
@@ -0,0 +1,15 @@
+-- Full-text index over the plain text of diary entries for hybrid search.
+-- The 'simple' configuration does no stemming or stop-word removal, which
+-- keeps names, places and Bangla words searchable as written.
+
+ALTER TABLE diary_entries ADD COLUMN IF NOT EXISTS plain_text TEXT;
+
+UPDATE diary_entries
+SET plain_text = regexp_replace(content, '<[^>]*>', ' ', 'g')
+WHERE plain_text IS NULL;
+
+ALTER TABLE diary_entries ADD COLUMN IF NOT EXISTS search_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(plain_text, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_diary_entries_search_tsv
+    ON diary_entries USING gin (search_tsv);
@@ -0,0 +1,13 @@
+-- Background mood analysis: entries are stored first and analysed later.
+-- Existing rows were analysed synchronously, so they default to 'completed'.
+
+ALTER TABLE diary_entries
+    ADD COLUMN IF NOT EXISTS analysis_status VARCHAR NOT NULL DEFAULT 'completed',
+    ADD COLUMN IF NOT EXISTS analysis_attempts INTEGER NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS analysis_error TEXT,
+    ADD COLUMN IF NOT EXISTS updated_at TIMESTAMPTZ NOT NULL DEFAULT now();
+
+-- Finds work to recover after a restart without scanning completed rows
+CREATE INDEX IF NOT EXISTS ix_diary_entries_analysis_pending
+    ON diary_entries (updated_at)
+    WHERE analysis_status IN ('pending', 'processing');
@@ -0,0 +1,23 @@
+-- Bulk diary imports. Entries of an import carry (import_id, import_seq) so a
+-- re-sent upload skips rows that already arrived and processing can resume.
+
+CREATE TABLE IF NOT EXISTS diary_imports (
+    id VARCHAR PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    -- receiving, processing, completed or failed
+    status VARCHAR NOT NULL DEFAULT 'receiving',
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_diary_imports_user_created
+    ON diary_imports (user_id, created_at DESC);
+
+ALTER TABLE diary_entries
+    ADD COLUMN IF NOT EXISTS import_id VARCHAR REFERENCES diary_imports (id) ON DELETE SET NULL,
+    ADD COLUMN IF NOT EXISTS import_seq INTEGER;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_diary_entries_import_seq
+    ON diary_entries (import_id, import_seq)
+    WHERE import_id IS NOT NULL;
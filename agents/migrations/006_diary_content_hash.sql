@@ -0,0 +1,13 @@
+-- Content hashes for deduplicating repeated diary submissions.
+-- Existing rows keep a NULL hash and are simply never matched.
+
+ALTER TABLE diary_entries
+    ADD COLUMN IF NOT EXISTS content_hash VARCHAR;
+
+CREATE INDEX IF NOT EXISTS ix_diary_entries_user_content_hash
+    ON diary_entries (user_id, content_hash)
+    WHERE content_hash IS NOT NULL;
+
+-- Latest entry of a day, for folding autosaves into one entry
+CREATE INDEX IF NOT EXISTS ix_diary_entries_user_date_updated
+    ON diary_entries (user_id, entry_date, updated_at DESC);
@@ -0,0 +1,41 @@
+-- Per-user daily mood aggregates, upserted whenever a mood is recorded
+-- (diary analysis, face/voice emotion detection, canvas sessions), so trend
+-- queries read at most one row per day, source and mood.
+
+CREATE TABLE IF NOT EXISTS mood_daily_aggregates (
+    user_id VARCHAR NOT NULL,
+    day DATE NOT NULL,
+    -- diary, face, voice or canvas
+    source VARCHAR NOT NULL,
+    mood VARCHAR NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    -- Time-of-day buckets: 05-11, 12-17, 18-23, 00-04
+    morning_count INTEGER NOT NULL DEFAULT 0,
+    afternoon_count INTEGER NOT NULL DEFAULT 0,
+    evening_count INTEGER NOT NULL DEFAULT 0,
+    night_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    PRIMARY KEY (user_id, day, source, mood)
+);
+
+-- Seed from diary entries analysed before this table existed, bucketed in
+-- Asia/Dhaka (the default ANALYTICS_TIMEZONE)
+INSERT INTO mood_daily_aggregates (
+    user_id, day, source, mood, count, confidence_sum,
+    morning_count, afternoon_count, evening_count, night_count
+)
+SELECT user_id,
+       (created_at AT TIME ZONE 'Asia/Dhaka')::date,
+       'diary',
+       left(lower(trim(mood)), 32),
+       count(*),
+       coalesce(sum(confidence), 0),
+       count(*) FILTER (WHERE extract(hour FROM created_at AT TIME ZONE 'Asia/Dhaka') BETWEEN 5 AND 11),
+       count(*) FILTER (WHERE extract(hour FROM created_at AT TIME ZONE 'Asia/Dhaka') BETWEEN 12 AND 17),
+       count(*) FILTER (WHERE extract(hour FROM created_at AT TIME ZONE 'Asia/Dhaka') BETWEEN 18 AND 23),
+       count(*) FILTER (WHERE extract(hour FROM created_at AT TIME ZONE 'Asia/Dhaka') BETWEEN 0 AND 4)
+FROM diary_entries
+WHERE mood IS NOT NULL AND trim(mood) <> ''
+GROUP BY 1, 2, 4
+ON CONFLICT DO NOTHING;
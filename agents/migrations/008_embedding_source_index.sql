@@ -0,0 +1,5 @@
+-- Per-source lookups for incremental knowledge base ingestion
+-- (setup_vector_store.py compares stored chunks of each source file).
+
+CREATE INDEX IF NOT EXISTS ix_langchain_pg_embedding_source
+    ON langchain_pg_embedding (collection_id, (cmetadata->>'source'));
@@ -0,0 +1,50 @@
+-- Typed summary of each stored Moner Canvus session, written alongside the
+-- vector row in langchain_pg_embedding. The weekly timeline reads tags,
+-- distress flags and emotions from here instead of scanning JSONB metadata.
+
+CREATE TABLE IF NOT EXISTS canvus_sessions (
+    -- Same id as the session's langchain_pg_embedding row
+    id VARCHAR PRIMARY KEY,
+    user_id VARCHAR NOT NULL,
+    session_id VARCHAR NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL,
+    tags TEXT[] NOT NULL DEFAULT '{}',
+    high_distress BOOLEAN NOT NULL DEFAULT FALSE,
+    -- Dominant camera emotion; NULL when the camera was not used
+    dominant_emotion VARCHAR,
+    -- What was recorded in mood_daily_aggregates (emotion, else first tag)
+    mood VARCHAR,
+    stroke_count INTEGER NOT NULL DEFAULT 0,
+    color_count INTEGER NOT NULL DEFAULT 0,
+    duration_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    -- gemini, local or fallback
+    analysis_source VARCHAR NOT NULL DEFAULT 'gemini'
+);
+
+CREATE INDEX IF NOT EXISTS ix_canvus_sessions_user_created
+    ON canvus_sessions (user_id, created_at DESC);
+
+-- Seed from sessions stored before this table existed
+INSERT INTO canvus_sessions (
+    id, user_id, session_id, created_at, tags, high_distress, mood,
+    stroke_count, color_count, duration_seconds, analysis_source
+)
+SELECT e.cmetadata->>'id',
+       e.cmetadata->>'user_id',
+       e.cmetadata->>'session_id',
+       (e.cmetadata->>'created_at')::timestamp AT TIME ZONE 'UTC',
+       coalesce(
+           ARRAY(SELECT jsonb_array_elements_text((e.cmetadata->>'tags')::jsonb)),
+           '{}'
+       ),
+       coalesce((e.cmetadata->>'high_distress')::boolean, FALSE),
+       (e.cmetadata->>'tags')::jsonb->>0,
+       coalesce((e.cmetadata->>'stroke_count')::int, 0),
+       coalesce((e.cmetadata->>'color_count')::int, 0),
+       coalesce((e.cmetadata->>'duration_seconds')::double precision, 0),
+       coalesce((e.cmetadata->>'analysis')::jsonb->>'source', 'gemini')
+FROM langchain_pg_embedding e
+JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+WHERE c.name = 'moner_canvus_sessions'
+  AND e.cmetadata->>'id' IS NOT NULL
+ON CONFLICT (id) DO NOTHING;
@@ -0,0 +1,7 @@
+-- Downsampled camera emotion trajectory of each Moner Canvus session
+-- (services/emotion_series.py): at most CANVAS_EMOTION_MAX_POINTS samples,
+-- little-endian uint32 millisecond offsets and float16 values, seven per
+-- sample in EmotionValues field order. NULL when the camera was not used.
+
+ALTER TABLE canvus_sessions ADD COLUMN IF NOT EXISTS emotion_times BYTEA;
+ALTER TABLE canvus_sessions ADD COLUMN IF NOT EXISTS emotion_values BYTEA;
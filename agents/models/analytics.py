@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import datetime
+
+
+class MoodDay(BaseModel):
+    day: datetime.date
+    total: int
+    moods: Dict[str, int]
+    mean_confidence: Optional[float] = None
+
+
+class MoodTrendResponse(BaseModel):
+    user_id: str
+    start: datetime.date
+    end: datetime.date
+    source: Optional[str] = None  # None means all sources
+    total: int
+    dominant_mood: Optional[str] = None
+    mood_counts: Dict[str, int]
+    mean_confidence: Dict[str, float]  # Per mood
+    time_of_day: Dict[str, Dict[str, int]]  # morning/afternoon/evening/night -> mood counts
+    days: List[MoodDay]
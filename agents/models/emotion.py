@@ -17,6 +17,7 @@ class EmotionJournalEntry(BaseModel):
     note: Optional[str] = None
     source: str  # 'face' or 'voice'
     timestamp: Optional[datetime.datetime] = None
+    user_id: Optional[str] = None  # Entries with a user feed mood analytics
     
 class EmotionJournalResponse(BaseModel):
     entries: List[Dict[str, Any]]
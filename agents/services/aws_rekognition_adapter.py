@@ -5,10 +5,8 @@ Replaces local DeepFace models with cloud API
 
 import boto3
 from typing import Tuple, Dict, Optional
-from io import BytesIO
-from PIL import Image
-import numpy as np
 from config.settings import settings
+from services.image_preprocessing import REKOGNITION_BUDGET, prepare_image
 from utils.logger import logger
 
 
@@ -247,6 +245,9 @@ class AWSRekognitionAdapter:
         """
         Convert various image formats to bytes for AWS Rekognition
 
+        Images are downsampled to REKOGNITION_IMAGE_MAX_SIDE and sent as JPEG
+        (see services.image_preprocessing).
+
         Args:
             image_data: bytes, numpy array, or PIL Image
 
@@ -254,56 +255,8 @@ class AWSRekognitionAdapter:
             Image as bytes
         """
         try:
-            # If already bytes, return as-is
-            if isinstance(image_data, bytes):
-                logger.info("Image data already in bytes format")
-                return image_data
-
-            # If numpy array, convert to bytes
-            if isinstance(image_data, np.ndarray):
-                logger.info(
-                    f"Converting numpy array to bytes (shape: {image_data.shape}, dtype: {image_data.dtype})"
-                )
-
-                # Handle grayscale images (convert to RGB)
-                if len(image_data.shape) == 2:
-                    logger.info("Grayscale image detected, converting to RGB")
-                    # Convert grayscale to RGB by stacking the same data 3 times
-                    image_data = np.stack([image_data] * 3, axis=-1)
-                    logger.info(f"Converted to RGB (new shape: {image_data.shape})")
-
-                # Handle RGBA images (convert to RGB)
-                elif len(image_data.shape) == 3 and image_data.shape[2] == 4:
-                    logger.info("RGBA image detected, converting to RGB")
-                    image_data = image_data[:, :, :3]
-                    logger.info(f"Converted to RGB (new shape: {image_data.shape})")
-
-                # Convert to PIL Image
-                image = Image.fromarray(image_data.astype("uint8"))
-            elif isinstance(image_data, Image.Image):
-                logger.info(
-                    f"PIL Image provided (size: {image_data.size}, mode: {image_data.mode})"
-                )
-
-                # Convert grayscale or other modes to RGB
-                if image_data.mode != "RGB":
-                    logger.info(f"Converting {image_data.mode} image to RGB")
-                    image = image_data.convert("RGB")
-                    logger.info("Converted to RGB")
-                else:
-                    image = image_data
-            else:
-                raise ValueError(f"Unsupported image type: {type(image_data)}")
-
-            # Convert PIL Image to bytes
-            buffer = BytesIO()
-            # Save as JPEG (AWS Rekognition supports JPEG and PNG)
-            image.save(buffer, format="JPEG")
-            image_bytes = buffer.getvalue()
-            logger.info(
-                f"Image converted to JPEG bytes (size: {len(image_bytes)} bytes)"
-            )
-            return image_bytes
+            prepared = prepare_image(image_data, REKOGNITION_BUDGET)
+            return prepared.data
         except Exception as e:
             logger.error(f"Error in _prepare_image_bytes: {e}")
             import traceback
@@ -0,0 +1,171 @@
+"""
+In-process background job worker with retries
+
+Jobs are identified by a string key and handled by an async callable. Failed
+jobs are retried with exponential backoff; after the last attempt the give-up
+callback is invoked. Callers can wait for a job to finish.
+
+Jobs live in memory only, so anything that must survive a restart has to be
+persisted by the caller and re-enqueued on startup.
+
+Usage:
+    worker = RetryingWorker("diary-analysis", handler=process_entry, on_give_up=mark_failed)
+    await worker.start()
+    worker.enqueue(entry_id)
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from utils.logger import logger
+
+
+class RetryingWorker:
+    """A pool of asyncio tasks draining a job queue with retry and backoff."""
+
+    def __init__(
+        self,
+        name: str,
+        handler: Callable[[str, int], Awaitable[None]],
+        on_give_up: Optional[Callable[[str, Exception], Awaitable[None]]] = None,
+        concurrency: int = 2,
+        max_attempts: int = 4,
+        base_delay: float = 2.0,
+    ):
+        """
+        Args:
+            name: Name used in logs
+            handler: Async callable receiving (job key, attempt number starting at 1)
+            on_give_up: Async callable invoked with (job key, last error) after
+                the final failed attempt
+            concurrency: Number of jobs processed in parallel
+            max_attempts: Attempts per job before giving up
+            base_delay: Retry delay in seconds, doubled after every attempt
+        """
+        self.name = name
+        self.handler = handler
+        self.on_give_up = on_give_up
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._queued: Set[str] = set()
+        self._attempts: Dict[str, int] = {}
+        self._done_events: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}  # callers waiting on each done event
+        self._scheduled: Dict[str, asyncio.TimerHandle] = {}  # debounced by enqueue_later
+        self.stats = {"processed": 0, "retried": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._run(), name=f"{self.name}-{i}")
+            for i in range(self.concurrency)
+        ]
+        logger.info(f"Started background worker {self.name} (concurrency={self.concurrency})")
+
+    async def stop(self) -> None:
+        for handle in self._scheduled.values():
+            handle.cancel()
+        self._scheduled.clear()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Stopped background worker {self.name}")
+
+    def enqueue(self, key: str) -> bool:
+        """Queue a job unless it is already queued. Returns False if not running."""
+        if self._queue is None:
+            logger.warning(f"Worker {self.name} not running; job {key} not queued")
+            return False
+        if key not in self._queued:
+            self._queued.add(key)
+            self._queue.put_nowait(key)
+        return True
+
+    def enqueue_later(self, key: str, delay: float) -> bool:
+        """
+        Queue a job after `delay` seconds, restarting the delay if the job is
+        already scheduled (debounce). Returns True if it was not scheduled yet.
+        """
+        if self._queue is None:
+            logger.warning(f"Worker {self.name} not running; job {key} not scheduled")
+            return False
+        handle = self._scheduled.pop(key, None)
+        if handle is not None:
+            handle.cancel()
+        loop = asyncio.get_running_loop()
+        self._scheduled[key] = loop.call_later(delay, self._enqueue_scheduled, key)
+        return handle is None
+
+    def _enqueue_scheduled(self, key: str) -> None:
+        self._scheduled.pop(key, None)
+        self.enqueue(key)
+
+    async def wait(self, key: str, timeout: float) -> bool:
+        """Wait until the job finishes in this process. Returns False on timeout."""
+        event = self._done_events.setdefault(key, asyncio.Event())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            # The event is shared: only the last waiter to leave forgets it
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+                if self._done_events.get(key) is event:
+                    del self._done_events[key]
+
+    def _finish(self, key: str) -> None:
+        self._attempts.pop(key, None)
+        event = self._done_events.pop(key, None)
+        if event is not None:
+            event.set()
+
+    def _retry_later(self, key: str, delay: float) -> None:
+        loop = asyncio.get_running_loop()
+        loop.call_later(delay, self.enqueue, key)
+
+    async def _run(self) -> None:
+        while True:
+            key = await self._queue.get()
+            self._queued.discard(key)
+            attempt = self._attempts.get(key, 0) + 1
+            self._attempts[key] = attempt
+            try:
+                await self.handler(key, attempt)
+                self.stats["processed"] += 1
+                self._finish(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    delay = self.base_delay * (2 ** (attempt - 1))
+                    self.stats["retried"] += 1
+                    logger.warning(
+                        f"{self.name}: job {key} failed (attempt {attempt}/{self.max_attempts}), "
+                        f"retrying in {delay:.0f}s: {e}"
+                    )
+                    self._retry_later(key, delay)
+                else:
+                    self.stats["failed"] += 1
+                    logger.error(f"{self.name}: job {key} failed permanently: {e}")
+                    if self.on_give_up is not None:
+                        try:
+                            await self.on_give_up(key, e)
+                        except Exception as give_up_error:
+                            logger.error(f"{self.name}: give-up handler failed: {give_up_error}")
+                    self._finish(key)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,187 @@
+"""
+Analysis cache for Moner Canvus submissions
+
+Clients retry POST /moner-canvus/sessions on network errors and re-submit the
+same drawing, often while the first request is still waiting on Gemini. A
+submission is fingerprinted by:
+- a 64-bit difference hash (dHash) of the drawing, which survives
+  re-encoding and small rendering differences
+- a digest of the summarised session (stroke, point, colour and emotion
+  counts, rounded duration), which ignores session ids and timestamps
+
+Within CANVAS_ANALYSIS_CACHE_SECONDS, a submission whose metadata digest
+matches and whose dHash is within CANVAS_DHASH_MAX_DISTANCE bits of an
+earlier one gets that analysis and stored session id back. Identical
+submissions in flight share one analysis. Entries live in process memory; the
+caller supplies a lookup of recently stored sessions for other workers.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import numpy as np
+from PIL import Image
+from config.settings import settings
+from utils.logger import logger
+
+
+@dataclass(frozen=True)
+class CanvasFingerprint:
+    user_id: str
+    metadata_digest: str
+    dhash: int
+
+
+@dataclass
+class CachedAnalysis:
+    analysis: Any  # AnalysisResponse
+    stored_id: Optional[str]
+    dhash: int
+    expires_at: float
+
+
+def image_dhash(image: Image.Image) -> int:
+    """64-bit difference hash: sign of horizontal gradients on a 9x8 grayscale thumbnail."""
+    pixels = np.asarray(image.convert("L").resize((9, 8), Image.LANCZOS), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view(">u8")[0])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def metadata_digest(summary: Dict[str, Any]) -> str:
+    """Digest of compute_summary_statistics output, without ids or timestamps."""
+    fields = {
+        "strokes": summary["totalStrokes"],
+        "penStrokes": summary["penStrokes"],
+        "eraserStrokes": summary["eraserStrokes"],
+        "points": summary["totalPoints"],
+        "colors": sorted(summary["colorsUsed"]),
+        "emotionSnapshots": summary["emotionSnapshotCount"],
+        "dominantEmotion": summary["dominantEmotion"],
+        "durationSeconds": round(summary["durationSeconds"]),
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+
+class CanvasAnalysisCache:
+    """Recent analyses per user and metadata digest, matched by dHash distance."""
+
+    def __init__(self, ttl_seconds: float, max_distance: int, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], List[CachedAnalysis]]" = OrderedDict()
+        self._inflight: Dict[Tuple[str, str, int], asyncio.Future] = {}
+        self.stats = {"hits": 0, "shared_in_flight": 0, "stored_hits": 0, "misses": 0}
+
+    def get(self, fingerprint: CanvasFingerprint) -> Optional[CachedAnalysis]:
+        key = (fingerprint.user_id, fingerprint.metadata_digest)
+        entries = self._entries.get(key)
+        if not entries:
+            return None
+        now = time.monotonic()
+        entries[:] = [entry for entry in entries if entry.expires_at > now]
+        if not entries:
+            del self._entries[key]
+            return None
+        for entry in reversed(entries):
+            if hamming(entry.dhash, fingerprint.dhash) <= self.max_distance:
+                self._entries.move_to_end(key)
+                return entry
+        return None
+
+    def put(self, fingerprint: CanvasFingerprint, analysis: Any, stored_id: Optional[str]) -> None:
+        key = (fingerprint.user_id, fingerprint.metadata_digest)
+        entry = CachedAnalysis(analysis, stored_id, fingerprint.dhash, time.monotonic() + self.ttl_seconds)
+        self._entries.setdefault(key, []).append(entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _inflight_match(self, fingerprint: CanvasFingerprint) -> Optional[asyncio.Future]:
+        for (user_id, digest, dhash), future in self._inflight.items():
+            if (
+                user_id == fingerprint.user_id
+                and digest == fingerprint.metadata_digest
+                and hamming(dhash, fingerprint.dhash) <= self.max_distance
+            ):
+                return future
+        return None
+
+    async def run(
+        self,
+        fingerprint: CanvasFingerprint,
+        compute: Callable[[], Awaitable[Tuple[Any, Optional[str]]]],
+        lookup: Optional[Callable[[], Awaitable[Optional[Tuple[Any, Optional[str]]]]]] = None,
+    ) -> Tuple[Any, Optional[str], bool]:
+        """
+        Return a cached (analysis, stored id) or compute and cache one.
+
+        Args:
+            fingerprint: The submission's fingerprint
+            compute: Analyses and stores the submission; returns (analysis, stored id)
+            lookup: Finds a matching session stored within the window (other workers)
+
+        Returns:
+            (analysis, stored id, whether it came from the cache)
+        """
+        cached = self.get(fingerprint)
+        if cached is not None:
+            self.stats["hits"] += 1
+            return cached.analysis, cached.stored_id, True
+
+        future = self._inflight_match(fingerprint)
+        if future is not None:
+            try:
+                analysis, stored_id = await asyncio.shield(future)
+                self.stats["shared_in_flight"] += 1
+                return analysis, stored_id, True
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The request being waited on was cancelled; analyse this one
+
+        key = (fingerprint.user_id, fingerprint.metadata_digest, fingerprint.dhash)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            found = None
+            if lookup is not None:
+                try:
+                    found = await lookup()
+                except Exception as e:
+                    logger.warning(f"Stored canvas analysis lookup failed: {e}")
+            from_store = found is not None
+            if from_store:
+                self.stats["stored_hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                found = await compute()
+            if getattr(found[0], "source", None) != "fallback":
+                # Gemini failed for a fallback; a later retry may succeed
+                self.put(fingerprint, *found)
+            future.set_result(found)
+            return found[0], found[1], from_store
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters get the error; mark it retrieved for when there are none
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+
+canvas_analysis_cache = CanvasAnalysisCache(
+    ttl_seconds=settings.CANVAS_ANALYSIS_CACHE_SECONDS,
+    max_distance=settings.CANVAS_DHASH_MAX_DISTANCE,
+)
@@ -0,0 +1,127 @@
+"""
+Moner Canvus image storage
+
+Canvas sessions arrive with the final drawing as a PNG data URL. Storing it in
+the vector store metadata made every session listing carry megabytes of
+base64, so on ingestion the image is written once to media storage
+(content-addressed, served by /moner-canvus/images) and a small WebP thumbnail
+is generated. The thumbnail is kept inline in the session metadata as a data
+URI for list views and also stored as a file. Until settings.PUBLIC_BASE_URL
+is configured the image stays inline (see services.media_images).
+"""
+
+import asyncio
+import base64
+import binascii
+import io
+import re
+from typing import Any, Dict, Optional
+from config.settings import settings
+from services.media_images import (
+    IMAGE_EXTENSIONS,
+    SAFE_SEGMENT,
+    content_filename,
+    decode_data_url,
+    image_extraction_enabled,
+    media_url,
+)
+from services.s3_storage_adapter import media_storage
+from utils.logger import logger
+
+_SAFE_FILENAME = re.compile(r"^[a-f0-9]{32}(-thumb)?\.(png|jpg|gif|webp)$")
+
+
+def canvas_image_key(user_id: str, filename: str) -> Optional[str]:
+    """Return the storage key of a canvas image, or None if the name is invalid."""
+    if not SAFE_SEGMENT.match(user_id) or not _SAFE_FILENAME.match(filename):
+        return None
+    return f"media/canvas/{user_id}/{filename}"
+
+
+def canvas_image_url(user_id: str, filename: str) -> str:
+    """Return the absolute URL a stored canvas image is served from."""
+    return media_url(f"/moner-canvus/images/{user_id}/{filename}")
+
+
+def thumbnail_filename(image_filename: str) -> str:
+    return f"{image_filename.split('.')[0]}-thumb.webp"
+
+
+def make_thumbnail(image_bytes: bytes, size: int, quality: int) -> bytes:
+    """Downscale to fit size x size and encode as WebP (transparency flattened on white)."""
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        image.thumbnail((size, size), Image.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format="WEBP", quality=quality, method=4)
+        return output.getvalue()
+
+
+async def store_canvas_image(user_id: str, data_url: str) -> Optional[Dict[str, Any]]:
+    """
+    Store a canvas drawing and its thumbnail in media storage.
+
+    Args:
+        user_id: Owner of the session
+        data_url: The session's finalImageBase64
+
+    Returns:
+        {"image_file", "thumbnail_file", "thumbnail_data", "image_bytes"}, or
+        None if the image cannot be stored or PUBLIC_BASE_URL is not set
+        (callers keep it inline instead)
+    """
+    if not image_extraction_enabled():
+        logger.warning("PUBLIC_BASE_URL is not set; keeping canvas image inline")
+        return None
+    if not SAFE_SEGMENT.match(user_id):
+        logger.warning(f"Not storing canvas image for unsafe user id {user_id!r}")
+        return None
+    try:
+        mime_type, image_bytes = decode_data_url(data_url)
+    except (binascii.Error, ValueError):
+        logger.warning("Canvas image is not valid base64; keeping it inline")
+        return None
+    extension = IMAGE_EXTENSIONS.get(mime_type)
+    if extension is None:
+        logger.warning(f"Unsupported canvas image type {mime_type}; keeping it inline")
+        return None
+
+    try:
+        thumbnail = await asyncio.to_thread(
+            make_thumbnail,
+            image_bytes,
+            settings.CANVAS_THUMBNAIL_SIZE,
+            settings.CANVAS_THUMBNAIL_QUALITY,
+        )
+    except Exception as e:
+        logger.warning(f"Could not create canvas thumbnail: {str(e)}")
+        return None
+
+    image_file = content_filename(image_bytes, extension)
+    thumbnail_file = thumbnail_filename(image_file)
+    await media_storage.save_file(
+        image_bytes, user_id, image_file, content_type=mime_type,
+        key=canvas_image_key(user_id, image_file),
+    )
+    await media_storage.save_file(
+        thumbnail, user_id, thumbnail_file, content_type="image/webp",
+        key=canvas_image_key(user_id, thumbnail_file),
+    )
+    logger.info(
+        f"Stored canvas image {image_file} for user {user_id}: "
+        f"{len(data_url)} base64 chars -> {len(image_bytes)} bytes, thumbnail {len(thumbnail)} bytes"
+    )
+    return {
+        "image_file": image_file,
+        "thumbnail_file": thumbnail_file,
+        "thumbnail_data": "data:image/webp;base64," + base64.b64encode(thumbnail).decode("ascii"),
+        "image_bytes": len(image_bytes),
+    }
@@ -0,0 +1,303 @@
+"""
+Chunked upload of long Moner Canvus sessions
+
+A long session sent as one MonerCanvusPayload is a single large body that is
+buffered and validated at once. Instead, the client can:
+
+1. open an upload with the session metadata (POST /moner-canvus/uploads)
+2. append batches of complete strokes, erases and emotion snapshots while
+   drawing (POST /moner-canvus/uploads/{id}/chunks), JSON or compact
+3. finalise with the image (POST /moner-canvus/uploads/{id}/finalize)
+
+Every chunk is folded into the session's statistics as it arrives (stroke
+metrics in a StrokeAccumulator, emotion snapshots in an EmotionAccumulator,
+pen colours, a running hash of the events) and then dropped, so a worker
+holds one chunk at a time and a bounded state per open upload: at most
+about 200 KB for the default canvas and 350 KB for a CANVAS_UPLOAD_MAX_SIDE
+one (ink grid, histograms and CANVAS_UPLOAD_MAX_EMOTION_BINS emotion bins).
+Finalising builds the summary from the accumulated state and only runs the
+image analysis and Gemini call.
+
+Chunks carry a sequence number from 0: a re-sent chunk (seq already
+received) is ignored, and a gap is rejected, so a client can retry or resume
+from next_seq. Uploads live in process memory for CANVAS_UPLOAD_TTL_SECONDS
+after their last chunk; with several workers, route an upload's requests to
+one worker. A client whose upload was lost (404) sends the whole session to
+POST /moner-canvus/sessions instead.
+"""
+
+import hashlib
+import json
+import re
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from config.settings import settings
+from services.content_dedup import hash_parts
+from services.emotion_series import EmotionAccumulator, snapshot_arrays
+from services.moner_canvus_gemini import (
+    CompactStroke,
+    EmotionSnapshot,
+    EraseEvent,
+    FiniteModel,
+    MonerCanvusPayload,
+    SessionMetadata,
+    StrokeEvent,
+    build_summary_statistics,
+    decode_image_from_base64,
+)
+from services.stroke_analytics import DEFAULT_CANVAS_SIZE, StrokeAccumulator, StrokeArrays
+from services.stroke_encoding import DEFAULT_SCALE, decode_strokes
+
+_UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class CanvasUploadOpen(FiniteModel):
+    """Start of a chunked session upload."""
+    userId: str
+    sessionId: str
+    startedAt: str  # ISO datetime
+    usedCamera: bool = False
+    clientVersion: str
+    # Drawing canvas size in the units of the stroke coordinates
+    canvasWidth: int = Field(default=DEFAULT_CANVAS_SIZE[0], gt=0, le=settings.CANVAS_UPLOAD_MAX_SIDE)
+    canvasHeight: int = Field(default=DEFAULT_CANVAS_SIZE[1], gt=0, le=settings.CANVAS_UPLOAD_MAX_SIDE)
+
+
+class CanvasUploadChunk(FiniteModel):
+    """A batch of session events; strokes must be complete."""
+    seq: int = Field(ge=0)
+    strokes: List[StrokeEvent] = []
+    erases: List[EraseEvent] = []
+    emotions: List[EmotionSnapshot] = []
+
+    def stroke_arrays(self) -> StrokeArrays:
+        return StrokeArrays.from_strokes(self.strokes)
+
+    def stroke_colors(self) -> List[Tuple[str, str]]:
+        return [(s.tool, s.color) for s in self.strokes]
+
+
+class CompactCanvasUploadChunk(FiniteModel):
+    """
+    A batch of session events with stroke points packed as base64 int16
+    deltas, like CompactMonerCanvusPayload.
+    """
+    seq: int = Field(ge=0)
+    strokes: List[CompactStroke] = []
+    points: str = ""
+    scale: float = Field(default=DEFAULT_SCALE, gt=0)
+    erases: List[EraseEvent] = []
+    emotions: List[EmotionSnapshot] = []
+
+    def stroke_arrays(self) -> StrokeArrays:
+        """
+        Raises:
+            ValueError: If the packed points do not match the stroke headers
+        """
+        return decode_strokes(self.strokes, self.points, self.scale)
+
+    def stroke_colors(self) -> List[Tuple[str, str]]:
+        return [(s.tool, s.color) for s in self.strokes]
+
+
+class CanvasUploadFinalize(FiniteModel):
+    """End of a chunked upload: the final image and session end."""
+    endedAt: str  # ISO datetime
+    durationMs: float
+    usedCamera: Optional[bool] = None  # Overrides the value given when opening
+    finalImageBase64: str  # data URL: data:image/png;base64,...
+
+
+class CanvasUploadStatus(BaseModel):
+    upload_id: str
+    user_id: str
+    session_id: str
+    next_seq: int  # seq of the next chunk to send
+    strokes: int
+    points: int
+    erases: int
+    emotions: int
+    expires_at: datetime
+
+
+class CanvasUpload:
+    """The accumulated state of one open upload."""
+
+    def __init__(self, upload_id: str, request: CanvasUploadOpen):
+        self.upload_id = upload_id
+        self.request = request
+        self.next_seq = 0
+        self.strokes = StrokeAccumulator((request.canvasWidth, request.canvasHeight))
+        self.colors: Dict[str, None] = {}  # pen colours in order of first use
+        self.erases = 0
+        self.emotions = EmotionAccumulator(settings.CANVAS_UPLOAD_MAX_EMOTION_BINS)
+        self.events_digest = hashlib.sha256()
+        self.touched = time.monotonic()
+
+    @property
+    def user_id(self) -> str:
+        return self.request.userId
+
+    def add(self, chunk: Any) -> bool:
+        """
+        Fold a CanvasUploadChunk or CompactCanvasUploadChunk into the state.
+
+        Returns:
+            False if the chunk was already received (a retry), else True
+
+        Raises:
+            ValueError: If chunks are missing before this one, it is too
+                large or its packed points are invalid
+        """
+        if chunk.seq < self.next_seq:
+            return False
+        if chunk.seq > self.next_seq:
+            raise ValueError(f"Expected chunk {self.next_seq}, got {chunk.seq}")
+
+        arrays = chunk.stroke_arrays()
+        if arrays.point_count > settings.CANVAS_UPLOAD_MAX_CHUNK_POINTS:
+            raise ValueError(
+                f"Chunk has {arrays.point_count} points; "
+                f"the limit is {settings.CANVAS_UPLOAD_MAX_CHUNK_POINTS}"
+            )
+        emotion_t, emotion_values = snapshot_arrays(chunk.emotions)
+
+        # StrokeAccumulator.add leaves the strokes unchanged if it raises, and
+        # nothing after it can fail, so a rejected chunk changes no state
+        self.strokes.add(arrays)
+        for tool, color in chunk.stroke_colors():
+            if tool == "pen":
+                self.colors.setdefault(color, None)
+        self.erases += len(chunk.erases)
+        self.emotions.add(emotion_t, emotion_values)
+        self.events_digest.update(
+            json.dumps(chunk.model_dump(exclude={"seq"}), sort_keys=True, separators=(",", ":")).encode("utf-8")
+        )
+        self.next_seq += 1
+        self.touched = time.monotonic()
+        return True
+
+    def status(self) -> CanvasUploadStatus:
+        idle = time.monotonic() - self.touched
+        return CanvasUploadStatus(
+            upload_id=self.upload_id,
+            user_id=self.user_id,
+            session_id=self.request.sessionId,
+            next_seq=self.next_seq,
+            strokes=self.strokes.stroke_count,
+            points=self.strokes.point_count,
+            erases=self.erases,
+            emotions=self.emotions.count,
+            expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.CANVAS_UPLOAD_TTL_SECONDS - idle),
+        )
+
+    def to_payload(self, request: CanvasUploadFinalize) -> Tuple[MonerCanvusPayload, str]:
+        """
+        The session as a payload whose statistics are already computed, and
+        its content hash (image and events; not comparable with
+        canvas_content_hash of the same session sent in one body).
+        """
+        metadata = SessionMetadata(
+            userId=self.user_id,
+            sessionId=self.request.sessionId,
+            startedAt=self.request.startedAt,
+            endedAt=request.endedAt,
+            durationMs=request.durationMs,
+            usedCamera=self.request.usedCamera if request.usedCamera is None else request.usedCamera,
+            clientVersion=self.request.clientVersion,
+            canvasWidth=self.request.canvasWidth,
+            canvasHeight=self.request.canvasHeight,
+        )
+        payload = MonerCanvusPayload(metadata=metadata, finalImageBase64=request.finalImageBase64)
+
+        averages = self.emotions.averages()
+        series = self.emotions.series()
+
+        payload._emotion_series = series
+        payload._emotion_averages = averages
+        payload._summary = build_summary_statistics(
+            metadata,
+            self.strokes.result(erase_events=self.erases),
+            list(self.colors),
+            averages,
+            self.emotions.count,
+            series,
+        )
+
+        try:
+            image_bytes = decode_image_from_base64(request.finalImageBase64)
+        except ValueError:
+            image_bytes = request.finalImageBase64.encode("utf-8")
+        return payload, hash_parts([image_bytes, self.events_digest.digest()])
+
+
+class CanvasUploadStore:
+    """Open uploads by id, expiring CANVAS_UPLOAD_TTL_SECONDS after their last chunk."""
+
+    def __init__(self, ttl_seconds: float, max_open: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_open = max_open
+        self._uploads: "OrderedDict[str, CanvasUpload]" = OrderedDict()
+        self.stats = {
+            "opened": 0, "chunks": 0, "duplicate_chunks": 0, "finalized": 0, "expired": 0, "evicted": 0
+        }
+
+    def _expire(self) -> None:
+        # Ordered by last activity, so expired uploads are at the front
+        deadline = time.monotonic() - self.ttl_seconds
+        while self._uploads:
+            upload = next(iter(self._uploads.values()))
+            if upload.touched > deadline:
+                break
+            self._uploads.popitem(last=False)
+            self.stats["expired"] += 1
+
+    def open(self, request: CanvasUploadOpen) -> CanvasUpload:
+        self._expire()
+        upload = CanvasUpload(uuid.uuid4().hex, request)
+        self._uploads[upload.upload_id] = upload
+        self.stats["opened"] += 1
+        while len(self._uploads) > self.max_open:
+            # The least recently active upload gives way
+            self._uploads.popitem(last=False)
+            self.stats["evicted"] += 1
+        return upload
+
+    def get(self, upload_id: str, user_id: str) -> Optional[CanvasUpload]:
+        """The user's open upload, or None if unknown, expired or another user's."""
+        self._expire()
+        if not _UPLOAD_ID_PATTERN.match(upload_id):
+            return None
+        upload = self._uploads.get(upload_id)
+        if upload is None or upload.user_id != user_id:
+            return None
+        return upload
+
+    def add_chunk(self, upload: CanvasUpload, chunk: Any) -> None:
+        """
+        Raises:
+            ValueError: See CanvasUpload.add
+        """
+        if upload.add(chunk):
+            self.stats["chunks"] += 1
+            self._uploads.move_to_end(upload.upload_id)
+        else:
+            self.stats["duplicate_chunks"] += 1
+
+    def finish(self, upload: CanvasUpload) -> None:
+        """Forget a finalised upload."""
+        if self._uploads.pop(upload.upload_id, None) is not None:
+            self.stats["finalized"] += 1
+
+    def open_count(self) -> int:
+        return len(self._uploads)
+
+
+canvas_upload_store = CanvasUploadStore(
+    ttl_seconds=settings.CANVAS_UPLOAD_TTL_SECONDS,
+    max_open=settings.CANVAS_UPLOAD_MAX_OPEN,
+)
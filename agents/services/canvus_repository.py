@@ -0,0 +1,140 @@
+"""
+Moner Canvus session summary table access
+
+Typed, indexed summaries of stored canvas sessions (see
+migrations/009_canvus_sessions.sql). The vector rows in langchain_pg_embedding
+keep the analysis text, embedding and thumbnail; aggregate views such as the
+weekly timeline, and each session's emotion trajectory, are read from here.
+"""
+
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import text
+from services.database import get_async_engine
+
+
+async def insert_session(
+    stored_id: str,
+    user_id: str,
+    session_id: str,
+    created_at: datetime,
+    tags: Sequence[str],
+    high_distress: bool,
+    dominant_emotion: Optional[str],
+    mood: Optional[str],
+    stroke_count: int,
+    color_count: int,
+    duration_seconds: float,
+    analysis_source: str,
+    emotion_series: Optional[Tuple[bytes, bytes]] = None,
+) -> None:
+    """
+    Insert the summary row of a stored session (no-op if it exists).
+
+    emotion_series is the session's downsampled EmotionSeries.to_bytes()
+    (uint32 ms offsets, float16 values), if the camera was used.
+    """
+    emotion_times, emotion_values = emotion_series or (None, None)
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO canvus_sessions (
+                    id, user_id, session_id, created_at, tags, high_distress,
+                    dominant_emotion, mood, stroke_count, color_count,
+                    duration_seconds, analysis_source, emotion_times, emotion_values
+                )
+                VALUES (
+                    :id, :user_id, :session_id, :created_at, :tags, :high_distress,
+                    :dominant_emotion, :mood, :stroke_count, :color_count,
+                    :duration_seconds, :analysis_source, :emotion_times, :emotion_values
+                )
+                ON CONFLICT (id) DO NOTHING
+            """),
+            {
+                "id": stored_id,
+                "user_id": user_id,
+                "session_id": session_id,
+                "created_at": created_at,
+                "tags": list(tags),
+                "high_distress": high_distress,
+                "dominant_emotion": dominant_emotion,
+                "mood": mood,
+                "stroke_count": stroke_count,
+                "color_count": color_count,
+                "duration_seconds": duration_seconds,
+                "analysis_source": analysis_source,
+                "emotion_times": emotion_times,
+                "emotion_values": emotion_values,
+            },
+        )
+
+
+async def weekly_timeline(user_id: str, since: datetime, timezone: str) -> List[Any]:
+    """
+    Per-week session counts, distress flags and duration since a time.
+
+    Rows: week (date of the week's Monday in the timezone), sessions,
+    high_distress, avg_duration_seconds, tags (tag -> count) and emotions
+    (dominant emotion -> count).
+    """
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("""
+                WITH recent AS (
+                    SELECT date_trunc('week', created_at AT TIME ZONE :tz)::date AS week,
+                           tags, high_distress, dominant_emotion, duration_seconds
+                    FROM canvus_sessions
+                    WHERE user_id = :user_id AND created_at >= :since
+                ),
+                weeks AS (
+                    SELECT week,
+                           count(*) AS sessions,
+                           count(*) FILTER (WHERE high_distress) AS high_distress,
+                           avg(duration_seconds) AS avg_duration_seconds
+                    FROM recent
+                    GROUP BY week
+                ),
+                tag_counts AS (
+                    SELECT week, jsonb_object_agg(tag, n) AS tags
+                    FROM (
+                        SELECT week, tag, count(*) AS n
+                        FROM recent, unnest(tags) AS tag
+                        GROUP BY week, tag
+                    ) t
+                    GROUP BY week
+                ),
+                emotion_counts AS (
+                    SELECT week, jsonb_object_agg(dominant_emotion, n) AS emotions
+                    FROM (
+                        SELECT week, dominant_emotion, count(*) AS n
+                        FROM recent
+                        WHERE dominant_emotion IS NOT NULL
+                        GROUP BY week, dominant_emotion
+                    ) e
+                    GROUP BY week
+                )
+                SELECT w.week, w.sessions, w.high_distress, w.avg_duration_seconds,
+                       coalesce(t.tags, '{}'::jsonb) AS tags,
+                       coalesce(e.emotions, '{}'::jsonb) AS emotions
+                FROM weeks w
+                LEFT JOIN tag_counts t USING (week)
+                LEFT JOIN emotion_counts e USING (week)
+                ORDER BY w.week
+            """),
+            {"user_id": user_id, "since": since, "tz": timezone},
+        )
+        return result.fetchall()
+
+
+async def get_emotion_series(stored_id: str, user_id: str) -> Optional[Any]:
+    """The session's stored emotion series row (emotion_times, emotion_values), or None."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT emotion_times, emotion_values
+                FROM canvus_sessions
+                WHERE id = :id AND user_id = :user_id
+            """),
+            {"id": stored_id, "user_id": user_id},
+        )
+        return result.fetchone()
@@ -0,0 +1,65 @@
+"""
+Content hashing for duplicate submissions
+
+Clients autosave and re-submit unchanged content. Hashing a normalised form of
+the content lets storage reuse an existing embedding and analysis instead of
+paying for new model calls, and near-identical autosaves update in place.
+"""
+
+import difflib
+import hashlib
+import html
+import re
+import unicodedata
+from typing import Iterable
+
+_TAG_PATTERN = re.compile(r"<[^>]*>")
+_IMG_SRC_PATTERN = re.compile(r"""<img\b[^>]*?\bsrc\s*=\s*(["'])(.*?)\1""", re.IGNORECASE)
+
+# Work avoided through deduplication, since process start
+dedup_stats = {
+    "diary_exact_duplicates": 0,
+    "diary_near_duplicate_updates": 0,
+    "canvas_exact_duplicates": 0,
+    "analyses_skipped": 0,
+    "embeddings_skipped": 0,
+}
+
+
+def normalise_text(content: str) -> str:
+    """Strip HTML, decode entities, apply NFKC and collapse whitespace."""
+    if not content:
+        return ""
+    text = html.unescape(_TAG_PATTERN.sub(" ", content))
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def hash_parts(parts: Iterable[bytes]) -> str:
+    """SHA-256 over length-prefixed parts, so part boundaries are unambiguous."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def html_content_hash(content: str) -> str:
+    """
+    Hash rich-text content by its visible text and embedded image sources.
+
+    Formatting-only changes hash the same; image-only entries still differ
+    because stored images are content-addressed URLs.
+    """
+    images = sorted(match.group(2) for match in _IMG_SRC_PATTERN.finditer(content or ""))
+    return hash_parts([normalise_text(content).encode("utf-8"), " ".join(images).encode("utf-8")])
+
+
+def is_near_duplicate(a: str, b: str, threshold: float) -> bool:
+    """Whether two normalised texts have a difflib similarity ratio >= threshold."""
+    matcher = difflib.SequenceMatcher(None, a, b, autojunk=False)
+    # Cheap upper bounds first; the full ratio is quadratic in the worst case
+    return (
+        matcher.real_quick_ratio() >= threshold
+        and matcher.quick_ratio() >= threshold
+        and matcher.ratio() >= threshold
+    )
@@ -0,0 +1,158 @@
+"""
+Shared PostgreSQL access layer
+
+Provides one async engine (asyncpg) and one sync engine (psycopg2) per process,
+both with a tuned connection pool, so that services and PGVector instances share
+connections instead of each opening their own.
+
+Usage:
+    from services.database import get_async_engine
+
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(text("SELECT 1"))
+"""
+
+from typing import Any, Dict, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from config.settings import settings
+from utils.logger import logger
+
+_async_engine: Optional[AsyncEngine] = None
+_sync_engine: Optional[Engine] = None
+
+
+def _pool_options() -> Dict[str, Any]:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _session_settings() -> Dict[str, str]:
+    """
+    Per-connection planner and pgvector settings.
+
+    Partial HNSW indexes (one per collection, WHERE collection_id = ...) are
+    only provably usable with the collection id known at planning time, so
+    generic plans of cached prepared statements are disabled.
+    """
+    return {
+        "plan_cache_mode": "force_custom_plan",
+        "hnsw.ef_search": str(settings.VECTOR_EF_SEARCH),
+        "hnsw.iterative_scan": settings.VECTOR_ITERATIVE_SCAN,
+        "hnsw.max_scan_tuples": str(settings.VECTOR_MAX_SCAN_TUPLES),
+    }
+
+
+def _async_url_and_connect_args():
+    """Build the asyncpg URL, translating libpq-only query options."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
+    query = dict(url.query)
+    connect_args: Dict[str, Any] = {
+        "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {"application_name": settings.APP_NAME, **_session_settings()},
+    }
+
+    # asyncpg does not understand sslmode; map it to its ssl argument
+    sslmode = query.pop("sslmode", None)
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = "require" if sslmode in ("require", "prefer", "allow") else sslmode
+
+    # SQLAlchemy-level cache of prepared statements per connection
+    query["prepared_statement_cache_size"] = str(settings.DB_STATEMENT_CACHE_SIZE)
+    return url.set(query=query), connect_args
+
+
+def _register_vector_codec(engine: AsyncEngine) -> None:
+    """Teach asyncpg connections the pgvector type used by PGVector."""
+    try:
+        from pgvector.asyncpg import register_vector
+    except ImportError:
+        logger.warning("pgvector package not installed; vector columns use text I/O")
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        try:
+            dbapi_connection.run_async(register_vector)
+        except Exception as e:
+            # The vector extension may not exist yet on a fresh database
+            logger.warning(f"Could not register pgvector codec: {e}")
+
+
+def get_async_engine() -> AsyncEngine:
+    """Return the process-wide async engine, creating it on first use."""
+    global _async_engine
+    if _async_engine is None:
+        url, connect_args = _async_url_and_connect_args()
+        _async_engine = create_async_engine(
+            url, connect_args=connect_args, **_pool_options()
+        )
+        _register_vector_codec(_async_engine)
+        logger.info(
+            f"Created async PostgreSQL engine (pool_size={settings.DB_POOL_SIZE}, "
+            f"max_overflow={settings.DB_MAX_OVERFLOW})"
+        )
+    return _async_engine
+
+
+def get_sync_engine() -> Engine:
+    """Return the process-wide sync engine for code paths that cannot be async."""
+    global _sync_engine
+    if _sync_engine is None:
+        options = " ".join(f"-c {name}={value}" for name, value in _session_settings().items())
+        _sync_engine = create_engine(
+            settings.DATABASE_URL, connect_args={"options": options}, **_pool_options()
+        )
+        logger.info("Created sync PostgreSQL engine")
+    return _sync_engine
+
+
+async def check_connection() -> bool:
+    """Run a trivial query to verify the database is reachable."""
+    try:
+        async with get_async_engine().connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        logger.info("Successfully connected to PostgreSQL database")
+        return True
+    except Exception as e:
+        logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
+        return False
+
+
+def _describe_pool(engine: Optional[Any]) -> Optional[Dict[str, Any]]:
+    if engine is None:
+        return None
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Return connection pool statistics for both engines."""
+    return {
+        "async": _describe_pool(_async_engine.sync_engine if _async_engine else None),
+        "sync": _describe_pool(_sync_engine),
+    }
+
+
+async def dispose_engines() -> None:
+    """Close all pooled connections (called on application shutdown)."""
+    global _async_engine, _sync_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _sync_engine is not None:
+        _sync_engine.dispose()
+        _sync_engine = None
+    logger.info("Disposed PostgreSQL engines")
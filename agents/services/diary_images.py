@@ -0,0 +1,107 @@
+"""
+Diary image extraction
+
+Diary content is HTML from the rich-text editor, and inline images arrive as
+base64 data URIs. Keeping them in the stored HTML makes every listing and search
+carry megabytes of image data, so on ingestion they are moved to media storage
+and the <img> src is replaced with a URL served by /diary/images.
+
+The URL is stored in the HTML, so it must be absolute: images are only
+extracted once settings.PUBLIC_BASE_URL is configured (see services.media_images).
+"""
+
+import binascii
+import re
+from typing import Dict, Optional
+from services.media_images import (
+    IMAGE_EXTENSIONS,
+    SAFE_SEGMENT,
+    content_filename,
+    decode_base64,
+    image_extraction_enabled,
+    media_url,
+)
+from services.s3_storage_adapter import media_storage
+from utils.logger import logger
+
+_INLINE_IMAGE_PATTERN = re.compile(
+    r"""(<img\b[^>]*?\bsrc\s*=\s*)(["'])data:(image/[a-z0-9.+-]+);base64,([a-z0-9+/=\s]+)\2""",
+    re.IGNORECASE,
+)
+
+_SAFE_FILENAME = re.compile(r"^[a-f0-9]{32}\.(png|jpg|gif|webp)$")
+
+
+def image_storage_key(user_id: str, filename: str) -> Optional[str]:
+    """Return the storage key of a diary image, or None if the name is invalid."""
+    if not SAFE_SEGMENT.match(user_id) or not _SAFE_FILENAME.match(filename):
+        return None
+    return f"media/diary/{user_id}/{filename}"
+
+
+def image_url(user_id: str, filename: str) -> str:
+    """Return the absolute URL a stored diary image is served from."""
+    return media_url(f"/diary/images/{user_id}/{filename}")
+
+
+async def extract_inline_images(content: str, user_id: str) -> str:
+    """
+    Move base64 data-URI images out of diary HTML into media storage.
+
+    Images are content-addressed, so re-saving an entry does not duplicate them.
+
+    Args:
+        content: Diary HTML content
+        user_id: Owner of the entry
+
+    Returns:
+        The HTML with every inline image replaced by a storage-backed URL,
+        or unchanged if PUBLIC_BASE_URL is not configured
+    """
+    if not content or "data:image/" not in content:
+        return content
+    if not image_extraction_enabled():
+        logger.warning("PUBLIC_BASE_URL is not set; keeping diary images inline")
+        return content
+    if not SAFE_SEGMENT.match(user_id):
+        logger.warning(f"Not extracting diary images for unsafe user id {user_id!r}")
+        return content
+
+    replacements: Dict[str, str] = {}
+    extracted_bytes = 0
+
+    for match in _INLINE_IMAGE_PATTERN.finditer(content):
+        mime_type = match.group(3).lower()
+        extension = IMAGE_EXTENSIONS.get(mime_type)
+        if extension is None or match.group(0) in replacements:
+            continue
+        try:
+            image_bytes = decode_base64(match.group(4))
+        except (binascii.Error, ValueError):
+            logger.warning("Skipping malformed inline diary image")
+            continue
+
+        filename = content_filename(image_bytes, extension)
+        await media_storage.save_file(
+            image_bytes,
+            user_id,
+            filename,
+            content_type=mime_type,
+            key=image_storage_key(user_id, filename),
+        )
+        extracted_bytes += len(match.group(4))
+        replacements[match.group(0)] = (
+            f"{match.group(1)}{match.group(2)}{image_url(user_id, filename)}{match.group(2)}"
+        )
+
+    if not replacements:
+        return content
+
+    rewritten = _INLINE_IMAGE_PATTERN.sub(
+        lambda m: replacements.get(m.group(0), m.group(0)), content
+    )
+    logger.info(
+        f"Extracted {len(replacements)} inline diary image(s) for user {user_id}: "
+        f"content {len(content)} -> {len(rewritten)} chars ({extracted_bytes} base64 chars moved)"
+    )
+    return rewritten
@@ -0,0 +1,387 @@
+"""
+Bulk diary import
+
+Imports hundreds of past entries without one request, LLM call, embedding call
+and insert per entry:
+
+1. Uploaded entries (JSON batch or streamed NDJSON) are bulk-inserted as
+   pending rows tagged with (import_id, import_seq).
+2. A background worker claims pending rows in batches, analyses several entries
+   per LLM call, embeds each batch in provider-sized calls and bulk-updates
+   the results.
+
+Uploads are resumable: re-sending with the same import_id skips entries whose
+seq already arrived, and re-posting an import re-queues its unfinished rows.
+Entries without a seq are numbered after the import's last_seq, so a resumed
+upload may send just the remaining entries; to resend overlapping entries,
+give them explicit seqs.
+
+Analysis is charged to the caller's "diary" budget up front, per LLM batch of
+new entries (settings.COST_DIARY_ANALYSIS_TOKENS each). An upload the budget
+cannot cover is rejected with 429 before anything further is stored; large
+imports are split into several uploads of the same import_id.
+"""
+
+import asyncio
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple, Union
+from pydantic import BaseModel, ValidationError
+from config.settings import settings
+from services import diary_repository
+from services.background_worker import RetryingWorker
+from services.content_dedup import html_content_hash
+from services.diary_images import extract_inline_images
+from services.diary_pg import (
+    DiaryEntry,
+    analyze_diary_entries,
+    pg_vector_store,
+    _plain_text,
+    _text_for_embedding,
+)
+from services.mood_analytics import record_mood
+from services.usage_accounting import check_budget, record_deferred_work
+from utils.logger import logger
+
+_IMPORT_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class DiaryImportItem(BaseModel):
+    content: str
+    date: str
+    seq: Optional[int] = None  # Position in the import; defaults to upload order
+    created_at: Optional[datetime] = None
+
+
+class DiaryImportRequest(BaseModel):
+    user_id: str
+    import_id: Optional[str] = None
+    entries: List[DiaryImportItem]
+
+
+class DiaryImportStatus(BaseModel):
+    import_id: str
+    user_id: str
+    status: str  # receiving, processing, completed or failed
+    received: int
+    pending: int
+    completed: int
+    failed: int
+    last_seq: Optional[int] = None  # Resume an interrupted upload after this seq
+    skipped: int = 0  # Entries of the last upload whose seq had already arrived
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+def _created_at(item: DiaryImportItem) -> datetime:
+    """Use the given timestamp, else the entry date, else now."""
+    if item.created_at is not None:
+        created_at = item.created_at
+    else:
+        try:
+            created_at = datetime.fromisoformat(item.date)
+        except ValueError:
+            return datetime.now(timezone.utc)
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return created_at
+
+
+def _analysis_cost(entries: int) -> int:
+    """Budget units charged for analysing `entries` new entries in LLM batches."""
+    batches = -(-entries // settings.DIARY_IMPORT_ANALYSIS_BATCH)
+    return batches * settings.COST_DIARY_ANALYSIS_TOKENS
+
+
+async def _insert_chunk(import_id: str, user_id: str, chunk: List[DiaryImportItem]) -> int:
+    """Insert a chunk of items; returns how many were new."""
+    rows = []
+    for item in chunk:
+        content = await extract_inline_images(item.content, user_id)
+        rows.append(
+            {
+                "id": str(uuid.uuid4()),
+                "user_id": user_id,
+                "entry_date": item.date,
+                "content": content,
+                "plain_text": _plain_text(content),
+                "content_hash": html_content_hash(content),
+                "import_id": import_id,
+                "import_seq": item.seq,
+                "created_at": _created_at(item),
+            }
+        )
+    return await diary_repository.insert_import_entries(rows)
+
+
+async def _receive(
+    import_id: str,
+    user_id: str,
+    items: AsyncIterator[DiaryImportItem],
+    received: int,
+    next_seq: int,
+) -> Tuple[int, int]:
+    """
+    Number and insert items in chunks, charging analysis of the new ones.
+
+    Args:
+        received: Entries the import already holds
+        next_seq: Seq given to the first item without one
+
+    Returns:
+        (items sent, items inserted)
+    """
+    limit = settings.DIARY_IMPORT_MAX_ENTRIES - received
+    chunk: List[DiaryImportItem] = []
+    count = 0
+    inserted = 0
+
+    async def flush() -> None:
+        nonlocal inserted
+        # Check the worst case (all new) before storing; charge what was new
+        check_budget(_analysis_cost(inserted + len(chunk)) - _analysis_cost(inserted))
+        new = await _insert_chunk(import_id, user_id, chunk)
+        record_deferred_work(_analysis_cost(inserted + new) - _analysis_cost(inserted))
+        inserted += new
+
+    async for item in items:
+        if item.seq is None:
+            item.seq = next_seq + count
+        count += 1
+        if count > limit:
+            raise ValueError(
+                f"Import exceeds the limit of {settings.DIARY_IMPORT_MAX_ENTRIES} entries"
+            )
+        chunk.append(item)
+        if len(chunk) >= settings.DIARY_IMPORT_INSERT_BATCH:
+            await flush()
+            chunk = []
+    if chunk:
+        await flush()
+    return count, inserted
+
+
+async def _iterate(items: Iterable[DiaryImportItem]) -> AsyncIterator[DiaryImportItem]:
+    for item in items:
+        yield item
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes]) -> AsyncIterator[DiaryImportItem]:
+    """
+    Parse a streamed NDJSON body into import items, one JSON object per line.
+
+    Raises:
+        ValueError: If a line is not a valid entry
+    """
+    buffer = b""
+    line_number = 0
+
+    def parse(line: bytes) -> Optional[DiaryImportItem]:
+        if not line.strip():
+            return None
+        try:
+            return DiaryImportItem(**json.loads(line))
+        except (json.JSONDecodeError, TypeError, ValidationError) as e:
+            raise ValueError(f"Invalid entry on line {line_number}: {e}")
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            item = parse(line)
+            if item is not None:
+                yield item
+    line_number += 1
+    item = parse(buffer)
+    if item is not None:
+        yield item
+
+
+async def import_entries(
+    user_id: str,
+    items: Union[AsyncIterator[DiaryImportItem], Iterable[DiaryImportItem]],
+    import_id: Optional[str] = None,
+) -> DiaryImportStatus:
+    """
+    Receive an import upload and queue it for background analysis.
+
+    Args:
+        user_id: Owner of the entries
+        items: Import items, as a list or an async stream
+        import_id: Id of an import to resume; a new one is created if omitted
+
+    Returns:
+        The import's progress after the upload was stored
+
+    Raises:
+        ValueError: If the import id is invalid or belongs to another user,
+            or the upload is malformed or too large
+        BudgetExceededError: If the caller's budget cannot cover the analysis
+    """
+    if import_id is None:
+        import_id = str(uuid.uuid4())
+    elif not _IMPORT_ID_PATTERN.match(import_id):
+        raise ValueError("import_id must be 1-64 letters, digits, '-' or '_'")
+
+    if await diary_repository.create_import(import_id, user_id) is None:
+        raise ValueError(f"Import {import_id} not found")
+    progress = await diary_repository.get_import_progress(user_id, import_id)
+    received = progress.received
+    next_seq = progress.last_seq + 1 if progress.last_seq is not None else 0
+
+    if not hasattr(items, "__aiter__"):
+        items = list(items)
+    try:
+        if isinstance(items, list):
+            # Reject what cannot fit before storing any of it
+            if received + len(items) > settings.DIARY_IMPORT_MAX_ENTRIES:
+                raise ValueError(
+                    f"Import exceeds the limit of {settings.DIARY_IMPORT_MAX_ENTRIES} entries"
+                )
+            check_budget(_analysis_cost(len(items)))
+            items = _iterate(items)
+        count, inserted = await _receive(import_id, user_id, items, received, next_seq)
+    except Exception as e:
+        # Entries received so far are kept; the client resumes after last_seq
+        await diary_repository.set_import_status(import_id, "failed", str(e))
+        raise
+
+    await diary_repository.set_import_status(import_id, "processing")
+    import_worker.enqueue(import_id)
+
+    if inserted < count:
+        logger.warning(
+            f"Import {import_id}: skipped {count - inserted} entries whose seq already arrived"
+        )
+    logger.info(f"Received {inserted} new diary entries for import {import_id} (user {user_id})")
+    status = await get_import_status(import_id, user_id)
+    status.skipped = count - inserted
+    return status
+
+
+async def get_import_status(import_id: str, user_id: str) -> Optional[DiaryImportStatus]:
+    """Return the progress of one of a user's imports, or None."""
+    row = await diary_repository.get_import_progress(user_id, import_id)
+    if row is None:
+        return None
+    return DiaryImportStatus(
+        import_id=row.id,
+        user_id=row.user_id,
+        status=row.status,
+        received=row.received,
+        pending=row.pending,
+        completed=row.completed,
+        failed=row.failed,
+        last_seq=row.last_seq,
+        error=row.error,
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+
+
+async def _analyse_batch(rows: List[Any]) -> List[Dict[str, Any]]:
+    """Analyse and embed one claimed batch; returns complete_entries() rows."""
+    entries = [
+        DiaryEntry(content=row.content, date=row.entry_date, user_id=row.user_id)
+        for row in rows
+    ]
+    size = settings.DIARY_IMPORT_ANALYSIS_BATCH
+    groups = await asyncio.gather(
+        *(analyze_diary_entries(entries[i:i + size]) for i in range(0, len(entries), size))
+    )
+    analyses = [analysis for group in groups for analysis in group]
+
+    # One embedding call per provider-sized batch
+    size = settings.EMBEDDING_BATCH_SIZE
+    for start in range(0, len(rows), size):
+        batch = list(zip(rows, analyses))[start:start + size]
+        await pg_vector_store.aadd_texts(
+            texts=[_text_for_embedding(row.content) for row, _ in batch],
+            metadatas=[
+                {
+                    "id": row.id,
+                    "date": row.entry_date,
+                    "user_id": row.user_id,
+                    "mood": analysis.mood,
+                    "confidence": analysis.confidence,
+                    "created_at": row.created_at.isoformat(),
+                }
+                for row, analysis in batch
+            ],
+            ids=[row.id for row, _ in batch],
+        )
+
+    return [
+        {
+            "id": row.id,
+            "mood": analysis.mood,
+            "analysis": analysis.analysis,
+            "confidence": analysis.confidence,
+            "embedding_id": row.id,
+        }
+        for row, analysis in zip(rows, analyses)
+    ]
+
+
+async def _process_import(import_id: str, attempt: int) -> None:
+    """Worker handler: drain the pending entries of an import batch by batch."""
+    processed = 0
+    # Entries whose attempts a restart cut short would otherwise stay unfinished
+    await diary_repository.fail_exhausted_entries(
+        settings.DIARY_ANALYSIS_STALE_SECONDS, settings.DIARY_ANALYSIS_MAX_ATTEMPTS, import_id
+    )
+    while True:
+        rows = await diary_repository.claim_import_batch(
+            import_id,
+            settings.DIARY_IMPORT_PROCESS_BATCH,
+            settings.DIARY_ANALYSIS_STALE_SECONDS,
+            settings.DIARY_ANALYSIS_MAX_ATTEMPTS,
+        )
+        if not rows:
+            break
+        try:
+            results = await _analyse_batch(rows)
+            await diary_repository.complete_entries(results)
+        except Exception as e:
+            await diary_repository.release_entries(
+                [row.id for row in rows], str(e), settings.DIARY_ANALYSIS_MAX_ATTEMPTS
+            )
+            raise
+        for row, result in zip(rows, results):
+            await record_mood(
+                row.user_id, "diary", result["mood"], result["confidence"], row.created_at
+            )
+        processed += len(rows)
+        logger.info(f"Import {import_id}: analysed {processed} entries (attempt {attempt})")
+
+    await diary_repository.set_import_status(import_id, "completed")
+    logger.info(f"Import {import_id} complete")
+
+
+async def _give_up(import_id: str, error: Exception) -> None:
+    """Unfinished entries with attempts left stay pending; re-posting the import resumes them."""
+    await diary_repository.set_import_status(import_id, "failed", str(error))
+
+
+import_worker = RetryingWorker(
+    "diary-import",
+    handler=_process_import,
+    on_give_up=_give_up,
+    concurrency=1,
+    max_attempts=settings.DIARY_ANALYSIS_MAX_ATTEMPTS,
+    base_delay=settings.DIARY_ANALYSIS_RETRY_DELAY,
+)
+
+
+async def recover_imports() -> int:
+    """Re-queue imports interrupted by a restart. Returns the count."""
+    import_ids = await diary_repository.list_active_import_ids()
+    for import_id in import_ids:
+        import_worker.enqueue(import_id)
+    if import_ids:
+        logger.info(f"Re-queued {len(import_ids)} diary imports")
+    return len(import_ids)
@@ -1,15 +1,26 @@
-from typing import Dict, List, TypedDict
+from typing import Dict, List, Optional, TypedDict
 from langchain_groq import ChatGroq
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel
 from langchain_postgres import PGVector
-from sqlalchemy import create_engine, text
-from datetime import datetime
+from datetime import datetime, timezone
 import uuid
+import asyncio
 import re
+import html
+import json
+import time
 from utils.logger import logger
 from config.settings import settings
 from services.embeddings_adapter import get_embeddings
+from services.database import get_async_engine
+from services import diary_repository
+from services.diary_images import extract_inline_images
+from services.pagination import encode_cursor, decode_cursor, clamp_page_size
+from services.usage_accounting import usage_callback, usage_scope, record_deferred_work
+from services.background_worker import RetryingWorker
+from services.content_dedup import dedup_stats, html_content_hash, is_near_duplicate
+from services.mood_analytics import record_mood, replace_mood
 
 # Initialize Groq chat model
 groq_api_key = settings.GROQ_API_KEY
@@ -17,16 +28,8 @@ if not groq_api_key:
     logger.error("GROQ_API_KEY not found in environment variables")
     raise ValueError("GROQ_API_KEY not found in environment variables")
 
-# Initialize database engine
-try:
-    engine = create_engine(settings.DATABASE_URL)
-    # Test connection
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-    logger.info("Successfully connected to PostgreSQL database")
-except Exception as e:
-    logger.error(f"Failed to connect to PostgreSQL: {str(e)}")
-    raise
+# Shared async engine (connectivity is checked at application startup)
+engine = get_async_engine()
 
 # Initialize embeddings (uses Cohere API in production, HuggingFace in dev)
 try:
@@ -40,7 +43,7 @@ except Exception as e:
 try:
     pg_vector_store = PGVector(
         embeddings=embeddings,
-        connection=settings.DATABASE_URL,
+        connection=engine,
         collection_name="diary_entries",
         use_jsonb=True,
     )
@@ -51,7 +54,10 @@ except Exception as e:
     raise
 
 model = ChatGroq(
-    groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile", temperature=0.7
+    groq_api_key=groq_api_key,
+    model_name="llama-3.3-70b-versatile",
+    temperature=0.7,
+    callbacks=[usage_callback],
 )
 
 
@@ -61,6 +67,7 @@ class AgentState(TypedDict):
     mood: str
     analysis: str
     confidence: float
+    error: str
 
 
 # Define Pydantic models
@@ -72,12 +79,21 @@ class DiaryEntry(BaseModel):
 
 class StoredDiaryEntry(DiaryEntry):
     id: str
-    mood: str
-    analysis: str
-    confidence: float
+    content: Optional[str] = None  # Omitted in summary list views
+    preview: Optional[str] = None
+    # Filled in by the background analysis worker; None while pending
+    mood: Optional[str] = None
+    analysis: Optional[str] = None
+    confidence: Optional[float] = None
+    analysis_status: str = "completed"  # pending, processing, completed or failed
     created_at: datetime
 
 
+class DiaryEntryPage(BaseModel):
+    items: List[StoredDiaryEntry]
+    next_cursor: Optional[str] = None
+
+
 class MoodAnalysis(BaseModel):
     mood: str
     analysis: str
@@ -136,6 +152,7 @@ def analyze_mood(state: AgentState) -> AgentState:
             "mood": mood,
             "analysis": analysis,
             "confidence": confidence,
+            "error": "",
         }
     except Exception as e:
         # Log the actual error for debugging
@@ -148,6 +165,7 @@ def analyze_mood(state: AgentState) -> AgentState:
             "mood": "neutral",
             "analysis": "Error in mood analysis",
             "confidence": 0.5,
+            "error": str(e),
         }
 
 
@@ -166,8 +184,13 @@ graph = workflow.compile()
 
 
 # Core functions for diary operations
-def analyze_diary_entry(entry: DiaryEntry) -> MoodAnalysis:
-    """Analyze a diary entry and return mood analysis."""
+async def analyze_diary_entry(entry: DiaryEntry, raise_on_error: bool = False) -> MoodAnalysis:
+    """
+    Analyze a diary entry and return mood analysis.
+
+    By default a failed model call yields a neutral placeholder analysis; with
+    raise_on_error it raises instead so the caller can retry.
+    """
     logger.info(f"Analyzing diary entry for user_id: {entry.user_id}")
     try:
         # Initialize state with all required fields
@@ -176,11 +199,14 @@ def analyze_diary_entry(entry: DiaryEntry) -> MoodAnalysis:
             "mood": "",
             "analysis": "",
             "confidence": 0.0,
+            "error": "",
         }
 
         # Run the graph
         logger.info("Invoking mood analysis graph")
-        result = graph.invoke(initial_state)
+        result = await graph.ainvoke(initial_state)
+        if raise_on_error and result.get("error"):
+            raise RuntimeError(f"Mood analysis failed: {result['error']}")
 
         # Create response
         response = MoodAnalysis(
@@ -197,138 +223,566 @@ def analyze_diary_entry(entry: DiaryEntry) -> MoodAnalysis:
         raise
 
 
-def store_diary_entry(entry: DiaryEntry) -> StoredDiaryEntry:
-    """Store a diary entry in AstraDB with mood analysis."""
+async def analyze_diary_entries(entries: List[DiaryEntry]) -> List[MoodAnalysis]:
+    """
+    Analyze several diary entries with a single model call.
+
+    Entries the model leaves out or answers malformed are analyzed one by one.
+    Raises if the model call fails, so the caller can retry the batch.
+    """
+    numbered = "\n\n".join(
+        f"ENTRY {i}:\n{_plain_text(entry.content)[:settings.DIARY_IMPORT_ENTRY_CHARS]}"
+        for i, entry in enumerate(entries)
+    )
+    prompt = f"""Analyze each of the following diary entries and determine the writer's mood.
+
+    {numbered}
+
+    For every entry provide the primary mood (e.g., happy, sad, anxious, calm),
+    a brief analysis of why you think this is the mood, and your confidence (0-1).
+
+    Respond with only a JSON array, one object per entry, in this format:
+    [{{"entry": 0, "mood": "...", "analysis": "...", "confidence": 0.8}}]
+    """
+
+    response = await model.ainvoke(prompt)
+    results: Dict[int, MoodAnalysis] = {}
+    match = re.search(r"\[.*\]", response.content, re.DOTALL)
+    try:
+        parsed = json.loads(match.group(0)) if match else []
+    except json.JSONDecodeError:
+        parsed = []
+    for item in parsed:
+        try:
+            index = int(item["entry"])
+            results[index] = MoodAnalysis(
+                mood=str(item.get("mood") or "neutral"),
+                analysis=str(item.get("analysis") or "Unable to determine specific mood patterns"),
+                confidence=float(item.get("confidence", 0.5)),
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    missing = [i for i in range(len(entries)) if i not in results]
+    if missing:
+        logger.warning(f"Batch mood analysis missed {len(missing)}/{len(entries)} entries")
+        for i in missing:
+            results[i] = await analyze_diary_entry(entries[i], raise_on_error=True)
+
+    return [results[i] for i in range(len(entries))]
+
+
+def _plain_text(content: str) -> str:
+    """Strip HTML tags and entities, collapsing whitespace."""
+    if not content:
+        return ""
+    return re.sub(r"\s+", " ", html.unescape(re.sub(r"<[^>]*>", " ", content))).strip()
+
+
+def _text_for_embedding(content: str) -> str:
+    """Strip HTML for embedding generation (better semantic search)."""
+    try:
+        text_for_embedding = _plain_text(content)
+        # Ensure we have some text for embedding, fallback to a placeholder if content is only images
+        if not text_for_embedding:
+            text_for_embedding = "diary entry with images"
+        return text_for_embedding[:1000]
+    except Exception:
+        return content[:1000] if content else "diary entry"
+
+
+def _vector_metadata(
+    entry_id: str, entry_date: str, user_id: str, mood: str, confidence: float, created_at: datetime
+) -> Dict:
+    """Vector metadata only carries what filtering needs; content lives in diary_entries."""
+    return {
+        "id": entry_id,
+        "date": entry_date,
+        "user_id": user_id,
+        "mood": mood,
+        "confidence": confidence,
+        "created_at": created_at.isoformat(),
+    }
+
+
+def _row_to_entry(row) -> StoredDiaryEntry:
+    """Build a StoredDiaryEntry from a diary_entries row."""
+    return StoredDiaryEntry(
+        id=row.id,
+        content=row.content,
+        preview=getattr(row, "preview", None),
+        date=row.entry_date,
+        user_id=row.user_id,
+        mood=row.mood,
+        analysis=row.analysis,
+        confidence=row.confidence,
+        analysis_status=row.analysis_status,
+        created_at=row.created_at,
+    )
+
+
+def _metadata_to_entry(metadata: Dict, page_content: str) -> StoredDiaryEntry:
+    """Build a StoredDiaryEntry from legacy vector metadata (rows not yet backfilled)."""
+    return StoredDiaryEntry(
+        id=metadata["id"],
+        content=metadata.get("content", page_content),
+        date=metadata["date"],
+        user_id=metadata["user_id"],
+        mood=metadata["mood"],
+        analysis=metadata.get("analysis", ""),
+        confidence=metadata["confidence"],
+        created_at=datetime.fromisoformat(metadata["created_at"]),
+    )
+
+
+async def _deduplicate(
+    entry: DiaryEntry, duplicate, content: str, plain_text: str, content_hash: str
+) -> Optional[StoredDiaryEntry]:
+    """
+    Resolve a submission against the user's stored entries without model calls.
+
+    Returns the stored entry if the submission repeats (same text, same date)
+    or slightly edits (recent autosave of the same date) an existing entry;
+    None if a new entry is needed. An autosave that changes the text keeps
+    the current analysis until the entry is re-analysed, once the autosaves
+    pause for DIARY_REANALYSIS_DELAY_SECONDS.
+
+    Args:
+        duplicate: The user's latest entry with the same content hash, if any
+    """
+    if duplicate is not None and duplicate.entry_date == entry.date:
+        dedup_stats["diary_exact_duplicates"] += 1
+        dedup_stats["analyses_skipped"] += 1
+        dedup_stats["embeddings_skipped"] += 1
+        if duplicate.content != content:
+            # Formatting-only change: keep the new markup
+            duplicate = await diary_repository.update_entry_content(
+                duplicate.id, content, plain_text, content_hash
+            )
+        logger.info(f"Diary submission matches stored entry {duplicate.id}")
+        return _row_to_entry(duplicate)
+
+    recent = await diary_repository.latest_entry_for_date(
+        entry.user_id, entry.date, settings.DIARY_AUTOSAVE_WINDOW_SECONDS
+    )
+    if recent is not None and is_near_duplicate(
+        recent.plain_text or "", plain_text, settings.DIARY_NEAR_DUPLICATE_RATIO
+    ):
+        dedup_stats["diary_near_duplicate_updates"] += 1
+        reanalyse = recent.plain_text != plain_text
+        if not reanalyse:
+            dedup_stats["analyses_skipped"] += 1
+            dedup_stats["embeddings_skipped"] += 1
+        row = await diary_repository.update_entry_content(
+            recent.id, content, plain_text, content_hash, reanalyse=reanalyse
+        )
+        if reanalyse and analysis_worker.enqueue_later(
+            recent.id, settings.DIARY_REANALYSIS_DELAY_SECONDS
+        ):
+            record_deferred_work(settings.COST_DIARY_ANALYSIS_TOKENS)
+        logger.info(f"Diary submission is an autosave of entry {recent.id}; updated in place")
+        return _row_to_entry(row)
+
+    return None
+
+
+async def store_diary_entry(entry: DiaryEntry) -> StoredDiaryEntry:
+    """
+    Persist a diary entry and queue it for mood analysis.
+
+    The entry is returned immediately with analysis_status "pending"; mood
+    analysis and embedding run on the background worker. Clients poll
+    get_diary_entry or wait_for_analysis for the result.
+
+    Re-submissions and autosaves are deduplicated by content hash: they
+    return or update the existing entry, and identical text saved under
+    another date reuses the stored analysis and embedding vector.
+    """
     logger.info(f"Storing diary entry for user_id: {entry.user_id}")
     try:
-        # Analyze mood
-        logger.info("Analyzing mood for entry")
-        mood_analysis = analyze_diary_entry(entry)
+        # Move inline base64 images to media storage, keep only references
+        content = await extract_inline_images(entry.content, entry.user_id)
+        plain_text = _plain_text(content)
+        content_hash = html_content_hash(content)
+
+        duplicate = await diary_repository.find_by_content_hash(entry.user_id, content_hash)
+        existing = await _deduplicate(entry, duplicate, content, plain_text, content_hash)
+        if existing is not None:
+            return existing
 
-        # Create document for vector store
         doc_id = str(uuid.uuid4())
-        has_img = "<img" in entry.content if entry.content else False
-        logger.info(f"Storing entry with has_img={has_img}, content_len={len(entry.content) if entry.content else 0}")
-        document = {
-            "id": doc_id,
-            "content": entry.content,  # Store full HTML content in metadata for retrieval
-            "date": entry.date,
-            "user_id": entry.user_id,
-            "mood": mood_analysis.mood,
-            "analysis": mood_analysis.analysis,
-            "confidence": mood_analysis.confidence,
-            "created_at": datetime.utcnow().isoformat(),
-        }
+        created_at = datetime.now(timezone.utc)
+        has_img = "<img" in content if content else False
+        logger.info(f"Storing entry with has_img={has_img}, content_len={len(content) if content else 0}")
+
+        # Search hydrates entries by the vector row's id, so an entry reusing
+        # another one's embedding needs its own row holding a copy of it
+        if (
+            duplicate is not None
+            and duplicate.analysis_status == "completed"
+            and await diary_repository.copy_entry_vector(
+                duplicate.embedding_id or duplicate.id,
+                doc_id,
+                _vector_metadata(
+                    doc_id, entry.date, entry.user_id, duplicate.mood, duplicate.confidence, created_at
+                ),
+            )
+        ):
+            # Same text stored under another date: reuse its analysis and vector
+            dedup_stats["analyses_skipped"] += 1
+            dedup_stats["embeddings_skipped"] += 1
+            await diary_repository.insert_entry(
+                entry_id=doc_id,
+                user_id=entry.user_id,
+                entry_date=entry.date,
+                content=content,
+                plain_text=plain_text,
+                created_at=created_at,
+                mood=duplicate.mood,
+                analysis=duplicate.analysis,
+                confidence=duplicate.confidence,
+                embedding_id=doc_id,
+                analysis_status="completed",
+                content_hash=content_hash,
+            )
+            await record_mood(
+                entry.user_id, "diary", duplicate.mood, duplicate.confidence, created_at
+            )
+            logger.info(f"Entry stored with ID: {doc_id}, analysis reused from {duplicate.id}")
+            return StoredDiaryEntry(
+                content=content,
+                date=entry.date,
+                user_id=entry.user_id,
+                id=doc_id,
+                mood=duplicate.mood,
+                analysis=duplicate.analysis,
+                confidence=duplicate.confidence,
+                created_at=created_at,
+            )
 
-        # Store in PostgreSQL - use plain text for embeddings, but store full content in metadata
-        logger.info(f"Storing entry in PostgreSQL with ID: {doc_id}")
-        # Strip HTML for embedding generation (better semantic search)
-        try:
-            text_for_embedding = re.sub(r'<[^>]*>', '', entry.content).strip()
-            # Ensure we have some text for embedding, fallback to a placeholder if content is only images
-            if not text_for_embedding:
-                text_for_embedding = "diary entry with images"
-            text_for_embedding = text_for_embedding[:1000]
-        except Exception:
-            text_for_embedding = entry.content[:1000] if entry.content else "diary entry"
-        
-        pg_vector_store.add_texts(
-            texts=[text_for_embedding], metadatas=[document], ids=[doc_id]
+        await diary_repository.insert_entry(
+            entry_id=doc_id,
+            user_id=entry.user_id,
+            entry_date=entry.date,
+            content=content,
+            plain_text=plain_text,
+            created_at=created_at,
+            analysis_status="pending",
+            content_hash=content_hash,
         )
 
-        # Return stored entry
-        stored_entry = StoredDiaryEntry(
-            content=entry.content,
+        # Charge the deferred LLM work to this request's cost budget
+        record_deferred_work(settings.COST_DIARY_ANALYSIS_TOKENS)
+        analysis_worker.enqueue(doc_id)
+
+        logger.info(f"Entry stored with ID: {doc_id}, analysis queued")
+        return StoredDiaryEntry(
+            content=content,
             date=entry.date,
             user_id=entry.user_id,
             id=doc_id,
+            analysis_status="pending",
+            created_at=created_at,
+        )
+    except Exception as e:
+        logger.error(f"Error storing diary entry: {str(e)}")
+        raise
+
+
+async def _process_entry(entry_id: str, attempt: int) -> None:
+    """Worker handler: analyse mood, embed, and record the result of one entry."""
+    row = await diary_repository.claim_entry(
+        entry_id, settings.DIARY_ANALYSIS_STALE_SECONDS, settings.DIARY_ANALYSIS_MAX_ATTEMPTS
+    )
+    if row is None:
+        # Already completed, failed, out of attempts, or being processed elsewhere
+        return
+
+    try:
+        with usage_scope() as usage:
+            mood_analysis = await analyze_diary_entry(
+                DiaryEntry(content=row.content, date=row.entry_date, user_id=row.user_id),
+                raise_on_error=True,
+            )
+        # Compare with COST_DIARY_ANALYSIS_TOKENS, charged when the entry was queued
+        logger.info(f"Analysis of entry {entry_id} used {usage.total_tokens} tokens")
+
+        document = _vector_metadata(
+            entry_id,
+            row.entry_date,
+            row.user_id,
+            mood_analysis.mood,
+            mood_analysis.confidence,
+            row.created_at,
+        )
+        await pg_vector_store.aadd_texts(
+            texts=[_text_for_embedding(row.content)], metadatas=[document], ids=[entry_id]
+        )
+        stored = await diary_repository.complete_entry(
+            entry_id,
             mood=mood_analysis.mood,
             analysis=mood_analysis.analysis,
             confidence=mood_analysis.confidence,
-            created_at=datetime.utcnow(),
+            embedding_id=entry_id,
+            plain_text=row.plain_text,
         )
-        logger.info(f"Entry stored successfully with ID: {doc_id}")
-        return stored_entry
+        if not stored:
+            # Autosaved while being analysed; the job for the new text replaces this one
+            logger.info(f"Entry {entry_id} changed during analysis; result discarded")
+            return
+        # A re-analysis of an autosaved entry replaces its earlier mood
+        await replace_mood(
+            row.user_id,
+            "diary",
+            row.mood,
+            row.confidence,
+            mood_analysis.mood,
+            mood_analysis.confidence,
+            row.created_at,
+        )
+        logger.info(f"Analysis of entry {entry_id} complete (attempt {attempt})")
     except Exception as e:
-        logger.error(f"Error storing diary entry: {str(e)}")
+        # The stored attempt count survives restarts, unlike the worker's own
+        exhausted = row.analysis_attempts >= settings.DIARY_ANALYSIS_MAX_ATTEMPTS
+        await diary_repository.release_entry(entry_id, str(e), failed=exhausted)
+        if exhausted:
+            logger.error(
+                f"Analysis of entry {entry_id} failed after {row.analysis_attempts} attempts: {str(e)}"
+            )
+            return
         raise
 
 
-def search_diary_entries(
-    query: str, user_id: str, limit: int = 5
+async def _give_up(entry_id: str, error: Exception) -> None:
+    """Mark an entry as failed once its retries are exhausted."""
+    await diary_repository.release_entry(entry_id, str(error), failed=True)
+
+
+analysis_worker = RetryingWorker(
+    "diary-analysis",
+    handler=_process_entry,
+    on_give_up=_give_up,
+    concurrency=settings.DIARY_ANALYSIS_CONCURRENCY,
+    max_attempts=settings.DIARY_ANALYSIS_MAX_ATTEMPTS,
+    base_delay=settings.DIARY_ANALYSIS_RETRY_DELAY,
+)
+
+
+async def recover_pending_entries() -> int:
+    """
+    Re-queue entries left unanalysed by a previous process, and fail those
+    that have used all their attempts. Returns the re-queued count.
+    """
+    exhausted = await diary_repository.fail_exhausted_entries(
+        settings.DIARY_ANALYSIS_STALE_SECONDS, settings.DIARY_ANALYSIS_MAX_ATTEMPTS
+    )
+    if exhausted:
+        logger.warning(f"Marked {exhausted} diary entries out of analysis attempts as failed")
+    entry_ids = await diary_repository.list_unfinished_entry_ids(
+        settings.DIARY_ANALYSIS_STALE_SECONDS, settings.DIARY_ANALYSIS_MAX_ATTEMPTS
+    )
+    for entry_id in entry_ids:
+        analysis_worker.enqueue(entry_id)
+    if entry_ids:
+        logger.info(f"Re-queued {len(entry_ids)} diary entries for analysis")
+    return len(entry_ids)
+
+
+async def get_diary_entry(entry_id: str, user_id: str) -> Optional[StoredDiaryEntry]:
+    """Return one of a user's entries, including its analysis status."""
+    row = await diary_repository.get_entry(user_id, entry_id)
+    return _row_to_entry(row) if row is not None else None
+
+
+async def wait_for_analysis(
+    entry_id: str, user_id: str, timeout: float
+) -> Optional[StoredDiaryEntry]:
+    """
+    Wait until an entry's analysis completes or fails, or the timeout expires.
+
+    Returns the entry in its latest state, or None if it does not exist.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        entry = await get_diary_entry(entry_id, user_id)
+        if entry is None or entry.analysis_status in ("completed", "failed"):
+            return entry
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return entry
+        # Wakes early when this process finishes the job; the database is
+        # re-checked anyway since another worker process may own it
+        await analysis_worker.wait(entry_id, min(remaining, 1.0))
+
+
+SEARCH_MODES = ("auto", "vector", "keyword", "hybrid")
+
+# Counters for comparing search strategies (see benchmarks/diary_search_benchmark.py)
+search_stats = {
+    "vector_searches": 0,
+    "keyword_searches": 0,
+    "keyword_only_answers": 0,
+}
+
+
+def _is_keyword_query(query: str) -> bool:
+    """Short queries (names, places, single topics) are answered lexically first."""
+    return len(query.split()) <= settings.DIARY_KEYWORD_QUERY_MAX_TERMS
+
+
+async def _vector_candidates(query: str, user_id: str, k: int) -> List:
+    """Run similarity search and drop results beyond the relevance cutoff."""
+    search_stats["vector_searches"] += 1
+    results = await pg_vector_store.asimilarity_search_with_score(
+        query=query, k=k, filter={"user_id": user_id}
+    )
+    # Filter out irrelevant results (threshold determined empirically)
+    return [
+        (doc, score)
+        for doc, score in results
+        if score <= settings.DIARY_VECTOR_SCORE_THRESHOLD
+    ]
+
+
+async def _keyword_candidates(query: str, user_id: str, k: int) -> List:
+    search_stats["keyword_searches"] += 1
+    return await diary_repository.keyword_search(user_id, query, k)
+
+
+def _reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Fuse ranked id lists: score(id) = sum over lists of 1 / (k + rank)."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, entry_id in enumerate(ranking, start=1):
+            scores[entry_id] = scores.get(entry_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+async def _hydrate(
+    user_id: str, vector_matches: List, ordered_ids: List[str], rows: Dict
+) -> List[StoredDiaryEntry]:
+    """Build entries in the given order from table rows, falling back to legacy metadata."""
+    missing = [i for i in ordered_ids if i not in rows]
+    if missing:
+        rows = {**rows, **await diary_repository.get_entries_by_ids(user_id, missing)}
+    metadata_by_id = {doc.metadata["id"]: doc for doc, _ in vector_matches}
+
+    entries = []
+    for entry_id in ordered_ids:
+        row = rows.get(entry_id)
+        if row is not None:
+            entries.append(_row_to_entry(row))
+        elif entry_id in metadata_by_id:
+            doc = metadata_by_id[entry_id]
+            entries.append(_metadata_to_entry(doc.metadata, doc.page_content))
+    return entries
+
+
+async def search_diary_entries(
+    query: str, user_id: str, limit: int = 5, mode: str = "auto"
 ) -> List[StoredDiaryEntry]:
-    """Search diary entries using semantic search, or return all entries if query is empty."""
+    """
+    Search diary entries, or return the latest entries if query is empty.
+
+    Modes:
+        vector: embedding similarity search only
+        keyword: full-text search only (no embedding call)
+        hybrid: full-text and vector results fused with reciprocal rank fusion
+        auto: keyword-only for short queries that match lexically, otherwise hybrid
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}', expected one of {SEARCH_MODES}")
+
     logger.info(
-        f"Searching entries for user_id: {user_id}, query: {query}, limit: {limit}"
+        f"Searching entries for user_id: {user_id}, query: {query}, limit: {limit}, mode: {mode}"
     )
+    started = time.perf_counter()
     try:
-        # If query is empty or "recent", return all entries for the user
+        # If query is empty or "recent", return the user's latest entries
         if not query.strip() or query.strip().lower() == "recent":
-            logger.info("Empty/recent query - fetching all entries from database")
-            with engine.connect() as conn:
-                result = conn.execute(
-                    text("""
-                        SELECT id, document, cmetadata 
-                        FROM langchain_pg_embedding 
-                        WHERE cmetadata->>'user_id' = :user_id 
-                        AND collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'diary_entries')
-                        ORDER BY cmetadata->>'created_at' DESC
-                        LIMIT :limit
-                    """),
-                    {"user_id": user_id, "limit": limit}
-                )
-                entries = []
-                for row in result:
-                    metadata = row.cmetadata
-                    content = metadata.get("content", row.document)
-                    # Log whether the content has images
-                    has_img = "<img" in content if content else False
-                    logger.info(f"Entry {metadata['id']}: has_img={has_img}, content_len={len(content) if content else 0}")
-                    entries.append(
-                        StoredDiaryEntry(
-                            id=metadata["id"],
-                            content=content,  # Use metadata content (has full HTML)
-                            date=metadata["date"],
-                            user_id=metadata["user_id"],
-                            mood=metadata["mood"],
-                            analysis=metadata["analysis"],
-                            confidence=metadata["confidence"],
-                            created_at=datetime.fromisoformat(metadata["created_at"]),
-                        )
-                    )
-                logger.info(f"Fetched {len(entries)} entries for user {user_id}")
-                return entries
-        
-        # Search in vector store for specific queries
-        logger.info("Performing similarity search in vector store")
-        results = pg_vector_store.similarity_search_with_score(
-            query=query, k=limit, filter={"user_id": user_id}
-        )
-
-        # Format results
-        entries = []
-        for doc, score in results:
-            # Filter out irrelevant results (threshold determined empirically)
-            if score > 0.35:
-                continue
-                
-            metadata = doc.metadata
-            entries.append(
-                StoredDiaryEntry(
-                    id=metadata["id"],
-                    content=metadata.get("content", doc.page_content),  # Use metadata content (has full HTML)
-                    date=metadata["date"],
-                    user_id=metadata["user_id"],
-                    mood=metadata["mood"],
-                    analysis=metadata["analysis"],
-                    confidence=metadata["confidence"],
-                    created_at=datetime.fromisoformat(metadata["created_at"]),
-                )
+            logger.info("Empty/recent query - fetching latest entries from diary table")
+            rows = await diary_repository.list_recent_entries(user_id, limit)
+            entries = [_row_to_entry(row) for row in rows]
+            logger.info(f"Fetched {len(entries)} entries for user {user_id}")
+            return entries
+
+        keyword_rows: List = []
+        if mode in ("keyword", "hybrid", "auto"):
+            keyword_rows = await _keyword_candidates(query, user_id, limit * 2)
+
+        if mode == "keyword" or (
+            mode == "auto" and keyword_rows and _is_keyword_query(query)
+        ):
+            search_stats["keyword_only_answers"] += 1
+            entries = [_row_to_entry(row) for row in keyword_rows[:limit]]
+            logger.info(
+                f"Keyword search complete. Found {len(entries)} entries "
+                f"in {(time.perf_counter() - started) * 1000:.1f}ms."
             )
+            return entries
 
-        logger.info(f"Search complete. Found {len(entries)} entries.")
+        logger.info("Performing similarity search in vector store")
+        vector_k = limit if mode == "vector" else limit * 2
+        vector_matches = await _vector_candidates(query, user_id, vector_k)
+        vector_ids = [doc.metadata["id"] for doc, _ in vector_matches]
+
+        if mode == "vector":
+            ordered_ids = vector_ids[:limit]
+        else:
+            keyword_ids = [row.id for row in keyword_rows]
+            ordered_ids = _reciprocal_rank_fusion(
+                [keyword_ids, vector_ids], k=settings.DIARY_RRF_K
+            )[:limit]
+
+        entries = await _hydrate(
+            user_id, vector_matches, ordered_ids, {row.id: row for row in keyword_rows}
+        )
+        logger.info(
+            f"Search complete. Found {len(entries)} entries "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms."
+        )
         return entries
     except Exception as e:
         logger.error(f"Error searching diary entries: {str(e)}")
         raise
 
+
+async def list_diary_entries(
+    user_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_content: bool = True,
+) -> DiaryEntryPage:
+    """
+    List a user's diary entries newest first, one page at a time.
+
+    Args:
+        user_id: The user's ID
+        limit: Page size
+        cursor: next_cursor from the previous page, if any
+        include_content: Return full HTML content instead of a short preview
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    limit = clamp_page_size(limit)
+    after = decode_cursor(cursor)
+    if after is not None:
+        after = (datetime.fromisoformat(after[0]), after[1])
+
+    rows = await diary_repository.list_entries_page(
+        user_id, limit, after=after, include_content=include_content
+    )
+    items = [_row_to_entry(row) for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at.isoformat(), last.id)
+
+    logger.info(f"Listed {len(items)} diary entries for user {user_id}")
+    return DiaryEntryPage(items=items, next_cursor=next_cursor)
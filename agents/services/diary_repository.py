@@ -0,0 +1,545 @@
+"""
+Diary entries table access
+
+Typed, indexed storage for diary entries (see migrations/001_create_diary_entries.sql).
+The vector rows in langchain_pg_embedding only hold what similarity search needs;
+everything shown to the user is read from here.
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from sqlalchemy import bindparam, text
+from services.database import get_async_engine
+
+_ENTRY_COLUMNS = """
+    id, user_id, entry_date, content, mood, analysis, confidence,
+    analysis_status, embedding_id, created_at
+"""
+
+# List views skip the full HTML and carry a short plain-text preview instead
+_SUMMARY_COLUMNS = """
+    id, user_id, entry_date, NULL AS content,
+    left(coalesce(plain_text, regexp_replace(content, '<[^>]*>', ' ', 'g')), 200) AS preview,
+    mood, analysis, confidence, analysis_status, embedding_id, created_at
+"""
+
+# Entries whose analysis has not finished; 'processing' rows older than the
+# stale interval belong to a worker that died and may be reclaimed
+_CLAIMABLE = """
+    (analysis_status = 'pending'
+     OR (analysis_status = 'processing'
+         AND updated_at < now() - make_interval(secs => :stale_seconds)))
+"""
+
+
+async def insert_entry(
+    entry_id: str,
+    user_id: str,
+    entry_date: str,
+    content: str,
+    plain_text: str,
+    created_at: datetime,
+    mood: Optional[str] = None,
+    analysis: Optional[str] = None,
+    confidence: Optional[float] = None,
+    embedding_id: Optional[str] = None,
+    analysis_status: str = "pending",
+    content_hash: Optional[str] = None,
+) -> None:
+    """Insert a diary entry row."""
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO diary_entries (
+                    id, user_id, entry_date, content, plain_text, mood,
+                    analysis, confidence, analysis_status, embedding_id,
+                    content_hash, created_at, updated_at
+                )
+                VALUES (
+                    :id, :user_id, :entry_date, :content, :plain_text, :mood,
+                    :analysis, :confidence, :analysis_status, :embedding_id,
+                    :content_hash, :created_at, :created_at
+                )
+            """),
+            {
+                "id": entry_id,
+                "user_id": user_id,
+                "entry_date": entry_date,
+                "content": content,
+                "plain_text": plain_text,
+                "mood": mood,
+                "analysis": analysis,
+                "confidence": confidence,
+                "analysis_status": analysis_status,
+                "embedding_id": embedding_id,
+                "content_hash": content_hash,
+                "created_at": created_at,
+            },
+        )
+
+
+async def list_recent_entries(user_id: str, limit: int) -> List[Any]:
+    """Return a user's most recent entries, newest first."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {_ENTRY_COLUMNS}
+                FROM diary_entries
+                WHERE user_id = :user_id
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """),
+            {"user_id": user_id, "limit": limit},
+        )
+        return result.fetchall()
+
+
+async def list_entries_page(
+    user_id: str,
+    limit: int,
+    after: Optional[Tuple[datetime, str]] = None,
+    include_content: bool = True,
+) -> List[Any]:
+    """
+    Return one page of a user's entries, newest first, using keyset pagination.
+
+    Args:
+        user_id: The user's ID
+        limit: Page size; one extra row is fetched to detect a next page
+        after: (created_at, id) of the last row of the previous page
+        include_content: Return full HTML content instead of a preview
+    """
+    columns = _ENTRY_COLUMNS if include_content else _SUMMARY_COLUMNS
+    params: Dict[str, Any] = {"user_id": user_id, "limit": limit + 1}
+    keyset = ""
+    if after is not None:
+        keyset = "AND (created_at, id) < (:after_created_at, :after_id)"
+        params["after_created_at"], params["after_id"] = after
+
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {columns}
+                FROM diary_entries
+                WHERE user_id = :user_id {keyset}
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """),
+            params,
+        )
+        return result.fetchall()
+
+
+async def get_entries_by_ids(user_id: str, entry_ids: Sequence[str]) -> Dict[str, Any]:
+    """Return a user's entries keyed by id."""
+    if not entry_ids:
+        return {}
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {_ENTRY_COLUMNS}
+                FROM diary_entries
+                WHERE user_id = :user_id AND id IN :ids
+            """).bindparams(bindparam("ids", expanding=True)),
+            {"user_id": user_id, "ids": list(entry_ids)},
+        )
+        return {row.id: row for row in result}
+
+
+async def keyword_search(user_id: str, query: str, limit: int) -> List[Any]:
+    """
+    Full-text search over a user's entries, best match first.
+
+    Uses the GIN-indexed search_tsv column; no embedding is computed.
+    """
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {_ENTRY_COLUMNS},
+                       ts_rank_cd(search_tsv, websearch_to_tsquery('simple', :query)) AS rank
+                FROM diary_entries
+                WHERE user_id = :user_id
+                AND search_tsv @@ websearch_to_tsquery('simple', :query)
+                ORDER BY rank DESC, created_at DESC
+                LIMIT :limit
+            """),
+            {"user_id": user_id, "query": query, "limit": limit},
+        )
+        return result.fetchall()
+
+
+async def find_by_content_hash(user_id: str, content_hash: str) -> Optional[Any]:
+    """Return the user's most recent entry with this content hash that is not failed."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {_ENTRY_COLUMNS}
+                FROM diary_entries
+                WHERE user_id = :user_id AND content_hash = :content_hash
+                AND analysis_status <> 'failed'
+                ORDER BY (analysis_status = 'completed') DESC, created_at DESC
+                LIMIT 1
+            """),
+            {"user_id": user_id, "content_hash": content_hash},
+        )
+        return result.fetchone()
+
+
+async def latest_entry_for_date(
+    user_id: str, entry_date: str, within_seconds: int
+) -> Optional[Any]:
+    """Return the user's entry for a date that was saved in the last within_seconds."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT {_ENTRY_COLUMNS}, plain_text
+                FROM diary_entries
+                WHERE user_id = :user_id AND entry_date = :entry_date
+                AND import_id IS NULL
+                AND updated_at >= now() - make_interval(secs => :within_seconds)
+                ORDER BY updated_at DESC
+                LIMIT 1
+            """),
+            {"user_id": user_id, "entry_date": entry_date, "within_seconds": within_seconds},
+        )
+        return result.fetchone()
+
+
+async def update_entry_content(
+    entry_id: str, content: str, plain_text: str, content_hash: str, reanalyse: bool = False
+) -> Optional[Any]:
+    """
+    Replace an entry's content. The current analysis is kept; with reanalyse
+    the entry is also marked pending, with fresh attempts, so the worker
+    analyses the new text.
+    Returns the updated row.
+    """
+    status = "'pending', analysis_attempts = 0" if reanalyse else "analysis_status"
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text(f"""
+                UPDATE diary_entries
+                SET content = :content, plain_text = :plain_text,
+                    content_hash = :content_hash, analysis_status = {status},
+                    updated_at = now()
+                WHERE id = :id
+                RETURNING {_ENTRY_COLUMNS}
+            """),
+            {
+                "id": entry_id,
+                "content": content,
+                "plain_text": plain_text,
+                "content_hash": content_hash,
+            },
+        )
+        return result.fetchone()
+
+
+async def copy_entry_vector(
+    source_id: str, entry_id: str, metadata: Dict[str, Any]
+) -> bool:
+    """
+    Store a vector row for an entry reusing another row's embedding.
+    Returns False if the source row does not exist.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text("""
+                INSERT INTO langchain_pg_embedding (id, collection_id, embedding, document, cmetadata)
+                SELECT :entry_id, collection_id, embedding, document, CAST(:metadata AS JSONB)
+                FROM langchain_pg_embedding
+                WHERE id = :source_id
+            """),
+            {"entry_id": entry_id, "source_id": source_id, "metadata": json.dumps(metadata)},
+        )
+        return result.rowcount > 0
+
+
+async def get_entry(user_id: str, entry_id: str) -> Optional[Any]:
+    """Return one of a user's entries, or None."""
+    rows = await get_entries_by_ids(user_id, [entry_id])
+    return rows.get(entry_id)
+
+
+async def claim_entry(entry_id: str, stale_seconds: int, max_attempts: int) -> Optional[Any]:
+    """
+    Atomically mark an entry as being analysed by this worker and count the
+    attempt.
+
+    Returns the row (with analysis_attempts), or None if it is finished,
+    claimed by another worker or out of attempts.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text(f"""
+                UPDATE diary_entries
+                SET analysis_status = 'processing',
+                    analysis_attempts = analysis_attempts + 1,
+                    updated_at = now()
+                WHERE id = :id AND {_CLAIMABLE} AND analysis_attempts < :max_attempts
+                RETURNING {_ENTRY_COLUMNS}, plain_text, analysis_attempts
+            """),
+            {"id": entry_id, "stale_seconds": stale_seconds, "max_attempts": max_attempts},
+        )
+        return result.fetchone()
+
+
+async def complete_entry(
+    entry_id: str,
+    mood: str,
+    analysis: str,
+    confidence: float,
+    embedding_id: str,
+    plain_text: Optional[str] = None,
+) -> bool:
+    """
+    Store the analysis result of an entry. With plain_text, only if the
+    entry still holds the analysed text. Returns False if not stored.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text("""
+                UPDATE diary_entries
+                SET mood = :mood, analysis = :analysis, confidence = :confidence,
+                    embedding_id = :embedding_id, analysis_status = 'completed',
+                    analysis_error = NULL, updated_at = now()
+                WHERE id = :id
+                AND (CAST(:plain_text AS TEXT) IS NULL OR plain_text = :plain_text)
+            """),
+            {
+                "id": entry_id,
+                "mood": mood,
+                "analysis": analysis,
+                "confidence": confidence,
+                "embedding_id": embedding_id,
+                "plain_text": plain_text,
+            },
+        )
+        return result.rowcount > 0
+
+
+async def release_entry(entry_id: str, error: str, failed: bool) -> None:
+    """Record a failed analysis attempt; the entry is retried unless failed is set."""
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                UPDATE diary_entries
+                SET analysis_status = :status, analysis_error = :error, updated_at = now()
+                WHERE id = :id AND analysis_status <> 'completed'
+            """),
+            {"id": entry_id, "error": error[:1000], "status": "failed" if failed else "pending"},
+        )
+
+
+async def list_unfinished_entry_ids(
+    stale_seconds: int, max_attempts: int, limit: int = 1000
+) -> List[str]:
+    """
+    Return ids of entries still waiting for analysis with attempts left,
+    oldest first (imports excluded).
+    """
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT id FROM diary_entries
+                WHERE import_id IS NULL AND {_CLAIMABLE}
+                AND analysis_attempts < :max_attempts
+                ORDER BY updated_at
+                LIMIT :limit
+            """),
+            {"stale_seconds": stale_seconds, "max_attempts": max_attempts, "limit": limit},
+        )
+        return [row.id for row in result]
+
+
+async def fail_exhausted_entries(
+    stale_seconds: int, max_attempts: int, import_id: Optional[str] = None
+) -> int:
+    """
+    Mark unfinished entries that have used all their analysis attempts as
+    failed, e.g. ones whose last attempt was cut short by a restart. Covers
+    one import's entries, or without import_id those of no import.
+    Returns the count.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text(f"""
+                UPDATE diary_entries
+                SET analysis_status = 'failed',
+                    analysis_error = coalesce(analysis_error, 'Analysis did not finish'),
+                    updated_at = now()
+                WHERE import_id IS NOT DISTINCT FROM CAST(:import_id AS VARCHAR) AND {_CLAIMABLE}
+                AND analysis_attempts >= :max_attempts
+            """),
+            {"import_id": import_id, "stale_seconds": stale_seconds, "max_attempts": max_attempts},
+        )
+        return result.rowcount
+
+
+async def create_import(import_id: str, user_id: str) -> Optional[Any]:
+    """
+    Create an import job, or reopen an existing one for more uploads.
+
+    Returns the job row, or None if the id belongs to another user.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text("""
+                INSERT INTO diary_imports (id, user_id)
+                VALUES (:id, :user_id)
+                ON CONFLICT (id) DO UPDATE
+                SET status = 'receiving', error = NULL, updated_at = now()
+                WHERE diary_imports.user_id = EXCLUDED.user_id
+                RETURNING id, user_id, status, created_at
+            """),
+            {"id": import_id, "user_id": user_id},
+        )
+        return result.fetchone()
+
+
+async def set_import_status(import_id: str, status: str, error: Optional[str] = None) -> None:
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                UPDATE diary_imports
+                SET status = :status, error = :error, updated_at = now()
+                WHERE id = :id
+            """),
+            {"id": import_id, "status": status, "error": error[:1000] if error else None},
+        )
+
+
+async def insert_import_entries(rows: List[Dict[str, Any]]) -> int:
+    """
+    Bulk-insert pending entries of an import in one statement.
+
+    Rows whose (import_id, import_seq) already exists are skipped, so a
+    resumed upload can safely resend entries. Returns the number inserted.
+    """
+    if not rows:
+        return 0
+    payload = [
+        {**row, "created_at": row["created_at"].isoformat()} for row in rows
+    ]
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text("""
+                INSERT INTO diary_entries (
+                    id, user_id, entry_date, content, plain_text, content_hash,
+                    analysis_status, import_id, import_seq, created_at, updated_at
+                )
+                SELECT r.id, r.user_id, r.entry_date, r.content, r.plain_text, r.content_hash,
+                       'pending', r.import_id, r.import_seq, r.created_at, now()
+                FROM jsonb_to_recordset(CAST(:rows AS JSONB)) AS r (
+                    id VARCHAR, user_id VARCHAR, entry_date VARCHAR, content TEXT,
+                    plain_text TEXT, content_hash VARCHAR, import_id VARCHAR,
+                    import_seq INTEGER, created_at TIMESTAMPTZ
+                )
+                ON CONFLICT (import_id, import_seq) WHERE import_id IS NOT NULL
+                DO NOTHING
+            """),
+            {"rows": json.dumps(payload)},
+        )
+        return result.rowcount
+
+
+async def claim_import_batch(
+    import_id: str, limit: int, stale_seconds: int, max_attempts: int
+) -> List[Any]:
+    """
+    Atomically claim up to limit unanalysed entries of an import with
+    attempts left, in upload order.
+    """
+    async with get_async_engine().begin() as conn:
+        result = await conn.execute(
+            text(f"""
+                UPDATE diary_entries
+                SET analysis_status = 'processing',
+                    analysis_attempts = analysis_attempts + 1,
+                    updated_at = now()
+                WHERE id IN (
+                    SELECT id FROM diary_entries
+                    WHERE import_id = :import_id AND {_CLAIMABLE}
+                    AND analysis_attempts < :max_attempts
+                    ORDER BY import_seq
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING {_ENTRY_COLUMNS}, plain_text, import_seq
+            """),
+            {
+                "import_id": import_id,
+                "limit": limit,
+                "stale_seconds": stale_seconds,
+                "max_attempts": max_attempts,
+            },
+        )
+        return sorted(result.fetchall(), key=lambda row: row.import_seq)
+
+
+async def complete_entries(results: List[Dict[str, Any]]) -> None:
+    """Store analysis results of several entries (dicts with complete_entry's fields)."""
+    if not results:
+        return
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                UPDATE diary_entries
+                SET mood = :mood, analysis = :analysis, confidence = :confidence,
+                    embedding_id = :embedding_id, analysis_status = 'completed',
+                    analysis_error = NULL, updated_at = now()
+                WHERE id = :id
+            """),
+            results,
+        )
+
+
+async def release_entries(entry_ids: Sequence[str], error: str, max_attempts: int) -> None:
+    """
+    Return claimed entries to the pending state after a failed batch; those
+    that have used all their attempts are marked failed.
+    """
+    if not entry_ids:
+        return
+    async with get_async_engine().begin() as conn:
+        await conn.execute(
+            text("""
+                UPDATE diary_entries
+                SET analysis_status = CASE WHEN analysis_attempts >= :max_attempts
+                                           THEN 'failed' ELSE 'pending' END,
+                    analysis_error = :error, updated_at = now()
+                WHERE id IN :ids AND analysis_status = 'processing'
+            """).bindparams(bindparam("ids", expanding=True)),
+            {"ids": list(entry_ids), "error": error[:1000], "max_attempts": max_attempts},
+        )
+
+
+async def get_import_progress(user_id: str, import_id: str) -> Optional[Any]:
+    """Return an import job with per-status entry counts, or None."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT i.id, i.user_id, i.status, i.error, i.created_at, i.updated_at,
+                       count(e.id) AS received,
+                       count(e.id) FILTER (WHERE e.analysis_status IN ('pending', 'processing')) AS pending,
+                       count(e.id) FILTER (WHERE e.analysis_status = 'completed') AS completed,
+                       count(e.id) FILTER (WHERE e.analysis_status = 'failed') AS failed,
+                       max(e.import_seq) AS last_seq
+                FROM diary_imports i
+                LEFT JOIN diary_entries e ON e.import_id = i.id
+                WHERE i.id = :id AND i.user_id = :user_id
+                GROUP BY i.id
+            """),
+            {"id": import_id, "user_id": user_id},
+        )
+        return result.fetchone()
+
+
+async def list_active_import_ids() -> List[str]:
+    """Return ids of imports that were processing when the last process stopped."""
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("SELECT id FROM diary_imports WHERE status = 'processing' ORDER BY updated_at")
+        )
+        return [row.id for row in result]
@@ -0,0 +1,326 @@
+"""
+Local image features of Moner Canvus drawings
+
+Computed on the CPU with NumPy/Pillow from a downscaled copy of the final
+drawing (longest side ANALYSIS_SIDE):
+- ink coverage: share of pixels that differ from the canvas background
+- colour families and dominant palette of the ink
+- brightness, saturation and warmth of the ink
+- edge density: share of pixels on a strong luminance gradient
+- left/right and top/bottom symmetry of the ink (IoU with its mirror image)
+- entropy of the luminance histogram (0 = one flat colour, 1 = uniform spread)
+
+The features are added to the Gemini prompt, used to skip Gemini for empty or
+degenerate canvases, and, with the stroke metrics, give a structured local
+analysis when Gemini is unavailable.
+"""
+
+import io
+from typing import Any, Dict, List, Optional, Union
+import numpy as np
+from PIL import Image
+from config.settings import settings
+
+ANALYSIS_SIDE = 256
+INK_TOLERANCE = 24  # Per-channel distance from the background above which a pixel is ink
+EDGE_THRESHOLD = 48  # Luminance step (0-255) between neighbours that counts as an edge
+PALETTE_SIZE = 5
+
+# Hue ranges in degrees; red wraps around 0
+_HUE_FAMILIES = [
+    ("red", 0, 15),
+    ("orange", 15, 40),
+    ("yellow", 40, 70),
+    ("green", 70, 160),
+    ("cyan", 160, 200),
+    ("blue", 200, 260),
+    ("purple", 260, 300),
+    ("pink", 300, 345),
+    ("red", 345, 361),
+]
+_WARM = {"red", "orange", "yellow", "pink", "brown"}
+_COOL = {"green", "cyan", "blue", "purple"}
+
+
+def load_drawing(image_data: Union[bytes, Image.Image]) -> Image.Image:
+    """
+    The drawing as RGB (transparency on white), longest side at most ANALYSIS_SIDE.
+
+    Raises:
+        ValueError: If the image cannot be read
+    """
+    try:
+        return _load(image_data)
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Unreadable image: {e}")
+
+
+def _load(image_data: Union[bytes, Image.Image]) -> Image.Image:
+    image = Image.open(io.BytesIO(image_data)) if isinstance(image_data, (bytes, bytearray)) else image_data
+    if image.mode in ("RGBA", "LA", "P", "PA"):
+        image = image.convert("RGBA")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        image = background
+    elif image.mode != "RGB":
+        image = image.convert("RGB")
+    factor = max(image.size) // ANALYSIS_SIDE
+    if factor >= 2:
+        image = image.reduce(factor)
+    if max(image.size) > ANALYSIS_SIDE:
+        scale = ANALYSIS_SIDE / max(image.size)
+        image = image.resize(
+            (max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.BILINEAR
+        )
+    return image
+
+
+def _families(hsv: np.ndarray) -> np.ndarray:
+    """Colour family name of each HSV pixel (H, S, V in 0-255)."""
+    hue = hsv[:, 0].astype(np.float32) * (360.0 / 255.0)
+    saturation = hsv[:, 1] / 255.0
+    value = hsv[:, 2] / 255.0
+    names = np.empty(len(hsv), dtype=object)
+    for name, low, high in _HUE_FAMILIES:
+        names[(hue >= low) & (hue < high)] = name
+    names[np.isin(names, ["red", "orange"]) & (value < 0.6) & (saturation > 0.3)] = "brown"
+    achromatic = saturation < 0.2
+    names[achromatic] = "grey"
+    names[achromatic & (value > 0.85)] = "white"
+    names[value < 0.2] = "black"
+    return names
+
+
+def _symmetry(mask: np.ndarray) -> Dict[str, float]:
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return {"horizontal": 0.0, "vertical": 0.0}
+    ink = mask[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+
+    def iou(mirrored):
+        return float((ink & mirrored).sum() / max((ink | mirrored).sum(), 1))
+
+    return {"horizontal": round(iou(ink[:, ::-1]), 3), "vertical": round(iou(ink[::-1, :]), 3)}
+
+
+def _palette(pixels: np.ndarray) -> List[Dict[str, Any]]:
+    """Most common ink colours (3 bits per channel bins, mean colour per bin)."""
+    bins = (pixels[:, 0] >> 5).astype(np.int64) * 64 + (pixels[:, 1] >> 5) * 8 + (pixels[:, 2] >> 5)
+    counts = np.bincount(bins, minlength=512)
+    palette = []
+    for index in np.argsort(counts)[::-1][:PALETTE_SIZE]:
+        share = counts[index] / len(pixels)
+        if share < 0.02:
+            break
+        mean = pixels[bins == index].mean(axis=0).round().astype(int)
+        palette.append({"hex": "#{:02x}{:02x}{:02x}".format(*mean), "share": round(float(share), 3)})
+    return palette
+
+
+def extract_drawing_features(image_data: Union[bytes, Image.Image]) -> Dict[str, Any]:
+    """
+    Compute the local features of a drawing.
+
+    Args:
+        image_data: Encoded image bytes, or a PIL image (ideally from load_drawing)
+
+    Returns:
+        Feature dict (see module docstring); shares are 0-1
+
+    Raises:
+        ValueError: If the image cannot be read
+    """
+    image = load_drawing(image_data)
+    rgb = np.asarray(image, dtype=np.uint8)
+    pixels = rgb.reshape(-1, 3)
+
+    # Background: the median of the four corner colours
+    corners = np.array([rgb[0, 0], rgb[0, -1], rgb[-1, 0], rgb[-1, -1]], dtype=np.int16)
+    background = np.median(corners, axis=0)
+    mask = (np.abs(rgb.astype(np.int16) - background) > INK_TOLERANCE).any(axis=2)
+    coverage = float(mask.mean())
+
+    luminance = np.asarray(image.convert("L"), dtype=np.int16)
+    histogram = np.bincount(luminance.ravel(), minlength=256) / luminance.size
+    nonzero = histogram[histogram > 0]
+    entropy = float(-(nonzero * np.log2(nonzero)).sum() / 8.0)
+    edges = (np.abs(np.diff(luminance, axis=1))[:-1, :] > EDGE_THRESHOLD) | (
+        np.abs(np.diff(luminance, axis=0))[:, :-1] > EDGE_THRESHOLD
+    )
+
+    features: Dict[str, Any] = {
+        "inkCoverage": round(coverage, 4),
+        "edgeDensity": round(float(edges.mean()), 4),
+        "entropy": round(entropy, 3),
+        "symmetry": _symmetry(mask),
+        "backgroundColor": "#{:02x}{:02x}{:02x}".format(*background.astype(int)),
+        "colorFamilies": {},
+        "palette": [],
+        "brightness": 0.0,
+        "saturation": 0.0,
+        "warmth": 0.0,
+    }
+    ink = pixels[mask.ravel()]
+    if len(ink) == 0:
+        return features
+
+    hsv = np.asarray(image.convert("HSV")).reshape(-1, 3)[mask.ravel()]
+    names, counts = np.unique(_families(hsv), return_counts=True)
+    shares = {str(name): count / len(ink) for name, count in zip(names, counts)}
+    warm = sum(share for name, share in shares.items() if name in _WARM)
+    cool = sum(share for name, share in shares.items() if name in _COOL)
+    features.update(
+        colorFamilies={
+            name: round(float(share), 3)
+            for name, share in sorted(shares.items(), key=lambda item: -item[1])
+            if share >= 0.01
+        },
+        palette=_palette(ink),
+        brightness=round(float(hsv[:, 2].mean() / 255.0), 3),
+        saturation=round(float(hsv[:, 1].mean() / 255.0), 3),
+        warmth=round(float((warm - cool) / (warm + cool)), 3) if warm + cool > 0 else 0.0,
+    )
+    return features
+
+
+def degenerate_reason(summary: Dict[str, Any]) -> Optional[str]:
+    """
+    Why a session is not worth a Gemini call, or None.
+
+    Args:
+        summary: compute_summary_statistics output with "imageFeatures"
+    """
+    features = summary.get("imageFeatures")
+    if not features:
+        return None
+    if features["inkCoverage"] < settings.CANVAS_MIN_INK_COVERAGE:
+        # Nothing on the background; a non-white background means the canvas was filled
+        return "empty" if features["backgroundColor"] == "#ffffff" else "uniform"
+    if summary["totalPoints"] < 3 and features["inkCoverage"] < 0.01:
+        return "too-little"
+    return None
+
+
+def _join(words: List[str]) -> str:
+    return words[0] if len(words) == 1 else ", ".join(words[:-1]) + " and " + words[-1]
+
+
+def local_analysis(summary: Dict[str, Any], reason: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Structured analysis from the image features and stroke metrics.
+
+    Args:
+        summary: compute_summary_statistics output, optionally with "imageFeatures"
+        reason: degenerate_reason of the session, if any
+
+    Returns:
+        {"emotionalSummary", "drawingSummary", "suggestions", "tags", "riskFlags"}
+    """
+    features = summary.get("imageFeatures") or {}
+    dynamics = summary["strokeDynamics"]
+    duration = summary["durationSeconds"]
+    risk_flags = {"isHighDistress": False, "notes": "Local analysis; the drawing's content was not reviewed."}
+
+    if reason is not None:
+        descriptions = {
+            "empty": "The canvas is still empty",
+            "uniform": "The canvas was filled with a single colour",
+            "too-little": "Only a few marks were made on the canvas",
+        }
+        if reason == "uniform":
+            feeling = (
+                "Covering the whole canvas in one colour can itself say something about how you feel. "
+                "You might notice what drew you to that colour today."
+            )
+        else:
+            feeling = (
+                "Sometimes it is hard to know where to start, and that is okay. "
+                "Simply opening the canvas is a small act of care for yourself."
+            )
+        return {
+            "emotionalSummary": feeling,
+            "drawingSummary": f"{descriptions[reason]} after {duration:.0f} seconds.",
+            "suggestions": [
+                "Try drawing a single shape or colour that matches your mood",
+                "Scribble freely for one minute without judging the result",
+                "Take a few slow breaths before you start again",
+            ],
+            "tags": ["getting-started", "self-care"],
+            "riskFlags": risk_flags,
+        }
+
+    tags = ["creative-expression"]
+    suggestions = []
+    strokes = summary["totalStrokes"]
+    drawing = [f"You made {strokes} stroke{'s' if strokes != 1 else ''} over {duration:.0f} seconds"]
+    feeling = []
+
+    families = [name for name, share in features.get("colorFamilies", {}).items() if share >= 0.15][:3]
+    coverage = features.get("inkCoverage", dynamics["canvasCoverage"])
+    area = "a small part" if coverage < 0.05 else "part" if coverage < 0.25 else "much"
+    if families:
+        drawing.append(f"mostly in {_join(families)}, covering {area} of the canvas")
+    else:
+        drawing.append(f"covering {area} of the canvas")
+
+    warmth = features.get("warmth", 0.0)
+    if features.get("brightness", 1.0) < 0.35 and coverage > 0.05:
+        tags.append("dark-tones")
+        feeling.append("The darker tones may reflect a heavier or more inward mood")
+    elif features.get("saturation", 0.0) > 0.55:
+        tags.append("vivid-colours")
+        feeling.append("The vivid colours suggest energy or a wish for expression")
+    if warmth > 0.4:
+        tags.append("warm-colours")
+    elif warmth < -0.4:
+        tags.append("cool-colours")
+
+    velocity = dynamics["velocityPxPerSec"]["mean"]
+    energetic = velocity > 800 or dynamics["curvatureRadPerPx"] > 0.08 or features.get("edgeDensity", 0) > 0.25
+    if energetic:
+        tags.append("energetic")
+        feeling.append("Quick or busy lines can come with restlessness or a need to let something out")
+        suggestions.append("Try a slow breathing exercise to settle any restless energy")
+    elif velocity and velocity < 250:
+        tags.append("calm")
+        feeling.append("Slow, steady strokes often go with a calmer, more deliberate state")
+
+    symmetry = features.get("symmetry", {})
+    if max(symmetry.get("horizontal", 0), symmetry.get("vertical", 0)) > 0.6:
+        tags.append("balanced")
+        drawing.append("with a fairly balanced, symmetrical composition")
+    if dynamics["eraserStrokeRatio"] > 0.2:
+        tags.append("revision")
+        feeling.append("Erasing often can mean you were working something through or being hard on yourself")
+        suggestions.append("Notice any self-critical thoughts and answer them as you would a friend")
+    if dynamics["pauses"]["longestPauseMs"] > 5000:
+        tags.append("reflective")
+        drawing.append("pausing at times to think")
+
+    dominant = summary.get("dominantEmotion")
+    if dominant not in (None, "not tracked", "neutral"):
+        tags.append(dominant)
+        feeling.append(f"Your expression while drawing leaned towards {dominant}")
+    segments = summary.get("emotionDynamics", {}).get("segments", [])
+    if len(segments) > 1 and segments[0]["emotion"] != segments[-1]["emotion"]:
+        tags.append("shifting-mood")
+        feeling.append(
+            f"Your expression moved from {segments[0]['emotion']} to {segments[-1]['emotion']} as you drew"
+        )
+
+    suggestions += [
+        "Write a few lines about what the colours and shapes mean to you",
+        "Give your drawing a title that captures how you feel right now",
+        "Take a few deep breaths to center yourself",
+    ]
+    return {
+        "emotionalSummary": (
+            ". ".join(feeling or ["Taking time to draw is a gentle way to check in with yourself"])
+            + ". This is a reflection, not a diagnosis."
+        ),
+        "drawingSummary": ", ".join(drawing) + ".",
+        "suggestions": suggestions[:5],
+        "tags": tags[:8],
+        "riskFlags": risk_flags,
+    }
@@ -1,46 +1,426 @@
 """
 Embeddings adapter - switches between local and API-based embeddings
 Optimized for Bangla/Bengali language support
+
+The returned model is wrapped in CachedEmbeddings, so repeated texts (common
+queries, re-saved content) are not embedded again.
 """
 
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
 from config.settings import settings
 from utils.logger import logger
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
-def get_embeddings():
+_embeddings: Optional["CachedEmbeddings"] = None
+
+
+def _normalise(text: str) -> str:
+    """NFKC and collapsed whitespace; case is kept since models are case-sensitive."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class DiskEmbeddingStore:
     """
-    Get embeddings model based on deployment mode
+    Fixed-capacity vector store in memory-mapped files, safe to share between
+    the worker processes of one host.
 
-    - Production/Heroku: Uses Cohere multilingual embeddings (best for Bangla)
-    - Local development: Uses HuggingFace multilingual model
+    Slots are reused round-robin once full. The next-slot pointer lives in
+    the .next file, and writers take a slot and fill it under an exclusive
+    flock, so two processes never write a slot at once. A writer clears the
+    slot's key, writes the vector and writes the key last; a reader (without
+    the lock) copies the vector and keeps it only if the key matched before
+    and after the copy, so a lookup never returns a torn or overwritten
+    vector. Each process indexes the slots that existed when it opened the
+    files plus its own writes; entries written later by other processes are
+    simply cache misses.
 
-    Returns:
-        Embeddings instance compatible with LangChain
+    Without fcntl (Windows) writes are not locked: use one process only.
     """
 
-    if settings.USE_API_MODELS or settings.COHERE_API_KEY:
-        # Production mode - use Cohere API for best Bangla support
+    def __init__(self, directory: str, name: str, dimension: int, capacity: int):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, f"{name}-{dimension}")
+        self._lock_fd = os.open(f"{base}.next", os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked():
+            # Under the lock, so only the first process creates the files
+            if os.fstat(self._lock_fd).st_size < 8:
+                os.ftruncate(self._lock_fd, 8)
+            mode = "r+" if os.path.exists(f"{base}.keys") else "w+"
+            self._keys = np.memmap(f"{base}.keys", dtype=np.uint8, mode=mode, shape=(capacity, 32))
+            self._vectors = np.memmap(
+                f"{base}.vectors", dtype=np.float32, mode=mode, shape=(capacity, dimension)
+            )
+        self._next = np.memmap(f"{base}.next", dtype=np.int64, mode="r+", shape=(1,))
+        self._slots: Dict[bytes, int] = {
+            bytes(self._keys[i]): i for i in np.flatnonzero(self._keys.any(axis=1))
+        }
+        self.capacity = capacity
+        self.dimension = dimension
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
         try:
-            from langchain_cohere import CohereEmbeddings
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
 
-            logger.info("Using Cohere multilingual embeddings (optimized for Bangla)")
-            return CohereEmbeddings(
-                model="embed-multilingual-v3.0",  # Best for Bangla + 100 languages
-                cohere_api_key=settings.COHERE_API_KEY,
-            )
-        except Exception as e:
-            logger.error(f"Failed to initialize Cohere embeddings: {e}")
-            logger.warning("Falling back to local embeddings")
-            # Fall through to local mode
+    def get(self, digest: bytes) -> Optional[List[float]]:
+        slot = self._slots.get(digest)
+        if slot is None or bytes(self._keys[slot]) != digest:
+            return None
+        vector = self._vectors[slot].tolist()
+        if bytes(self._keys[slot]) != digest:
+            return None  # Overwritten while being read
+        return vector
+
+    def put(self, digest: bytes, vector: List[float]) -> None:
+        if len(vector) != self.dimension:
+            return
+        slot = self._slots.get(digest)
+        if slot is not None and bytes(self._keys[slot]) == digest:
+            return
+        with self._locked():
+            slot = int(self._next[0]) % self.capacity
+            self._next[0] = (slot + 1) % self.capacity
+            self._slots.pop(bytes(self._keys[slot]), None)
+            self._keys[slot] = 0  # Readers reject the slot while its vector changes
+            self._vectors[slot] = vector
+            self._keys[slot] = np.frombuffer(digest, dtype=np.uint8)
+        self._slots[digest] = slot
+
+    def flush(self) -> None:
+        self._keys.flush()
+        self._vectors.flush()
+        self._next.flush()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Memoising wrapper around a LangChain embeddings model.
+
+    - Keys are (model, query or document, normalised text); query and document
+      embeddings differ for asymmetric models like Cohere v3.
+    - In-memory LRU, optionally backed by a DiskEmbeddingStore.
+    - Concurrent requests for the same text share one computation, and
+      concurrent async query misses are sent to the provider as one batch.
+    """
+
+    def __init__(
+        self,
+        inner: Embeddings,
+        model_name: str,
+        max_entries: int = 10000,
+        disk_dir: Optional[str] = None,
+        disk_entries: int = 100000,
+        embed_query_batch: Optional[Callable[[List[str]], Awaitable[List[List[float]]]]] = None,
+        coalesce_ms: float = 5.0,
+        max_batch: int = 96,
+    ):
+        self.inner = inner
+        self.model_name = model_name
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.disk_entries = disk_entries
+        self.embed_query_batch = embed_query_batch
+        self.coalesce_ms = coalesce_ms
+        self.max_batch = max_batch
+
+        self._memory: "OrderedDict[bytes, List[float]]" = OrderedDict()
+        self._disk: Optional[DiskEmbeddingStore] = None
+        self._lock = threading.Lock()
+        self._inflight: Dict[bytes, threading.Event] = {}
+        self._async_inflight: Dict[bytes, asyncio.Future] = {}
+        self._pending: Dict[bytes, str] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "provider_calls": 0,
+            "provider_texts": 0,
+        }
+
+    # -- cache -------------------------------------------------------------
+
+    def _key(self, kind: str, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{kind}\0{_normalise(text)}".encode("utf-8")).digest()
+
+    def _lookup(self, key: bytes) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+            if self._disk is not None:
+                vector = self._disk.get(key)
+                if vector is not None:
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, vector, to_disk=False)
+                    return vector
+        return None
+
+    def _remember(self, key: bytes, vector: List[float], to_disk: bool = True) -> None:
+        """Store a vector; the caller holds the lock."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+        if to_disk and self.disk_dir:
+            if self._disk is None:
+                try:
+                    self._disk = DiskEmbeddingStore(
+                        self.disk_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", self.model_name),
+                        len(vector), self.disk_entries,
+                    )
+                except OSError as e:
+                    logger.warning(f"Embedding disk cache disabled: {e}")
+                    self.disk_dir = None
+                    return
+            self._disk.put(key, vector)
+
+    def _store(self, keys: List[bytes], vectors: List[List[float]]) -> None:
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                self._remember(key, vector)
+        self.stats["provider_calls"] += 1
+        self.stats["provider_texts"] += len(keys)
+
+    # -- sync --------------------------------------------------------------
+
+    def _embed_sync(self, kind: str, texts: List[str], compute) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        resolved: Dict[bytes, List[float]] = {}
+        owned: Dict[bytes, str] = {}
+        waiting: Dict[bytes, tuple] = {}
+        for key, text in zip(keys, texts):
+            if key in resolved or key in owned or key in waiting:
+                continue
+            vector = self._lookup(key)
+            if vector is not None:
+                resolved[key] = vector
+                continue
+            with self._lock:
+                if key in self._inflight:
+                    waiting[key] = (self._inflight[key], text)
+                    self.stats["coalesced"] += 1
+                else:
+                    self._inflight[key] = threading.Event()
+                    owned[key] = text
+                    self.stats["misses"] += 1
+
+        try:
+            if owned:
+                vectors = compute(list(owned.values()))
+                self._store(list(owned), vectors)
+                resolved.update(zip(owned, vectors))
+        finally:
+            with self._lock:
+                for key in owned:
+                    self._inflight.pop(key).set()
+
+        for key, (event, text) in waiting.items():
+            event.wait()
+            with self._lock:
+                vector = self._memory.get(key)
+            # The owning call failed; compute it here
+            resolved[key] = vector if vector is not None else compute([text])[0]
+        return [resolved[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_sync("query", [text], lambda ts: [self.inner.embed_query(ts[0])])[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_sync("document", texts, self.inner.embed_documents)
+
+    # -- async -------------------------------------------------------------
+
+    @staticmethod
+    def _release(futures: List[asyncio.Future], error: BaseException) -> None:
+        """Fail in-flight futures whose owner raised; cancel them if it was cancelled."""
+        for future in futures:
+            if future.done():
+                continue
+            if isinstance(error, Exception):
+                future.set_exception(error)
+            else:
+                future.cancel()
+
+    @staticmethod
+    async def _await_shared(future: asyncio.Future, text: str, compute) -> List[float]:
+        """
+        Await a future other callers share. Shielded: cancelling this caller
+        must not cancel it for the others. If the owning call was cancelled,
+        the vector is computed here.
+        """
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+        return (await compute([text]))[0]
+
+    async def _embed_async(self, kind: str, texts: List[str], compute) -> List[List[float]]:
+        keys = [self._key(kind, text) for text in texts]
+        loop = asyncio.get_running_loop()
+        resolved: Dict[bytes, List[float]] = {}
+        owned: Dict[bytes, str] = {}
+        waiting: Dict[bytes, tuple] = {}
+        for key, text in zip(keys, texts):
+            if key in resolved or key in owned or key in waiting:
+                continue
+            vector = self._lookup(key)
+            if vector is not None:
+                resolved[key] = vector
+            elif key in self._async_inflight:
+                waiting[key] = (self._async_inflight[key], text)
+                self.stats["coalesced"] += 1
+            else:
+                self._async_inflight[key] = loop.create_future()
+                owned[key] = text
+                self.stats["misses"] += 1
+
+        if owned:
+            try:
+                vectors = await compute(list(owned.values()))
+                self._store(list(owned), vectors)
+            except BaseException as e:
+                # Including cancellation: never leave an owned future in flight
+                self._release([self._async_inflight.pop(key) for key in owned], e)
+                raise
+            for key, vector in zip(owned, vectors):
+                future = self._async_inflight.pop(key)
+                if not future.done():
+                    future.set_result(vector)
+                resolved[key] = vector
+
+        for key, (future, text) in waiting.items():
+            resolved[key] = await self._await_shared(future, text, compute)
+        return [resolved[key] for key in keys]
+
+    def _flush_query_batch(self) -> None:
+        """Send queued query misses to the provider in one call."""
+        self._flush_handle = None
+        batch, self._pending = self._pending, {}
+
+        async def run():
+            try:
+                vectors = await self.embed_query_batch(list(batch.values()))
+                self._store(list(batch), vectors)
+            except BaseException as e:
+                self._release([self._async_inflight.pop(key) for key in batch], e)
+                if not isinstance(e, Exception):
+                    raise
+                return
+            for key, vector in zip(batch, vectors):
+                future = self._async_inflight.pop(key)
+                if not future.done():
+                    future.set_result(vector)
+
+        task = asyncio.get_running_loop().create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.embed_query_batch is None:
+            return (await self._embed_async("query", [text], self._aembed_query_one))[0]
+
+        key = self._key("query", text)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        future = self._async_inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await self._await_shared(future, text, self._aembed_query_one)
 
-    # Local development mode - use HuggingFace multilingual model
+        # Queue the miss; concurrent misses within the window share one call
+        loop = asyncio.get_running_loop()
+        future = self._async_inflight[key] = loop.create_future()
+        self._pending[key] = text
+        self.stats["misses"] += 1
+        if len(self._pending) >= self.max_batch:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+            self._flush_query_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.coalesce_ms / 1000, self._flush_query_batch)
+        return await self._await_shared(future, text, self._aembed_query_one)
+
+    async def _aembed_query_one(self, texts: List[str]) -> List[List[float]]:
+        return [await self.inner.aembed_query(texts[0])]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self._embed_async("document", texts, self.inner.aembed_documents)
+
+    # -- metrics -----------------------------------------------------------
+
+    def flush(self) -> None:
+        """Persist the disk store's slot pointer (called on shutdown)."""
+        with self._lock:
+            if self._disk is not None:
+                self._disk.flush()
+
+    def cache_stats(self) -> Dict[str, object]:
+        # Coalesced lookups count as hits: they did not reach the provider either
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["coalesced"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "model": self.model_name,
+            "memory_entries": len(self._memory),
+            "disk_entries": len(self._disk._slots) if self._disk is not None else 0,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+EMBEDDING_BACKENDS = ("auto", "cohere", "huggingface", "onnx")
+
+
+def _cohere_embeddings():
+    from langchain_cohere import CohereEmbeddings
+
+    logger.info("Using Cohere multilingual embeddings (optimized for Bangla)")
+    model = CohereEmbeddings(
+        model="embed-multilingual-v3.0",  # Best for Bangla + 100 languages
+        cohere_api_key=settings.COHERE_API_KEY,
+    )
+
+    async def embed_query_batch(texts: List[str]) -> List[List[float]]:
+        return await model.aembed(texts, input_type="search_query")
+
+    return model, "cohere:embed-multilingual-v3.0", embed_query_batch
+
+
+def _huggingface_embeddings():
     try:
         from langchain_huggingface import HuggingFaceEmbeddings
 
         logger.info("Using HuggingFace multilingual embeddings (local)")
-        return HuggingFaceEmbeddings(
+        model_name = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+        model = HuggingFaceEmbeddings(
             # Use multilingual model that supports Bangla
-            model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+            model_name=model_name,
             model_kwargs={"device": "cpu"},
             encode_kwargs={"normalize_embeddings": True},
         )
@@ -49,4 +429,101 @@ def get_embeddings():
         logger.warning("Multilingual model not available, using basic model")
         from langchain_huggingface import HuggingFaceEmbeddings
 
-        return HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
+        model_name = "all-MiniLM-L6-v2"
+        model = HuggingFaceEmbeddings(model_name=model_name)
+
+    # Symmetric model: queries embed like documents, so misses batch together
+    async def embed_query_batch(texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, model.embed_documents, texts)
+
+    return model, f"hf:{model_name}", embed_query_batch
+
+
+def _onnx_embeddings():
+    from services.onnx_embeddings import OnnxEmbeddings
+
+    logger.info("Using int8 ONNX multilingual embeddings (local)")
+    model = OnnxEmbeddings(
+        model_dir=settings.ONNX_EMBEDDING_MODEL_DIR or None,
+        max_batch=settings.ONNX_EMBEDDING_MAX_BATCH,
+        max_wait_ms=settings.ONNX_EMBEDDING_MAX_WAIT_MS,
+        workers=settings.ONNX_EMBEDDING_WORKERS,
+    )
+    # Symmetric model, and the ONNX backend batches concurrent calls itself
+    return model, "onnx:paraphrase-multilingual-MiniLM-L12-v2-int8", model.aembed_documents
+
+
+def create_embeddings(backend: str = "auto"):
+    """
+    Create an uncached embeddings model.
+
+    Returns:
+        (model, cache key name, async query batch function)
+    """
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {EMBEDDING_BACKENDS}")
+    if backend == "cohere":
+        return _cohere_embeddings()
+    if backend == "huggingface":
+        return _huggingface_embeddings()
+    if backend == "onnx":
+        return _onnx_embeddings()
+
+    if settings.USE_API_MODELS or settings.COHERE_API_KEY:
+        # Production mode - use Cohere API for best Bangla support
+        try:
+            return _cohere_embeddings()
+        except Exception as e:
+            logger.error(f"Failed to initialize Cohere embeddings: {e}")
+            logger.warning("Falling back to local embeddings")
+            # Fall through to local mode
+
+    # Local development mode - prefer the ONNX export when it is installed
+    try:
+        return _onnx_embeddings()
+    except (ImportError, FileNotFoundError) as e:
+        logger.info(f"ONNX embeddings unavailable ({e}); using HuggingFace")
+    return _huggingface_embeddings()
+
+
+def get_embeddings():
+    """
+    Get embeddings model based on deployment mode
+
+    - Production/Heroku: Uses Cohere multilingual embeddings (best for Bangla)
+    - Local development: Uses the int8 ONNX export if present, else the
+      HuggingFace multilingual model
+    - settings.EMBEDDING_BACKEND forces one of cohere, huggingface or onnx
+
+    The model is created once per process and wrapped in CachedEmbeddings, so
+    all services share one cache.
+
+    Returns:
+        Embeddings instance compatible with LangChain
+    """
+    global _embeddings
+    if _embeddings is None:
+        model, model_name, embed_query_batch = create_embeddings(settings.EMBEDDING_BACKEND)
+        _embeddings = CachedEmbeddings(
+            model,
+            model_name,
+            max_entries=settings.EMBEDDING_CACHE_SIZE,
+            disk_dir=settings.EMBEDDING_CACHE_DIR or None,
+            disk_entries=settings.EMBEDDING_CACHE_DISK_ENTRIES,
+            embed_query_batch=embed_query_batch,
+            coalesce_ms=settings.EMBEDDING_COALESCE_MS,
+            max_batch=settings.EMBEDDING_BATCH_SIZE,
+        )
+    return _embeddings
+
+
+def embedding_cache_stats() -> Optional[Dict[str, object]]:
+    """Hit-rate metrics of the shared embeddings cache, if created."""
+    return _embeddings.cache_stats() if _embeddings is not None else None
+
+
+def warm_up_embeddings() -> None:
+    """Run a first inference of local backends (no-op for API models)."""
+    inner = get_embeddings().inner
+    if hasattr(inner, "warm_up"):
+        inner.warm_up()
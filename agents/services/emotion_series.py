@@ -0,0 +1,353 @@
+"""
+Compact emotion time series for Moner Canvus sessions
+
+face-api.js sends an EmotionSnapshot several times per second, at an uneven
+rate and with gaps when the face is lost. A session's snapshots become:
+- a fixed-rate series: every emotion linearly interpolated onto a grid of
+  CANVAS_EMOTION_SAMPLE_MS steps (coarser if the snapshots span more than
+  CANVAS_EMOTION_MAX_GRID steps), as a (T, 7) matrix
+- a stored series of at most CANVAS_EMOTION_MAX_POINTS samples, picked from
+  the fixed-rate one with Largest-Triangle-Three-Buckets (the triangle area
+  of a candidate is summed over the seven emotions, so a spike in any of them
+  is kept), packed as uint32 millisecond offsets and float16 values
+- dynamics for the analysis: dominant-emotion segments (over a 5 s moving
+  average, with hysteresis; runs shorter than CANVAS_EMOTION_MIN_SEGMENT_MS
+  are absorbed by their neighbours),
+  transitions between them, volatility, first-to-last-third trends and peaks
+
+A 30 minute session at 4 snapshots per second (7,200 snapshots, about 1 MB
+of JSON) is stored in about 4 KB. EmotionAccumulator collects the snapshots
+of a chunked upload as time-binned means, in bounded memory.
+
+Usage:
+    series = EmotionSeries.from_snapshots(payload.emotions)
+    dynamics = emotion_dynamics(series)
+    stored = downsample(series)
+    times, values = stored.to_bytes()
+"""
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from config.settings import settings
+
+# Column order of the value matrix (the fields of EmotionValues)
+EMOTIONS = ("neutral", "happy", "sad", "angry", "fearful", "disgusted", "surprised")
+MAX_SEGMENTS = 20
+TREND_THRESHOLD = 0.1
+PEAK_THRESHOLD = 0.5
+# A new emotion must lead the current dominant one by this much to take over
+DOMINANCE_MARGIN = 0.05
+SMOOTHING_MS = 5000.0
+
+
+def snapshot_arrays(snapshots: Iterable[Any]) -> Tuple[np.ndarray, np.ndarray]:
+    """(N,) times and (N, 7) values of EmotionSnapshots, columns in EMOTIONS order."""
+    snapshots = list(snapshots)
+    t = np.fromiter((s.t for s in snapshots), dtype=np.float64, count=len(snapshots))
+    values = np.array(
+        [[getattr(s.emotions, name) for name in EMOTIONS] for s in snapshots], dtype=np.float64
+    ).reshape(-1, len(EMOTIONS))
+    return t, values
+
+
+class EmotionSeries:
+    """Emotion values over time."""
+
+    def __init__(self, t: np.ndarray, values: np.ndarray):
+        """
+        Args:
+            t: (T,) float64 times in ms from session start, increasing
+            values: (T, 7) float32 emotion values, columns in EMOTIONS order
+        """
+        self.t = t
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.t)
+
+    @classmethod
+    def from_snapshots(cls, snapshots: Iterable[Any], step_ms: Optional[float] = None) -> "EmotionSeries":
+        """
+        Resample EmotionSnapshots onto a fixed-rate grid.
+
+        Args:
+            snapshots: EmotionSnapshots in any order
+            step_ms: Grid step (CANVAS_EMOTION_SAMPLE_MS by default)
+        """
+        return cls.from_arrays(*snapshot_arrays(snapshots), step_ms)
+
+    @classmethod
+    def from_arrays(cls, t: np.ndarray, values: np.ndarray, step_ms: Optional[float] = None) -> "EmotionSeries":
+        """
+        Resample raw snapshots onto a fixed-rate grid.
+
+        Args:
+            t: (N,) snapshot times in ms, in any order
+            values: (N, 7) snapshot values, columns in EMOTIONS order
+            step_ms: Grid step (CANVAS_EMOTION_SAMPLE_MS by default); widened
+                so the grid has at most CANVAS_EMOTION_MAX_GRID samples, as
+                the snapshot times are client data
+        """
+        step_ms = step_ms or settings.CANVAS_EMOTION_SAMPLE_MS
+        if len(t) == 0:
+            return cls(np.zeros(0), np.zeros((0, len(EMOTIONS)), dtype=np.float32))
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(t, kind="stable")
+        t, values = t[order], values[order]
+        # Duplicate timestamps would make interpolation ill-defined; keep the last
+        keep = np.append(t[1:] != t[:-1], True)
+        t, values = t[keep], values[keep]
+
+        step_ms = max(step_ms, (t[-1] - t[0]) / max(settings.CANVAS_EMOTION_MAX_GRID - 1, 1))
+        grid = np.arange(t[0], t[-1] + step_ms / 2, step_ms)
+        resampled = np.column_stack([np.interp(grid, t, values[:, i]) for i in range(len(EMOTIONS))])
+        return cls(grid, np.clip(resampled, 0.0, 1.0).astype(np.float32))
+
+    def to_bytes(self) -> Tuple[bytes, bytes]:
+        """
+        (uint32 ms offsets, float16 values row by row), little-endian.
+        Times outside the uint32 range (client clock errors) are clipped.
+        """
+        return (
+            np.clip(np.rint(self.t), 0, np.iinfo(np.uint32).max).astype("<u4").tobytes(),
+            self.values.astype("<f2").tobytes(),
+        )
+
+    @classmethod
+    def from_bytes(cls, times: bytes, values: bytes) -> "EmotionSeries":
+        """
+        Raises:
+            ValueError: If the buffers do not hold the same number of samples
+        """
+        t = np.frombuffer(times, dtype="<u4").astype(np.float64)
+        matrix = np.frombuffer(values, dtype="<f2")
+        if matrix.size != t.size * len(EMOTIONS):
+            raise ValueError(f"Emotion series has {t.size} times but {matrix.size} values")
+        return cls(t, matrix.reshape(-1, len(EMOTIONS)).astype(np.float32))
+
+
+class EmotionAccumulator:
+    """
+    Emotion snapshots of a session that arrives in batches (chunked uploads),
+    kept as per-bin sums in memory independent of the session's length.
+
+    Bins start CANVAS_EMOTION_SAMPLE_MS wide and double in width whenever
+    there would be more than max_bins; the series is resampled from the bin
+    means. Snapshot count and emotion averages are exact.
+
+    Usage:
+        accumulator = EmotionAccumulator(max_bins=1800)
+        accumulator.add(*snapshot_arrays(chunk.emotions))
+        series = accumulator.series()
+    """
+
+    def __init__(self, max_bins: int, step_ms: Optional[float] = None):
+        self.max_bins = max(max_bins, 1)
+        self.step_ms = float(step_ms or settings.CANVAS_EMOTION_SAMPLE_MS)
+        self.count = 0
+        self._keys = np.zeros(0, dtype=np.int64)
+        # Per bin: sum of snapshot times, snapshot count, sums of the values in EMOTIONS order
+        self._sums = np.zeros((0, 2 + len(EMOTIONS)))
+
+    def add(self, t: np.ndarray, values: np.ndarray) -> None:
+        """Add (N,) snapshot times and (N, 7) values, as from snapshot_arrays."""
+        if len(t) == 0:
+            return
+        t = np.asarray(t, dtype=np.float64)
+        rows = np.column_stack((t, np.ones(len(t)), values))
+        # Client times: keep bin numbers within int64 whatever their magnitude
+        keys = np.floor(np.clip(t / self.step_ms, -2.0 ** 52, 2.0 ** 52)).astype(np.int64)
+        self._merge(np.concatenate((self._keys, keys)), np.concatenate((self._sums, rows)))
+        while len(self._keys) > self.max_bins:
+            self.step_ms *= 2
+            self._merge(self._keys // 2, self._sums)
+        self.count += len(t)
+
+    def _merge(self, keys: np.ndarray, rows: np.ndarray) -> None:
+        self._keys, inverse = np.unique(keys, return_inverse=True)
+        self._sums = np.zeros((len(self._keys), rows.shape[1]))
+        np.add.at(self._sums, inverse, rows)
+
+    def averages(self) -> Dict[str, float]:
+        """Mean of each emotion over the snapshots; empty if there were none."""
+        if not self.count:
+            return {}
+        return dict(zip(EMOTIONS, (self._sums[:, 2:].sum(axis=0) / self.count).tolist()))
+
+    def series(self) -> EmotionSeries:
+        """The fixed-rate series, resampled from the bin means."""
+        counts = self._sums[:, 1:2]
+        return EmotionSeries.from_arrays(self._sums[:, 0] / counts[:, 0], self._sums[:, 2:] / counts)
+
+
+def lttb_indices(t: np.ndarray, values: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the samples Largest-Triangle-Three-Buckets keeps.
+
+    Args:
+        t: (T,) sample times
+        values: (T, C) samples; triangle areas are summed over the C columns
+        n_out: Number of samples to keep (first and last always kept)
+    """
+    n = len(t)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # Interior samples split into n_out - 2 buckets; one sample kept per bucket
+    edges = (np.arange(n_out - 1) * (n - 2) / (n_out - 2)).astype(np.int64) + 1
+    edges[-1] = n - 1
+    kept = np.empty(n_out, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Third vertex: the average of the next bucket (the last sample at the end)
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_t = t[end:next_end].mean()
+        avg_v = values[end:next_end].mean(axis=0)
+        dt = t[start:end] - t[a]
+        dv = values[start:end] - values[a]
+        area = np.abs((avg_t - t[a]) * dv - dt[:, None] * (avg_v - values[a])).sum(axis=1)
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def downsample(series: EmotionSeries, max_points: Optional[int] = None) -> EmotionSeries:
+    """The series reduced to at most max_points (CANVAS_EMOTION_MAX_POINTS) samples by LTTB."""
+    max_points = max_points or settings.CANVAS_EMOTION_MAX_POINTS
+    if len(series) <= max_points:
+        return series
+    kept = lttb_indices(series.t, series.values.astype(np.float64), max_points)
+    return EmotionSeries(series.t[kept], series.values[kept])
+
+
+def _dominant_labels(series: EmotionSeries) -> np.ndarray:
+    """
+    Dominant emotion index per sample, after a SMOOTHING_MS moving average
+    and with DOMINANCE_MARGIN hysteresis, so noise around a crossover does
+    not flip it back and forth.
+    """
+    step_ms = series.t[1] - series.t[0] if len(series) > 1 else SMOOTHING_MS
+    width = min(len(series), max(1, int(round(SMOOTHING_MS / step_ms))))
+    kernel = np.ones(width)
+    # Divide by the samples actually covered so the ends are not damped
+    covered = np.convolve(np.ones(len(series)), kernel, mode="same")
+    smoothed = np.column_stack(
+        [np.convolve(series.values[:, i], kernel, mode="same") / covered for i in range(series.values.shape[1])]
+    )
+    best = np.argmax(smoothed, axis=1)
+    labels = np.empty(len(series), dtype=np.int64)
+    current = best[0]
+    for i, row in enumerate(smoothed):
+        if best[i] != current and row[best[i]] - row[current] > DOMINANCE_MARGIN:
+            current = best[i]
+        labels[i] = current
+    return labels
+
+
+def _segments(series: EmotionSeries, min_segment_ms: float) -> List[Tuple[int, float, float]]:
+    """(emotion index, start ms, end ms) runs of the dominant emotion."""
+    labels = _dominant_labels(series)
+    changes = np.flatnonzero(labels[1:] != labels[:-1]) + 1
+    starts = np.concatenate(([0], changes))
+    ends = np.concatenate((changes, [len(labels)]))
+    # A run lasts until the next run starts; the last one to the last sample
+    bounds = np.append(series.t, series.t[-1])
+    runs = [(int(labels[s]), float(bounds[s]), float(bounds[e])) for s, e in zip(starts, ends)]
+
+    kept = [run for run in runs if run[2] - run[1] >= min_segment_ms]
+    if not kept:
+        # Nothing held long enough: the emotion that was on top the longest
+        totals: Dict[int, float] = {}
+        for label, start, end in runs:
+            totals[label] = totals.get(label, 0.0) + end - start
+        return [(max(totals, key=totals.get), runs[0][1], runs[-1][2])]
+
+    merged = [[kept[0][0], runs[0][1], kept[0][2]]]
+    for label, start, end in kept[1:]:
+        if label == merged[-1][0]:
+            merged[-1][2] = end
+        else:
+            # Short runs in between go to the run before them
+            merged[-1][2] = start
+            merged.append([label, start, end])
+    merged[-1][2] = runs[-1][2]
+    return [tuple(segment) for segment in merged]
+
+
+def emotion_dynamics(series: EmotionSeries, min_segment_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    How the camera emotions changed over the session.
+
+    Args:
+        series: The fixed-rate series (EmotionSeries.from_snapshots)
+        min_segment_ms: Shortest dominant-emotion run that counts
+            (CANVAS_EMOTION_MIN_SEGMENT_MS by default)
+
+    Returns:
+        segments (dominant emotion runs, seconds from session start), transitionCount,
+        transitions ("from->to" -> count), timeShare (share of the session
+        each emotion was dominant), volatility (summed absolute change of all
+        emotions per second), trends (last third mean minus first third mean,
+        where at least 0.1) and peaks (non-neutral emotions reaching 0.5)
+    """
+    if len(series) == 0:
+        return {}
+    min_segment_ms = settings.CANVAS_EMOTION_MIN_SEGMENT_MS if min_segment_ms is None else min_segment_ms
+    segments = _segments(series, min_segment_ms)
+    duration_ms = series.t[-1] - series.t[0]
+
+    transitions = Counter(
+        f"{EMOTIONS[a[0]]}->{EMOTIONS[b[0]]}" for a, b in zip(segments, segments[1:])
+    )
+    share: Dict[str, float] = {}
+    for label, start, end in segments:
+        share[EMOTIONS[label]] = share.get(EMOTIONS[label], 0.0) + (end - start)
+    time_share = {
+        name: round(ms / duration_ms, 3) if duration_ms > 0 else 1.0
+        for name, ms in sorted(share.items(), key=lambda item: -item[1])
+    }
+
+    volatility = 0.0
+    if duration_ms > 0:
+        volatility = float(np.abs(np.diff(series.values, axis=0)).sum() / (duration_ms / 1000.0))
+
+    trends = {}
+    third = len(series) // 3
+    if third > 0:
+        change = series.values[-third:].mean(axis=0) - series.values[:third].mean(axis=0)
+        trends = {
+            EMOTIONS[i]: round(float(change[i]), 3)
+            for i in np.argsort(-np.abs(change))
+            if abs(change[i]) >= TREND_THRESHOLD
+        }
+
+    peaks = {}
+    for i, name in enumerate(EMOTIONS):
+        if name == "neutral":
+            continue
+        at = int(np.argmax(series.values[:, i]))
+        if series.values[at, i] >= PEAK_THRESHOLD:
+            peaks[name] = {
+                "value": round(float(series.values[at, i]), 3),
+                "atSeconds": round(float(series.t[at]) / 1000.0, 1),
+            }
+
+    return {
+        "segments": [
+            {
+                "emotion": EMOTIONS[label],
+                "startSeconds": round(start / 1000.0, 1),
+                "endSeconds": round(end / 1000.0, 1),
+            }
+            for label, start, end in segments[:MAX_SEGMENTS]
+        ],
+        "transitionCount": len(segments) - 1,
+        "transitions": dict(transitions.most_common()),
+        "timeShare": time_share,
+        "volatility": round(volatility, 3),
+        "trends": trends,
+        "peaks": peaks,
+    }
@@ -0,0 +1,151 @@
+"""
+Shared asynchronous Google Gemini client
+
+One google-genai client is created at application startup and reused by all
+requests, so connections are pooled instead of set up per analysis. Calls go
+through the async API (client.aio) and never block the event loop. Each call
+is bounded by a timeout, the number of calls in flight is limited by a
+semaphore, and rate-limit, server and transport errors are retried with
+exponential backoff.
+
+Usage:
+    from services.gemini_client import gemini_client
+
+    await gemini_client.start()      # application startup
+    response = await gemini_client.generate_content(contents, config)
+    await gemini_client.close()      # application shutdown
+"""
+
+import asyncio
+import random
+from typing import Any, Dict, Optional
+import httpx
+from config.settings import settings
+from utils.logger import logger
+
+# HTTP status codes worth another attempt
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class GeminiUnavailableError(RuntimeError):
+    """Gemini is not configured (package missing or no API key)."""
+
+
+class GeminiClient:
+    """A lazily created genai.Client with timeouts, bounded concurrency and retries."""
+
+    def __init__(
+        self,
+        model: str,
+        timeout: float = 60.0,
+        max_concurrency: int = 4,
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+    ):
+        """
+        Args:
+            model: Default model name
+            timeout: Seconds per attempt
+            max_concurrency: Calls in flight per process; others wait their turn
+            max_attempts: Attempts per call, including the first
+            base_delay: Backoff before the second attempt, doubled afterwards
+        """
+        self.model = model
+        self.timeout = timeout
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self._client = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats: Dict[str, int] = {"calls": 0, "retries": 0, "timeouts": 0, "failures": 0, "in_flight": 0}
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.GEMINI_API_KEY)
+
+    def _get_client(self):
+        if self._client is None:
+            try:
+                from google import genai
+                from google.genai import types
+            except ImportError:
+                raise GeminiUnavailableError(
+                    "google-genai package not installed. Install with: pip install google-genai"
+                )
+            if not self.configured:
+                raise GeminiUnavailableError("GEMINI_API_KEY is not configured")
+            self._client = genai.Client(
+                api_key=settings.GEMINI_API_KEY,
+                http_options=types.HttpOptions(timeout=int(self.timeout * 1000)),
+            )
+        return self._client
+
+    async def start(self) -> None:
+        """Create the client at startup (skipped when Gemini is not configured)."""
+        try:
+            self._get_client()
+            logger.info(f"Gemini client ready ({self.model})")
+        except GeminiUnavailableError as e:
+            logger.warning(f"Gemini analysis disabled: {e}")
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is None:
+            return
+        try:
+            aclose = getattr(client.aio, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        except Exception as e:
+            logger.warning(f"Failed to close Gemini client: {e}")
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, (asyncio.TimeoutError, httpx.TransportError)):
+            return True
+        return getattr(error, "code", None) in RETRYABLE_STATUS
+
+    async def generate_content(self, contents: Any, config: Any = None, model: Optional[str] = None):
+        """
+        Call models.generate_content asynchronously.
+
+        Raises:
+            GeminiUnavailableError: Gemini is not configured
+            asyncio.TimeoutError, google.genai.errors.APIError: after the last attempt
+        """
+        client = self._get_client()
+        self.stats["calls"] += 1
+        async with self._semaphore:
+            self.stats["in_flight"] += 1
+            try:
+                for attempt in range(1, self.max_attempts + 1):
+                    try:
+                        return await asyncio.wait_for(
+                            client.aio.models.generate_content(
+                                model=model or self.model, contents=contents, config=config
+                            ),
+                            timeout=self.timeout,
+                        )
+                    except Exception as e:
+                        if isinstance(e, asyncio.TimeoutError):
+                            self.stats["timeouts"] += 1
+                        if attempt == self.max_attempts or not self._is_retryable(e):
+                            self.stats["failures"] += 1
+                            raise
+                        delay = self.base_delay * 2 ** (attempt - 1) * random.uniform(0.8, 1.2)
+                        self.stats["retries"] += 1
+                        logger.warning(
+                            f"Gemini call failed (attempt {attempt}/{self.max_attempts}), "
+                            f"retrying in {delay:.1f}s: {e!r}"
+                        )
+                        await asyncio.sleep(delay)
+            finally:
+                self.stats["in_flight"] -= 1
+
+
+gemini_client = GeminiClient(
+    settings.GEMINI_MODEL,
+    timeout=settings.GEMINI_TIMEOUT_SECONDS,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    max_attempts=settings.GEMINI_MAX_ATTEMPTS,
+    base_delay=settings.GEMINI_RETRY_DELAY,
+)
@@ -0,0 +1,218 @@
+"""
+Image preprocessing before submission to vision APIs
+
+Images are sent to Gemini (Moner Canvus drawings) and AWS Rekognition (face
+frames) as the client produced them. A Moner Canvus export is a 1800x1100 PNG,
+mostly white canvas: megabytes of upload, and Gemini bills images per 768x768
+tile. prepare_image shrinks an image before it leaves the server:
+- trim: crop uniform margins (e.g. empty canvas) around the content
+- downsample: fit the longest side within a pixel budget
+- re-encode: WebP or JPEG at a given quality
+
+Each target API has an ImageBudget; bytes in/out and processing time are
+returned with the image and accumulated in preprocessing_stats.
+
+Usage:
+    from services.image_preprocessing import GEMINI_CANVAS_BUDGET, prepare_image
+
+    prepared = prepare_image(png_bytes, GEMINI_CANVAS_BUDGET)
+    types.Part.from_bytes(data=prepared.data, mime_type=prepared.mime_type)
+"""
+
+import io
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple, Union
+import numpy as np
+from PIL import Image, ImageChops
+from config.settings import settings
+from utils.logger import logger
+
+MIME_TYPES = {"WEBP": "image/webp", "JPEG": "image/jpeg", "PNG": "image/png"}
+
+
+@dataclass(frozen=True)
+class ImageBudget:
+    """How an image is prepared for one API."""
+
+    max_side: int  # Longest side in pixels after resizing
+    format: str = "WEBP"  # WEBP, JPEG or PNG
+    quality: int = 80
+    trim: bool = False  # Crop uniform margins first
+    trim_tolerance: int = 8  # Max per-channel difference from the margin colour
+    trim_padding: int = 16  # Pixels of margin kept around the content
+    max_bytes: Optional[int] = None  # Hard API limit; quality is lowered to fit
+
+
+@dataclass
+class PreparedImage:
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    original_size: Tuple[int, int]
+    elapsed_ms: float
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - len(self.data)
+
+
+# Drawings: white canvas margins are trimmed; 768 px keeps a drawing within
+# one or two Gemini image tiles
+GEMINI_CANVAS_BUDGET = ImageBudget(
+    max_side=settings.GEMINI_IMAGE_MAX_SIDE,
+    format="WEBP",
+    quality=settings.GEMINI_IMAGE_QUALITY,
+    trim=True,
+)
+
+# Camera frames: Rekognition accepts JPEG or PNG up to 5 MB; faces need
+# resolution, so the budget is larger and nothing is trimmed
+REKOGNITION_BUDGET = ImageBudget(
+    max_side=settings.REKOGNITION_IMAGE_MAX_SIDE,
+    format="JPEG",
+    quality=85,
+    max_bytes=5 * 1024 * 1024,
+)
+
+preprocessing_stats: Dict[str, float] = {"images": 0, "bytes_in": 0, "bytes_out": 0, "ms": 0.0}
+
+
+def _to_image(image_data: Union[bytes, np.ndarray, Image.Image]) -> Image.Image:
+    if isinstance(image_data, (bytes, bytearray)):
+        image = Image.open(io.BytesIO(image_data))
+        image.load()
+        return image
+    if isinstance(image_data, np.ndarray):
+        array = image_data
+        if array.ndim == 2:
+            array = np.stack([array] * 3, axis=-1)
+        return Image.fromarray(array.astype("uint8"))
+    if isinstance(image_data, Image.Image):
+        return image_data
+    raise ValueError(f"Unsupported image type: {type(image_data)}")
+
+
+def _flatten(image: Image.Image, keep_alpha: bool) -> Image.Image:
+    """Return an RGB image, with transparency composited on white (or RGBA if kept)."""
+    if image.mode in ("RGBA", "LA", "P", "PA"):
+        image = image.convert("RGBA")
+        if keep_alpha:
+            return image
+        if image.getchannel("A").getextrema()[0] == 255:
+            return image.convert("RGB")
+        background = Image.new("RGB", image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel("A"))
+        return background
+    return image if image.mode == "RGB" else image.convert("RGB")
+
+
+def content_box(image: Image.Image, tolerance: int = 8, padding: int = 16) -> Optional[Tuple[int, int, int, int]]:
+    """
+    Bounding box of the pixels that differ from the margin colour.
+
+    The margin colour is the top-left pixel. Returns None when the image is
+    uniform (nothing to keep) and the full box when there is no margin.
+    """
+    background = Image.new(image.mode, image.size, image.getpixel((0, 0)))
+    threshold = [0] * (tolerance + 1) + [255] * (255 - tolerance)
+    differs = ImageChops.difference(image, background).point(threshold * len(image.getbands()))
+    box = differs.getbbox()
+    if box is None:
+        return None
+    left, top, right, bottom = box
+    return (
+        max(left - padding, 0),
+        max(top - padding, 0),
+        min(right + padding, image.width),
+        min(bottom + padding, image.height),
+    )
+
+
+def _encode(image: Image.Image, budget: ImageBudget, quality: int) -> bytes:
+    output = io.BytesIO()
+    if budget.format == "PNG":
+        image.save(output, format="PNG", optimize=True)
+    elif budget.format == "WEBP":
+        image.save(output, format="WEBP", quality=quality, method=2)
+    else:
+        image.save(output, format=budget.format, quality=quality, optimize=True)
+    return output.getvalue()
+
+
+def prepare_image(
+    image_data: Union[bytes, np.ndarray, Image.Image],
+    budget: ImageBudget,
+) -> PreparedImage:
+    """
+    Trim, downsample and re-encode an image for a vision API.
+
+    Args:
+        image_data: Encoded image bytes, an RGB(A)/grayscale array or a PIL image
+        budget: Target size and encoding
+
+    Returns:
+        PreparedImage; encoded input already in the target format is
+        returned unchanged if re-encoding would not make it smaller
+
+    Raises:
+        ValueError: If the image cannot be read
+    """
+    started = time.perf_counter()
+    try:
+        image = _to_image(image_data)
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Unreadable image: {e}")
+    original_size = image.size
+    original_format = image.format
+    is_encoded = isinstance(image_data, (bytes, bytearray))
+    # Arrays and PIL images are counted at their raw pixel size
+    original_bytes = len(image_data) if is_encoded else image.width * image.height * len(image.getbands())
+    image = _flatten(image, keep_alpha=budget.format == "PNG")
+
+    if budget.trim:
+        box = content_box(image, budget.trim_tolerance, budget.trim_padding)
+        if box is not None and box != (0, 0, *image.size):
+            image = image.crop(box)
+
+    if max(image.size) > budget.max_side:
+        scale = budget.max_side / max(image.size)
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        # reducing_gap: box-reduce by an integer factor first, then Lanczos
+        image = image.resize(size, Image.LANCZOS, reducing_gap=1.5)
+
+    quality = budget.quality
+    data = _encode(image, budget, quality)
+    while budget.max_bytes and len(data) > budget.max_bytes and quality > 30:
+        quality -= 15
+        data = _encode(image, budget, quality)
+
+    if (
+        is_encoded
+        and original_bytes <= len(data)
+        and image.size == original_size
+        and original_format == budget.format
+    ):
+        # Already compact; re-encoding would only cost quality
+        data = bytes(image_data)
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    preprocessing_stats["images"] += 1
+    preprocessing_stats["bytes_in"] += original_bytes
+    preprocessing_stats["bytes_out"] += len(data)
+    preprocessing_stats["ms"] += elapsed_ms
+    logger.info(
+        f"Prepared image {original_size[0]}x{original_size[1]} -> {image.width}x{image.height} "
+        f"{budget.format}: {original_bytes} -> {len(data)} bytes in {elapsed_ms:.1f}ms"
+    )
+    return PreparedImage(
+        data=data,
+        mime_type=MIME_TYPES[budget.format],
+        width=image.width,
+        height=image.height,
+        original_bytes=original_bytes,
+        original_size=original_size,
+        elapsed_ms=elapsed_ms,
+    )
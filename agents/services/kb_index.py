@@ -0,0 +1,207 @@
+"""
+In-process vector index for the mental health knowledge base
+
+The mental_health_resources collection is small and read-only at runtime, so
+it is loaded into memory at startup and searched with NumPy instead of a
+Postgres round trip per lookup. A background task re-checks the collection
+version and reloads the index when the knowledge base is re-ingested.
+
+Vectors are L2-normalised float32, so cosine similarity is a dot product.
+With quantisation they are stored as int8 with one scale per row (4x less
+memory, approximate scores).
+
+Usage:
+    await knowledge_base_index.refresh()
+    results = knowledge_base_index.search(embeddings.embed_query(query), k=3)
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from sqlalchemy import text
+from config.settings import settings
+from services.database import get_async_engine
+from utils.logger import logger
+
+
+def _to_array(value: Any) -> np.ndarray:
+    """pgvector values arrive as arrays with the codec registered, else as text."""
+    if isinstance(value, str):
+        return np.fromstring(value.strip("[]"), sep=",", dtype=np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _normalise(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorMatrixIndex:
+    """Brute-force top-k over a normalised float32 (or int8) matrix."""
+
+    def __init__(self, vectors: np.ndarray, quantize: bool = False):
+        vectors = _normalise(np.asarray(vectors, dtype=np.float32))
+        self.quantize = quantize
+        if quantize:
+            # Symmetric per-row int8: row ~= codes * scale
+            self.scales = (np.abs(vectors).max(axis=1) / 127.0).astype(np.float32)
+            self.scales[self.scales == 0] = 1.0
+            self.codes = np.round(vectors / self.scales[:, None]).astype(np.int8)
+            self.matrix = None
+        else:
+            self.matrix = np.ascontiguousarray(vectors)
+            self.codes = self.scales = None
+
+    def __len__(self) -> int:
+        return len(self.scales) if self.quantize else len(self.matrix)
+
+    @property
+    def nbytes(self) -> int:
+        if self.quantize:
+            return self.codes.nbytes + self.scales.nbytes
+        return self.matrix.nbytes
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        """Return (row, cosine similarity) of the k best rows, best first."""
+        if len(self) == 0:
+            return []
+        query = _normalise(np.asarray(query, dtype=np.float32))
+        if self.quantize:
+            scores = (self.codes @ query) * self.scales
+        else:
+            scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class KnowledgeBaseIndex:
+    """A PGVector collection mirrored into a VectorMatrixIndex."""
+
+    def __init__(self, collection_name: str, quantize: bool = False):
+        self.collection_name = collection_name
+        self.quantize = quantize
+        self.version: Optional[str] = None
+        self.loaded_at: Optional[float] = None
+        self._index: Optional[VectorMatrixIndex] = None
+        self._documents: List[Document] = []
+        self._latencies_ms: deque = deque(maxlen=1000)
+        self._queries = 0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    async def _current_version(self, conn) -> Optional[str]:
+        """A digest of the collection's ids and documents; changes on re-ingestion."""
+        return (
+            await conn.execute(
+                text("""
+                    SELECT count(*) || ':' || coalesce(md5(string_agg(e.id || md5(e.document), ',' ORDER BY e.id)), '')
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = :name
+                """),
+                {"name": self.collection_name},
+            )
+        ).scalar()
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Reload the index if the collection changed. Returns True if reloaded."""
+        async with get_async_engine().connect() as conn:
+            version = await self._current_version(conn)
+            if not force and version == self.version:
+                return False
+            result = await conn.execute(
+                text("""
+                    SELECT e.id, e.document, e.cmetadata, e.embedding
+                    FROM langchain_pg_embedding e
+                    JOIN langchain_pg_collection c ON c.uuid = e.collection_id
+                    WHERE c.name = :name
+                    ORDER BY e.id
+                """),
+                {"name": self.collection_name},
+            )
+            rows = result.fetchall()
+
+        started = time.perf_counter()
+        documents = [
+            Document(page_content=row.document, metadata={**(row.cmetadata or {}), "id": row.id})
+            for row in rows
+        ]
+        vectors = (
+            np.stack([_to_array(row.embedding) for row in rows])
+            if rows
+            else np.zeros((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+        )
+        index = VectorMatrixIndex(vectors, quantize=self.quantize)
+
+        # Swap atomically; searches in flight keep using the old index
+        self._index, self._documents = index, documents
+        self.version, self.loaded_at = version, time.time()
+        logger.info(
+            f"Loaded {len(documents)} {self.collection_name} vectors into memory "
+            f"({index.nbytes / 1024:.0f} KiB, {'int8' if self.quantize else 'float32'}) "
+            f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return True
+
+    def search(self, query_vector, k: int) -> List[Tuple[Document, float]]:
+        """Return the k most similar documents with their cosine similarity."""
+        index, documents = self._index, self._documents
+        if index is None:
+            raise RuntimeError(f"{self.collection_name} index is not loaded")
+        started = time.perf_counter()
+        hits = index.search(query_vector, k)
+        self._latencies_ms.append((time.perf_counter() - started) * 1000)
+        self._queries += 1
+        return [(documents[i], score) for i, score in hits]
+
+    async def _refresh_periodically(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Failed to refresh {self.collection_name} index: {str(e)}")
+
+    def start_refresh(self, interval: float) -> None:
+        if self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._refresh_periodically(interval))
+
+    async def stop_refresh(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            await asyncio.gather(self._refresh_task, return_exceptions=True)
+            self._refresh_task = None
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = list(self._latencies_ms)
+        return {
+            "collection": self.collection_name,
+            "loaded": self.ready,
+            "documents": len(self._documents),
+            "dtype": "int8" if self.quantize else "float32",
+            "memory_bytes": self._index.nbytes if self._index is not None else 0,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "queries": self._queries,
+            "latency_ms_p50": round(statistics.median(latencies), 3) if latencies else None,
+            "latency_ms_p95": (
+                round(sorted(latencies)[int(0.95 * (len(latencies) - 1))], 3)
+                if latencies
+                else None
+            ),
+        }
+
+
+knowledge_base_index = KnowledgeBaseIndex(
+    "mental_health_resources", quantize=settings.KB_INDEX_QUANTIZE
+)
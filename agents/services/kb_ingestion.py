@@ -0,0 +1,508 @@
+"""
+Streaming, incremental ingestion of knowledge base documents into PGVector
+
+Source files (Markdown, plain text, HTML web exports, PDF) are read section by
+section, split into chunks and identified by content: a chunk's id is derived
+from its source path and the hash of its normalised text. On a re-run:
+- files whose fingerprint (file hash + chunking parameters) matches every
+  stored chunk are skipped without being parsed
+- chunks whose id already exists are not embedded again; only their metadata
+  (position, page) is refreshed if it changed
+- stored chunks that no longer occur in their file are deleted
+
+New chunks are embedded in batches of settings.EMBEDDING_BATCH_SIZE and
+upserted by a writer thread while the next batch is embedded. At most two
+batches plus one file's stored chunk ids are held in memory, so corpus size
+only affects run time.
+
+Usage:
+    ingestor = KnowledgeBaseIngestor(vector_store, embeddings, collection_id)
+    stats = ingestor.ingest_directory("knowledge_base")
+    print(stats.summary())
+"""
+
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+from sqlalchemy import text
+from config.settings import settings
+from services.content_dedup import hash_parts
+from services.database import get_sync_engine
+from utils.logger import logger
+
+SOURCE_TYPES = {
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".txt": "text",
+    ".html": "html",
+    ".htm": "html",
+    ".pdf": "pdf",
+}
+
+_HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_READ_BLOCK = 1 << 20
+# Sections longer than this are cut at the next paragraph break, so a file
+# without headings is never held in memory as a whole
+_MAX_SECTION_CHARS = 32000
+
+Section = Tuple[str, Dict[str, Any]]
+
+
+class _WriteError(Exception):
+    """Storing a batch failed; the run stops instead of skipping files."""
+
+
+def _normalise_chunk(chunk: str) -> str:
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", chunk)).strip()
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# -- loaders -----------------------------------------------------------------
+
+
+def _read_markdown(path: str, markdown: bool = True) -> Iterator[Section]:
+    """Yield (text, metadata) per heading section; plain text splits on size only."""
+    headings: List[str] = []
+    lines: List[str] = []
+    size = 0
+    in_code = False
+
+    def section():
+        body = "".join(lines).strip()
+        return body, ({"section": " > ".join(h for h in headings if h)} if headings else {})
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if markdown and line.lstrip().startswith("```"):
+                in_code = not in_code
+            match = _HEADING_PATTERN.match(line) if markdown and not in_code else None
+            if match or (size > _MAX_SECTION_CHARS and not line.strip()) or size > 4 * _MAX_SECTION_CHARS:
+                body, metadata = section()
+                if body:
+                    yield body, metadata
+                lines, size = [], 0
+            if match:
+                level = len(match.group(1))
+                headings = headings[: level - 1] + [""] * max(0, level - 1 - len(headings))
+                headings.append(match.group(2))
+            lines.append(line)
+            size += len(line)
+    body, metadata = section()
+    if body:
+        yield body, metadata
+
+
+class _HtmlSections(HTMLParser):
+    """Collects visible text, starting a new section at each h1-h3."""
+
+    _SKIP = {"script", "style", "noscript", "nav", "footer", "head"}
+    _BLOCK = {"p", "div", "li", "br", "tr", "section", "article", "h4", "h5", "h6", "blockquote", "pre"}
+    _SECTION = {"h1", "h2", "h3"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.sections: List[Section] = []
+        self.title = ""
+        self._parts: List[str] = []
+        self._size = 0
+        self._skip_depth = 0
+        self._heading: Optional[List[str]] = None
+        self._in_title = False
+        self._section_title = ""
+
+    def _flush(self) -> None:
+        body = re.sub(r"[ \t]+", " ", "".join(self._parts))
+        body = re.sub(r"\n\s*\n+", "\n\n", body).strip()
+        if body:
+            self.sections.append((body, {"section": self._section_title} if self._section_title else {}))
+        self._parts, self._size = [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag in self._SECTION:
+            self._flush()
+            self._heading = []
+        elif tag in self._BLOCK:
+            self._parts.append("\n")
+            if self._size > _MAX_SECTION_CHARS:
+                self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag in self._SECTION and self._heading is not None:
+            self._section_title = " ".join("".join(self._heading).split())
+            self._parts.append(self._section_title + "\n")
+            self._heading = None
+        elif tag in self._BLOCK:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+        elif self._skip_depth:
+            return
+        elif self._heading is not None:
+            self._heading.append(data)
+        else:
+            self._parts.append(data)
+            self._size += len(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def _read_html(path: str) -> Iterator[Section]:
+    parser = _HtmlSections()
+
+    def drain():
+        sections, parser.sections = parser.sections, []
+        for body, metadata in sections:
+            if parser.title.strip():
+                metadata["title"] = parser.title.strip()
+            yield body, metadata
+
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for block in iter(lambda: f.read(_READ_BLOCK), ""):
+            parser.feed(block)
+            yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def _read_pdf(path: str) -> Iterator[Section]:
+    from pypdf import PdfReader
+
+    # Pages are parsed lazily, one at a time
+    reader = PdfReader(path)
+    for number, page in enumerate(reader.pages, start=1):
+        body = (page.extract_text() or "").strip()
+        if body:
+            yield body, {"page": number}
+
+
+LOADERS: Dict[str, Callable[[str], Iterator[Section]]] = {
+    "markdown": _read_markdown,
+    "text": lambda path: _read_markdown(path, markdown=False),
+    "html": _read_html,
+    "pdf": _read_pdf,
+}
+
+
+def iter_source_files(root: str) -> Iterator[Tuple[str, str]]:
+    """Yield (path relative to root, source type) for supported files, sorted."""
+    if os.path.isfile(root):
+        source_type = SOURCE_TYPES.get(os.path.splitext(root)[1].lower())
+        if source_type:
+            yield os.path.basename(root), source_type
+        return
+    for directory, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            source_type = SOURCE_TYPES.get(os.path.splitext(name)[1].lower())
+            if source_type and not name.startswith("."):
+                path = os.path.join(directory, name)
+                yield os.path.relpath(path, root).replace(os.sep, "/"), source_type
+
+
+# -- ingestion ---------------------------------------------------------------
+
+
+@dataclass
+class IngestionStats:
+    files_seen: int = 0
+    files_skipped: int = 0
+    files_failed: int = 0
+    bytes_read: int = 0
+    chunks: int = 0
+    chunks_embedded: int = 0
+    chunks_unchanged: int = 0
+    chunks_updated: int = 0
+    chunks_deleted: int = 0
+    batches: int = 0
+    embed_seconds: float = 0.0
+    write_seconds: float = 0.0
+    elapsed_seconds: float = 0.0
+
+    def summary(self) -> str:
+        elapsed = self.elapsed_seconds or 1e-9
+        return (
+            f"{self.files_seen} files ({self.files_skipped} unchanged, {self.files_failed} failed), "
+            f"{self.bytes_read / 1024 / 1024:.1f} MiB read; "
+            f"{self.chunks} chunks: {self.chunks_embedded} embedded, {self.chunks_unchanged} unchanged "
+            f"({self.chunks_updated} metadata updates), {self.chunks_deleted} deleted; "
+            f"{self.elapsed_seconds:.1f}s total, embedding {self.embed_seconds:.1f}s, "
+            f"writing {self.write_seconds:.1f}s; {self.chunks / elapsed:.1f} chunks/s, "
+            f"{self.chunks_embedded / (self.embed_seconds or 1e-9):.1f} embedded chunks/s"
+        )
+
+
+class KnowledgeBaseIngestor:
+    """Streams source files into one PGVector collection, incrementally."""
+
+    def __init__(
+        self,
+        vector_store,
+        embeddings,
+        collection_id: str,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 150,
+        batch_size: Optional[int] = None,
+        force: bool = False,
+    ):
+        """
+        Args:
+            vector_store: PGVector instance for the collection
+            embeddings: Uncached embeddings model (create_embeddings())
+            collection_id: langchain_pg_collection.uuid of the collection
+            chunk_size / chunk_overlap: Characters per chunk and shared between chunks
+            batch_size: Chunks per embedding call (settings.EMBEDDING_BATCH_SIZE)
+            force: Re-parse every file and re-embed every chunk
+        """
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        self.vector_store = vector_store
+        self.embeddings = embeddings
+        self.collection_id = collection_id
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.force = force
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=["\n\n", "\n", "। ", ". ", "? ", "! ", " ", ""],
+        )
+        self.chunking = f"{chunk_size}:{chunk_overlap}"
+        self.engine = get_sync_engine()
+        self.stats = IngestionStats()
+
+        self._batch: List[Tuple[str, str, Dict[str, Any]]] = []
+        self._finalizers: List[Callable[[], None]] = []
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kb-writer")
+        self._pending_write: Optional[Future] = None
+
+    # -- stored state ------------------------------------------------------
+
+    def _stored_sources(self) -> Dict[str, Optional[str]]:
+        """
+        source -> fingerprint of its completely ingested version.
+
+        The fingerprint is stamped on every chunk of a source only after all of
+        them are stored, so a source interrupted mid-way maps to None.
+        """
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT cmetadata->>'source' AS source,
+                           CASE WHEN count(cmetadata->>'source_hash') = count(*)
+                                 AND min(cmetadata->>'source_hash') = max(cmetadata->>'source_hash')
+                                THEN min(cmetadata->>'source_hash') END AS source_hash
+                    FROM langchain_pg_embedding
+                    WHERE collection_id = :collection_id AND cmetadata ? 'source'
+                    GROUP BY 1
+                """),
+                {"collection_id": self.collection_id},
+            )
+            return {row.source: row.source_hash for row in rows}
+
+    def _stored_chunks(self, source: str) -> Dict[str, Dict[str, Any]]:
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                text("""
+                    SELECT id, cmetadata FROM langchain_pg_embedding
+                    WHERE collection_id = :collection_id AND cmetadata->>'source' = :source
+                """),
+                {"collection_id": self.collection_id, "source": source},
+            )
+            return {row.id: row.cmetadata or {} for row in rows}
+
+    def _complete_source(self, source: str, source_hash: str, updates, stale: List[str]) -> None:
+        """Apply metadata changes, drop stale chunks and stamp the fingerprint."""
+        with self.engine.begin() as conn:
+            if updates:
+                conn.execute(
+                    text("UPDATE langchain_pg_embedding SET cmetadata = CAST(:metadata AS jsonb) WHERE id = :id"),
+                    [{"id": chunk_id, "metadata": json.dumps(metadata)} for chunk_id, metadata in updates],
+                )
+            if stale:
+                conn.execute(
+                    text("DELETE FROM langchain_pg_embedding WHERE id = ANY(:ids)"),
+                    {"ids": stale},
+                )
+            conn.execute(
+                text("""
+                    UPDATE langchain_pg_embedding
+                    SET cmetadata = jsonb_set(cmetadata, '{source_hash}', to_jsonb(CAST(:source_hash AS text)))
+                    WHERE collection_id = :collection_id AND cmetadata->>'source' = :source
+                """),
+                {"collection_id": self.collection_id, "source": source, "source_hash": source_hash},
+            )
+
+    def _delete_sources(self, sources: List[str]) -> int:
+        with self.engine.begin() as conn:
+            return conn.execute(
+                text("""
+                    DELETE FROM langchain_pg_embedding
+                    WHERE collection_id = :collection_id AND cmetadata->>'source' = ANY(:sources)
+                """),
+                {"collection_id": self.collection_id, "sources": sources},
+            ).rowcount
+
+    # -- batching ----------------------------------------------------------
+
+    def _write(self, batch, finalizers) -> None:
+        started = time.perf_counter()
+        if batch:
+            ids, texts, metadatas, vectors = zip(*batch)
+            self.vector_store.add_embeddings(
+                texts=list(texts), embeddings=list(vectors), metadatas=list(metadatas), ids=list(ids)
+            )
+        # Run only after the source's new chunks are stored, so an interrupted
+        # run never leaves a source looking complete
+        for finalize in finalizers:
+            finalize()
+        self.stats.write_seconds += time.perf_counter() - started
+
+    def _flush(self) -> None:
+        batch, finalizers = self._batch, self._finalizers
+        self._batch, self._finalizers = [], []
+        vectors = []
+        if batch:
+            started = time.perf_counter()
+            vectors = self.embeddings.embed_documents([chunk for _, chunk, _ in batch])
+            self.stats.embed_seconds += time.perf_counter() - started
+            self.stats.chunks_embedded += len(batch)
+            self.stats.batches += 1
+
+        # One write in flight: the next batch is embedded while this one is stored
+        self._wait_for_write()
+        self._pending_write = self._writer.submit(
+            self._write,
+            [(chunk_id, chunk, metadata, vector) for (chunk_id, chunk, metadata), vector in zip(batch, vectors)],
+            finalizers,
+        )
+        if batch and self.stats.batches % 20 == 0:
+            logger.info(
+                f"Embedded {self.stats.chunks_embedded} chunks "
+                f"({self.stats.chunks_embedded / (self.stats.embed_seconds or 1e-9):.1f}/s)"
+            )
+
+    def _wait_for_write(self) -> None:
+        if self._pending_write is not None:
+            try:
+                self._pending_write.result()
+            except Exception as e:
+                raise _WriteError(str(e)) from e
+            finally:
+                self._pending_write = None
+
+    def _finish(self) -> None:
+        self._flush()
+        self._wait_for_write()
+
+    # -- per file ----------------------------------------------------------
+
+    def _chunks(self, path: str, source_type: str) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for body, section_metadata in LOADERS[source_type](path):
+            for chunk in self.splitter.split_text(body):
+                if chunk.strip():
+                    yield chunk, section_metadata
+
+    def ingest_file(self, root: str, source: str, source_type: str, stored_hash: Optional[str] = None) -> None:
+        path = root if os.path.isfile(root) else os.path.join(root, source)
+        self.stats.files_seen += 1
+        self.stats.bytes_read += os.path.getsize(path)
+        source_hash = hash_parts([file_digest(path).encode(), self.chunking.encode()])
+        if not self.force and stored_hash == source_hash:
+            self.stats.files_skipped += 1
+            return
+
+        stored = self._stored_chunks(source)
+        seen: Set[str] = set()
+        updates: List[Tuple[str, Dict[str, Any]]] = []
+        title = os.path.splitext(os.path.basename(source))[0].replace("_", " ").replace("-", " ")
+
+        for index, (chunk, section_metadata) in enumerate(self._chunks(path, source_type)):
+            content_hash = hash_parts([_normalise_chunk(chunk).encode("utf-8")])
+            chunk_id = str(uuid.uuid5(uuid.NAMESPACE_URL, f"kb:{self.collection_id}:{source}:{content_hash}"))
+            if chunk_id in seen:
+                continue
+            seen.add(chunk_id)
+            self.stats.chunks += 1
+            metadata = {
+                "title": title,
+                **section_metadata,
+                "source": source,
+                "source_type": source_type,
+                "chunk": index,
+                "content_hash": content_hash,
+            }
+            if chunk_id in stored and not self.force:
+                self.stats.chunks_unchanged += 1
+                previous = {k: v for k, v in stored[chunk_id].items() if k != "source_hash"}
+                if previous != metadata:
+                    updates.append((chunk_id, metadata))
+                continue
+            self._batch.append((chunk_id, chunk, metadata))
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+        stale = [chunk_id for chunk_id in stored if chunk_id not in seen]
+        self.stats.chunks_updated += len(updates)
+        self.stats.chunks_deleted += len(stale)
+        self._finalizers.append(lambda: self._complete_source(source, source_hash, updates, stale))
+
+    def ingest_directory(self, root: str, prune: bool = False) -> IngestionStats:
+        """
+        Ingest every supported file under root (or a single file).
+
+        Args:
+            root: Directory or file; sources are identified by their path relative to it
+            prune: Delete stored chunks of sources that are no longer under root
+        """
+        started = time.perf_counter()
+        stored_sources = self._stored_sources()
+        seen: Set[str] = set()
+        try:
+            for source, source_type in iter_source_files(root):
+                seen.add(source)
+                try:
+                    self.ingest_file(root, source, source_type, stored_sources.get(source))
+                except _WriteError:
+                    raise
+                except Exception as e:
+                    self.stats.files_failed += 1
+                    logger.error(f"Failed to ingest {source}: {str(e)}")
+            self._finish()
+        finally:
+            self._writer.shutdown(wait=True)
+
+        removed = sorted(set(stored_sources) - seen)
+        if prune and removed:
+            self.stats.chunks_deleted += self._delete_sources(removed)
+            logger.info(f"Pruned {len(removed)} sources no longer present")
+        elif removed:
+            logger.info(f"{len(removed)} stored sources are not under {root} (use --prune to delete)")
+
+        self.stats.elapsed_seconds = time.perf_counter() - started
+        return self.stats
@@ -0,0 +1,67 @@
+"""
+Media storage helpers shared by diary and canvas images
+
+Diary HTML and Moner Canvus sessions both arrive with base64 images that are
+moved to media storage on ingestion, content-addressed and served back by the
+diary and moner-canvus routers. The client is hosted separately, so the URLs
+handed out must be absolute: images are only moved once
+settings.PUBLIC_BASE_URL is configured, and stay inline otherwise.
+"""
+
+import base64
+import hashlib
+import re
+from typing import Tuple
+from config.settings import settings
+
+IMAGE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/jpg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+MIME_TYPES = {
+    "png": "image/png",
+    "jpg": "image/jpeg",
+    "gif": "image/gif",
+    "webp": "image/webp",
+}
+
+SAFE_SEGMENT = re.compile(r"^[A-Za-z0-9_-]+$")
+_DATA_URL = re.compile(r"^data:(image/[a-z0-9.+-]+);base64,", re.IGNORECASE)
+
+
+def image_extraction_enabled() -> bool:
+    """Whether absolute image URLs can be built (PUBLIC_BASE_URL is set)."""
+    return settings.PUBLIC_BASE_URL.startswith(("http://", "https://"))
+
+
+def media_url(path: str) -> str:
+    """Return the absolute URL of an API path such as /diary/images/<user>/<file>."""
+    base_url = settings.PUBLIC_BASE_URL.rstrip("/")
+    return f"{base_url}{settings.API_PREFIX}{path}"
+
+
+def decode_base64(payload: str) -> bytes:
+    """
+    Decode base64 image data, ignoring whitespace.
+
+    Raises:
+        binascii.Error: If the payload is not valid base64
+    """
+    return base64.b64decode(re.sub(r"\s+", "", payload), validate=True)
+
+
+def decode_data_url(data_url: str) -> Tuple[str, bytes]:
+    """Return (mime type, bytes) of a base64 image data URL or bare base64 (PNG)."""
+    match = _DATA_URL.match(data_url)
+    mime_type = match.group(1).lower() if match else "image/png"
+    payload = data_url[match.end():] if match else data_url
+    return mime_type, decode_base64(payload)
+
+
+def content_filename(image_bytes: bytes, extension: str) -> str:
+    """Content-addressed file name, so re-saving an image does not duplicate it."""
+    return f"{hashlib.sha256(image_bytes).hexdigest()[:32]}.{extension}"
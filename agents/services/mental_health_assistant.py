@@ -27,6 +27,9 @@ from langgraph.graph.message import add_messages
 from config.settings import settings
 from utils.logger import logger
 from services.embeddings_adapter import get_embeddings
+from services.database import get_sync_engine
+from services.usage_accounting import usage_callback, record_tool_call
+from services.kb_index import knowledge_base_index
 
 
 # Define agent state with proper annotation for messages
@@ -60,7 +63,12 @@ groq_api_key = settings.GROQ_API_KEY
 tavily_api_key = settings.TAVILY_API_KEY
 
 # Set up LLM
-llm = ChatGroq(groq_api_key=groq_api_key, model_name="llama-3.3-70b-versatile", temperature=0.7)
+llm = ChatGroq(
+    groq_api_key=groq_api_key,
+    model_name="llama-3.3-70b-versatile",
+    temperature=0.7,
+    callbacks=[usage_callback],
+)
 
 # Set up embeddings (uses Cohere API in production, HuggingFace in dev)
 embeddings = get_embeddings()
@@ -70,7 +78,7 @@ try:
     vectorstore = PGVector(
         embeddings=embeddings,
         collection_name="mental_health_resources",
-        connection=settings.DATABASE_URL,
+        connection=get_sync_engine(),
         use_jsonb=True,
     )
     logger.info(
@@ -81,7 +89,7 @@ except Exception as e:
     logger.error("Make sure you have run: python setup_vector_store.py")
     raise
 
-retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+retriever = vectorstore.as_retriever(search_kwargs={"k": settings.KB_SEARCH_K})
 
 
 # Define output schemas for structured reasoning
@@ -127,7 +135,12 @@ class ResponseStrategy(BaseModel):
 @tool
 def search_mental_health_info(query: str) -> str:
     """Search for mental health information from our knowledge base."""
-    results = retriever.invoke(query)
+    if settings.KB_INDEX_ENABLED and knowledge_base_index.ready:
+        # Served from the in-memory index loaded at startup
+        hits = knowledge_base_index.search(embeddings.embed_query(query), settings.KB_SEARCH_K)
+        results = [doc for doc, _ in hits]
+    else:
+        results = retriever.invoke(query)
     if results:
         return "\n".join([doc.page_content for doc in results])
     return "No specific information found about that topic."
@@ -1452,6 +1465,8 @@ def select_and_use_tools(state: AgentState) -> Dict:
     ):
         try:
             # Search for videos with priority
+            # Tool calls are charged when attempted: a failed call still costs
+            record_tool_call("youtube_search")
             videos = search_mental_health_videos(latest_user_msg)
             tool_results["youtube_videos"] = videos
 
@@ -1465,6 +1480,7 @@ def select_and_use_tools(state: AgentState) -> Dict:
                     or "summarize" in latest_user_msg.lower()
                     or user_preferences.get("prefers_detailed_content", False)
                 ):
+                    record_tool_call("youtube_transcript")
                     blog_content = generate_video_blog(first_video)
                     tool_results["video_blog"] = blog_content
 
@@ -1487,6 +1503,7 @@ def select_and_use_tools(state: AgentState) -> Dict:
                         )
                 else:
                     # Just get the transcript and summary if no blog requested
+                    record_tool_call("youtube_transcript")
                     video_content = get_youtube_transcript_and_summary(first_video)
                     tool_results["youtube_content"] = video_content
         except Exception as e:
@@ -1504,6 +1521,7 @@ def select_and_use_tools(state: AgentState) -> Dict:
         for tool in ["research", "arxiv", "academic"]
     ):
         # Prioritize academic sources
+        record_tool_call("arxiv")
         tool_results["arxiv"] = arxiv_tool.invoke({"query": latest_user_msg})
 
     # Check for each possible tool in the recommended tools
@@ -1512,9 +1530,11 @@ def select_and_use_tools(state: AgentState) -> Dict:
 
         try:
             if "web" in tool_name or "search" in tool_name or "internet" in tool_name:
+                record_tool_call("web_search")
                 tool_results["web_search"] = tavily_search_tool.invoke(latest_user_msg)
 
             elif "wikipedia" in tool_name or "wiki" in tool_name:
+                record_tool_call("wikipedia")
                 tool_results["wikipedia"] = wiki_tool.invoke({"query": latest_user_msg})
 
         except Exception as e:
@@ -9,15 +9,31 @@ This module contains:
 - PostgreSQL storage for sessions
 """
 
-import os
+import asyncio
 import json
 import base64
+import binascii
 import logging
 import uuid
 from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
-from datetime import datetime
-from sqlalchemy import create_engine, text
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import text
+from config.settings import settings
+from services.usage_accounting import record_gemini_usage
+from services.pagination import encode_cursor, decode_cursor, clamp_page_size
+from services.content_dedup import dedup_stats, hash_parts
+from services.mood_analytics import record_mood
+from services import canvus_repository
+from services.gemini_client import gemini_client
+from services.canvas_images import canvas_image_url, store_canvas_image
+from services.stroke_analytics import MAX_CANVAS_SIDE, StrokeArrays, analyse_strokes
+from services.stroke_encoding import DEFAULT_SCALE, decode_strokes
+from services.image_preprocessing import GEMINI_CANVAS_BUDGET, prepare_image
+from services.drawing_features import degenerate_reason, extract_drawing_features, load_drawing, local_analysis
+from services.canvas_analysis_cache import CanvasFingerprint, hamming, image_dhash
+from services.emotion_series import EMOTIONS, EmotionSeries, downsample, emotion_dynamics
 
 logger = logging.getLogger(__name__)
 
@@ -33,27 +49,25 @@ def _init_database():
     """Initialize database connection lazily."""
     global _db_engine, _pg_vector_store
     
-    if _db_engine is not None:
+    if _pg_vector_store is not None:
         return True
     
     try:
-        from config.settings import settings
         from langchain_postgres import PGVector
         from services.embeddings_adapter import get_embeddings
+        from services.database import get_async_engine
         
-        # Initialize database engine
-        _db_engine = create_engine(settings.DATABASE_URL)
-        with _db_engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        logger.info("Moner Canvus: Connected to PostgreSQL database")
+        # Use the shared async engine
+        _db_engine = get_async_engine()
+        logger.info("Moner Canvus: Using shared PostgreSQL engine")
         
         # Initialize embeddings
         embeddings = get_embeddings()
         
-        # Connect to vector store
+        # Connect to vector store (shares the engine's connection pool)
         _pg_vector_store = PGVector(
             embeddings=embeddings,
-            connection=settings.DATABASE_URL,
+            connection=_db_engine,
             collection_name="moner_canvus_sessions",
             use_jsonb=True,
         )
@@ -73,14 +87,19 @@ def _init_database():
 ToolType = str  # "pen" | "eraser"
 
 
-class StrokePoint(BaseModel):
+class FiniteModel(BaseModel):
+    """Base of client-sent session models: NaN and Infinity are rejected in float fields."""
+    model_config = ConfigDict(allow_inf_nan=False)
+
+
+class StrokePoint(FiniteModel):
     """A point in a stroke with timing data."""
     x: float
     y: float
     t: float  # milliseconds from session start
 
 
-class StrokeEvent(BaseModel):
+class StrokeEvent(FiniteModel):
     """A single stroke event."""
     id: str
     tool: str  # "pen" or "eraser"
@@ -90,7 +109,7 @@ class StrokeEvent(BaseModel):
     createdAt: float  # ms from session start
 
 
-class EraseArea(BaseModel):
+class EraseArea(FiniteModel):
     """Area that was erased."""
     x: float
     y: float
@@ -98,7 +117,7 @@ class EraseArea(BaseModel):
     height: float
 
 
-class EraseEvent(BaseModel):
+class EraseEvent(FiniteModel):
     """An erase event."""
     id: str
     targetStrokeId: Optional[str] = None
@@ -106,7 +125,7 @@ class EraseEvent(BaseModel):
     createdAt: float  # ms from session start
 
 
-class EmotionValues(BaseModel):
+class EmotionValues(FiniteModel):
     """Emotion values from face-api.js."""
     neutral: float = 0.0
     happy: float = 0.0
@@ -117,13 +136,13 @@ class EmotionValues(BaseModel):
     surprised: float = 0.0
 
 
-class EmotionSnapshot(BaseModel):
+class EmotionSnapshot(FiniteModel):
     """Emotion snapshot at a point in time."""
     t: float  # ms from session start
     emotions: EmotionValues
 
 
-class SessionMetadata(BaseModel):
+class SessionMetadata(FiniteModel):
     """Session metadata."""
     userId: str
     sessionId: str
@@ -132,15 +151,105 @@ class SessionMetadata(BaseModel):
     durationMs: float
     usedCamera: bool
     clientVersion: str
+    # Drawing canvas size in the units of the stroke coordinates; without it
+    # the size of the final PNG is used, which is larger on HiDPI exports
+    canvasWidth: Optional[int] = Field(default=None, gt=0, le=MAX_CANVAS_SIDE)
+    canvasHeight: Optional[int] = Field(default=None, gt=0, le=MAX_CANVAS_SIDE)
 
 
-class MonerCanvusPayload(BaseModel):
+class MonerCanvusPayload(FiniteModel):
     """Full payload sent to backend for analysis."""
     metadata: SessionMetadata
     strokes: List[StrokeEvent] = []
     erases: List[EraseEvent] = []
     emotions: List[EmotionSnapshot] = []
     finalImageBase64: str  # data URL: data:image/png;base64,...
+    
+    # Set when the session arrived in the compact format (strokes then have no points)
+    _stroke_arrays: Optional[StrokeArrays] = PrivateAttr(default=None)
+    _encoded_points: Optional[str] = PrivateAttr(default=None)
+    _emotion_series: Optional[EmotionSeries] = PrivateAttr(default=None)
+    _emotion_averages: Optional[Dict[str, float]] = PrivateAttr(default=None)
+    # Set when the session arrived as a chunked upload (services/canvas_upload.py);
+    # its events were summarised as they arrived and are not kept
+    _summary: Optional[Dict[str, Any]] = PrivateAttr(default=None)
+    
+    def stroke_arrays(self) -> StrokeArrays:
+        """All stroke points as arrays, converted once."""
+        if self._stroke_arrays is None:
+            self._stroke_arrays = StrokeArrays.from_strokes(self.strokes)
+        return self._stroke_arrays
+    
+    def emotion_series(self) -> EmotionSeries:
+        """The emotion snapshots resampled to a fixed rate, computed once."""
+        if self._emotion_series is None:
+            self._emotion_series = EmotionSeries.from_snapshots(self.emotions)
+        return self._emotion_series
+    
+    def emotion_averages(self) -> Dict[str, float]:
+        """Mean of each emotion over the snapshots; empty if the camera was not used."""
+        if self._emotion_averages is None:
+            count = len(self.emotions)
+            self._emotion_averages = {
+                name: sum(getattr(e.emotions, name) for e in self.emotions) / count for name in EMOTIONS
+            } if count else {}
+        return self._emotion_averages
+
+
+class CompactStroke(FiniteModel):
+    """Stroke fields of the compact format; points are packed separately."""
+    id: str
+    tool: str
+    color: str
+    width: float
+    createdAt: float
+    x0: float = 0.0  # px, reference point of the stroke's point deltas
+    y0: float = 0.0
+    t0: float  # ms, reference time of the stroke's point deltas
+    n: int = Field(ge=0)  # number of points
+
+
+class CompactMonerCanvusPayload(FiniteModel):
+    """
+    Session payload with stroke points packed as base64 int16 deltas
+    (see services/stroke_encoding.py). Sent with content type
+    application/vnd.moner-canvus.compact+json.
+
+    Each stroke's first point is a delta from its (x0, y0, t0), and each
+    delta must fit in an int16 (3276.7 px or 32.767 s per step at the
+    default scale); encoders carry the remainder of a larger step forward.
+    """
+    metadata: SessionMetadata
+    strokes: List[CompactStroke] = []
+    points: str = ""  # base64 int16 (dx, dy, dt) triples of all strokes
+    scale: float = Field(default=DEFAULT_SCALE, gt=0)  # coordinate units per pixel
+    erases: List[EraseEvent] = []
+    emotions: List[EmotionSnapshot] = []
+    finalImageBase64: str
+    
+    def to_payload(self) -> MonerCanvusPayload:
+        """
+        Decode the points into arrays and return the equivalent payload.
+        
+        Raises:
+            ValueError: If the packed points do not match the stroke headers
+        """
+        arrays = decode_strokes(self.strokes, self.points, self.scale)
+        payload = MonerCanvusPayload(
+            metadata=self.metadata,
+            strokes=[
+                StrokeEvent(
+                    id=s.id, tool=s.tool, color=s.color, width=s.width, points=[], createdAt=s.createdAt
+                )
+                for s in self.strokes
+            ],
+            erases=self.erases,
+            emotions=self.emotions,
+            finalImageBase64=self.finalImageBase64,
+        )
+        payload._stroke_arrays = arrays
+        payload._encoded_points = self.points
+        return payload
 
 
 class RiskFlags(BaseModel):
@@ -153,9 +262,21 @@ class AnalysisMetrics(BaseModel):
     """Session metrics included in analysis response."""
     strokeCount: int = 0
     colorCount: int = 0
-    avgSpeed: float = 0.0
+    avgSpeed: float = 0.0  # points per second
     sessionDurationMs: float = 0.0
     emotionSnapshotCount: int = 0
+    emotionTransitions: int = 0  # changes of the dominant camera emotion
+    avgVelocity: float = 0.0  # pen speed, px/s
+    avgAcceleration: float = 0.0  # px/s^2
+    curvature: float = 0.0  # turning angle per pixel drawn, rad/px
+    pauseCount: int = 0  # pauses over 0.5s between strokes, plus long pauses inside strokes
+    longestPauseMs: float = 0.0
+    eraserRatio: float = 0.0  # share of strokes drawn with the eraser
+    canvasCoverage: float = 0.0  # share of the canvas inked
+    spatialSpread: float = 0.0  # 0 = ink in one region, 1 = evenly spread
+    dominantColors: List[str] = []  # hex palette of the final image, most used first
+    edgeDensity: float = 0.0  # share of pixels on a strong edge
+    symmetry: float = 0.0  # best of left/right and top/bottom mirror overlap
 
 
 class AnalysisResponse(BaseModel):
@@ -167,6 +288,8 @@ class AnalysisResponse(BaseModel):
     tags: List[str] = []
     riskFlags: RiskFlags = Field(default_factory=RiskFlags)
     metrics: AnalysisMetrics = Field(default_factory=AnalysisMetrics)
+    source: str = "gemini"  # "gemini", "local" (Gemini skipped) or "fallback" (Gemini failed)
+    storedSessionId: Optional[str] = None  # id of the stored session, when storage succeeded
 
 
 # ============================================================================
@@ -185,56 +308,151 @@ def decode_image_from_base64(data_url: str) -> bytes:
     return base64.b64decode(base64_data)
 
 
+def canvas_size(data_url: str) -> Optional[tuple]:
+    """
+    (width, height) from the PNG header of an image data URL, without
+    decoding the image; None if it is not a PNG or a side is 0.
+    """
+    try:
+        base64_data = data_url.split(",", 1)[1] if data_url.startswith("data:") else data_url
+        header = base64.b64decode(base64_data[:32])  # 24 bytes: signature + IHDR size
+    except (ValueError, binascii.Error):
+        return None
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    width, height = int.from_bytes(header[16:20], "big"), int.from_bytes(header[20:24], "big")
+    if not width or not height:
+        return None
+    return width, height
+
+
+def session_canvas_size(payload: MonerCanvusPayload) -> Optional[tuple]:
+    """
+    The canvas the strokes were drawn on: the logical size from the metadata,
+    else the PNG size. The header is client data: analyse_strokes clamps
+    sides to MAX_CANVAS_SIDE.
+    """
+    metadata = payload.metadata
+    if metadata.canvasWidth and metadata.canvasHeight:
+        return metadata.canvasWidth, metadata.canvasHeight
+    return canvas_size(payload.finalImageBase64)
+
+
 def compute_summary_statistics(payload: MonerCanvusPayload) -> Dict[str, Any]:
     """Compute summary statistics from the drawing session."""
-    strokes = payload.strokes
-    emotions = payload.emotions
+    if payload._summary is not None:
+        # Accumulated chunk by chunk during a chunked upload
+        return dict(payload._summary)
     
-    # Count strokes and colors
-    total_strokes = len(strokes)
-    pen_strokes = [s for s in strokes if s.tool == "pen"]
-    eraser_strokes = [s for s in strokes if s.tool == "eraser"]
+    # Stroke dynamics, vectorised over all points
+    dynamics = analyse_strokes(
+        payload.stroke_arrays(),
+        canvas_size=session_canvas_size(payload),
+        erase_events=len(payload.erases),
+    )
     
     # Get unique colors used
-    colors_used = list(set(s.color for s in pen_strokes))
+    colors_used = list(set(s.color for s in payload.strokes if s.tool == "pen"))
+    
+    return build_summary_statistics(
+        payload.metadata,
+        dynamics,
+        colors_used,
+        payload.emotion_averages(),
+        len(payload.emotions),
+        payload.emotion_series(),
+    )
+
+
+def build_summary_statistics(
+    metadata: SessionMetadata,
+    dynamics: Dict[str, Any],
+    colors_used: List[str],
+    emotion_averages: Dict[str, float],
+    emotion_snapshot_count: int,
+    emotion_series: EmotionSeries,
+) -> Dict[str, Any]:
+    """
+    The compute_summary_statistics output from its parts.
+    
+    Args:
+        metadata: The session metadata
+        dynamics: analyse_strokes (or StrokeAccumulator.result) output
+        colors_used: Distinct pen colours
+        emotion_averages: Mean of each emotion; empty if the camera was not used
+        emotion_snapshot_count: Number of emotion snapshots
+        emotion_series: The snapshots resampled to a fixed rate
+    """
+    total_strokes = dynamics["strokeCount"]
     color_count = len(colors_used)
     
     # Calculate average drawing speed (points per second)
-    total_points = sum(len(s.points) for s in strokes)
-    duration_seconds = payload.metadata.durationMs / 1000.0
+    total_points = dynamics["pointCount"]
+    duration_seconds = metadata.durationMs / 1000.0
     avg_speed = total_points / duration_seconds if duration_seconds > 0 else 0
     
-    # Emotion analysis
-    emotion_averages = {}
-    if emotions:
-        emotion_names = ["neutral", "happy", "sad", "angry", "fearful", "disgusted", "surprised"]
-        for name in emotion_names:
-            values = [getattr(e.emotions, name) for e in emotions]
-            emotion_averages[name] = sum(values) / len(values) if values else 0.0
-        
-        # Find dominant emotion
-        dominant_emotion = max(emotion_averages, key=emotion_averages.get) if emotion_averages else "unknown"
+    # Find dominant emotion
+    if emotion_averages:
+        dominant_emotion = max(emotion_averages, key=emotion_averages.get)
     else:
-        emotion_averages = {}
         dominant_emotion = "not tracked"
     
+    # How the emotions changed, from the fixed-rate series
+    emotion_changes = emotion_dynamics(emotion_series)
+    
     return {
-        "durationMs": payload.metadata.durationMs,
+        "durationMs": metadata.durationMs,
         "durationSeconds": duration_seconds,
         "totalStrokes": total_strokes,
-        "penStrokes": len(pen_strokes),
-        "eraserStrokes": len(eraser_strokes),
+        "penStrokes": dynamics["penStrokes"],
+        "eraserStrokes": dynamics["eraserStrokes"],
         "colorCount": color_count,
         "colorsUsed": colors_used[:10],  # Limit to 10 colors for prompt
         "totalPoints": total_points,
         "avgSpeedPointsPerSec": round(avg_speed, 2),
         "emotionAverages": {k: round(v, 3) for k, v in emotion_averages.items()},
         "dominantEmotion": dominant_emotion,
-        "emotionSnapshotCount": len(emotions),
-        "usedCamera": payload.metadata.usedCamera,
+        "emotionSnapshotCount": emotion_snapshot_count,
+        "emotionDynamics": emotion_changes,
+        "usedCamera": metadata.usedCamera,
+        "strokeDynamics": {
+            key: value
+            for key, value in dynamics.items()
+            if key not in ("strokeCount", "pointCount", "penStrokes", "eraserStrokes")
+        },
     }
 
 
+def _analysis_metrics(summary: Dict[str, Any]) -> AnalysisMetrics:
+    """AnalysisMetrics from compute_summary_statistics output (and imageFeatures, if added)."""
+    dynamics = summary["strokeDynamics"]
+    distribution = dynamics["pauses"]["pauseDistribution"]
+    features = summary.get("imageFeatures") or {}
+    symmetry = features.get("symmetry", {})
+    return AnalysisMetrics(
+        strokeCount=summary["totalStrokes"],
+        colorCount=summary["colorCount"],
+        avgSpeed=summary["avgSpeedPointsPerSec"],
+        sessionDurationMs=summary["durationMs"],
+        emotionSnapshotCount=summary["emotionSnapshotCount"],
+        emotionTransitions=summary["emotionDynamics"].get("transitionCount", 0),
+        avgVelocity=dynamics["velocityPxPerSec"]["mean"],
+        avgAcceleration=dynamics["accelerationPxPerSec2"]["mean"],
+        curvature=dynamics["curvatureRadPerPx"],
+        pauseCount=(
+            distribution["0.5to2s"] + distribution["2to5s"] + distribution["over5s"]
+            + dynamics["pauses"]["inStrokePauseCount"]
+        ),
+        longestPauseMs=dynamics["pauses"]["longestPauseMs"],
+        eraserRatio=dynamics["eraserStrokeRatio"],
+        canvasCoverage=dynamics["canvasCoverage"],
+        spatialSpread=dynamics["spatialEntropy"],
+        dominantColors=[color["hex"] for color in features.get("palette", [])],
+        edgeDensity=features.get("edgeDensity", 0.0),
+        symmetry=max(symmetry.values(), default=0.0),
+    )
+
+
 def build_analysis_prompt(summary_metadata: Dict[str, Any]) -> str:
     """Build the analysis prompt for Gemini."""
     metadata_json = json.dumps(summary_metadata, indent=2)
@@ -248,6 +466,9 @@ Your goals:
 - Gently reflect possible emotional themes in the drawing, without making absolute clinical claims.
 - Describe visual elements and emotional impressions (calm vs tense, expressive vs constrained, etc.).
 - Incorporate the metadata (e.g., many erases, slow pace, tense emotions) into your reasoning.
+- "strokeDynamics" describes how the pen moved: velocity and acceleration in pixels per second, curvature (radians of turning per pixel; high = jagged or scribbled lines), straightness of strokes (1 = straight), pauses between and within strokes, eraser usage, how much of the canvas is inked ("canvasCoverage") and how spread out the ink is ("spatialEntropy": 0 = one region, 1 = evenly spread; "densityGrid" gives the ink share of a 3x3 grid, top row first). Treat these as soft behavioural cues, not evidence.
+- "imageFeatures", if present, are measured from the final image: "inkCoverage" (share of the canvas inked), "colorFamilies" and "palette" (ink colours and their shares), "brightness", "saturation" and "warmth" (-1 cool to 1 warm) of the ink, "edgeDensity", "symmetry" (mirror overlap, 0-1) and "entropy" (tonal variety, 0-1).
+- "emotionDynamics", if not empty, describes how the camera emotions changed over time: "segments" (which emotion was dominant from when to when, in seconds), "transitions" between them, "timeShare" (share of the session each emotion was dominant), "volatility" (how fast expressions changed, summed per second), "trends" (how much each emotion rose or fell from the first to the last third of the session) and "peaks" (strongest moments of non-neutral emotions). Pay attention to the trajectory, e.g. a move from sad to neutral while drawing, not only to the averages. Facial expression detection is noisy; treat it as a soft cue.
 - Always be validating, non-judgmental, and reminder that this is not a diagnosis.
 
 You MUST respond as a single JSON object with this exact schema:
@@ -275,49 +496,86 @@ Here is the JSON metadata about how the drawing was made:
 Now analyze the drawing image and respond with only the JSON object, no additional text."""
 
 
-async def analyze_with_gemini(payload: MonerCanvusPayload) -> AnalysisResponse:
+def _image_analysis(image_bytes: bytes):
+    """(drawing features, dHash) from one decode of the image."""
+    image = load_drawing(image_bytes)
+    return extract_drawing_features(image), image_dhash(image)
+
+
+async def summarise_session(payload: MonerCanvusPayload):
+    """
+    Summary statistics with local image features, and the image's dHash.
+    
+    Returns:
+        (compute_summary_statistics output with "imageFeatures", dHash), or
+        (summary without features, None) if the image cannot be read
+    """
+    summary = compute_summary_statistics(payload)
+    try:
+        image_bytes = decode_image_from_base64(payload.finalImageBase64)
+        features, dhash = await asyncio.to_thread(_image_analysis, image_bytes)
+    except (ValueError, binascii.Error) as e:
+        logger.warning(f"Could not extract drawing features: {e}")
+        return summary, None
+    summary["imageFeatures"] = features
+    return summary, dhash
+
+
+async def analyze_with_gemini(
+    payload: MonerCanvusPayload,
+    summary_metadata: Optional[Dict[str, Any]] = None,
+) -> AnalysisResponse:
     """
     Analyze the drawing using Google Gemini API.
     
+    Empty or degenerate canvases are analysed locally without calling Gemini,
+    and the local analysis is also the fallback when Gemini fails.
+    
     Args:
         payload: The full drawing session payload
+        summary_metadata: summarise_session output, if already computed
         
     Returns:
         AnalysisResponse with AI-generated insights
     """
+    # Compute summary statistics and local image features
+    if summary_metadata is None:
+        summary_metadata, _ = await summarise_session(payload)
+    
+    reason = degenerate_reason(summary_metadata)
+    if reason is not None:
+        logger.info(f"Skipping Gemini for session {payload.metadata.sessionId}: {reason} canvas")
+        return _local_response(payload, summary_metadata, local_analysis(summary_metadata, reason), "local")
+    
     try:
-        from google import genai
         from google.genai import types
     except ImportError:
         logger.error("google-genai package not installed. Install with: pip install google-genai")
-        return _create_fallback_response(payload, "AI analysis unavailable - package not installed")
+        return _create_fallback_response(payload, "AI analysis unavailable - package not installed", summary_metadata)
     
-    # Get API key from environment
-    api_key = os.environ.get("GEMINI_API_KEY")
-    if not api_key:
-        logger.error("GEMINI_API_KEY environment variable not set")
-        return _create_fallback_response(payload, "AI analysis unavailable - API key not configured")
+    if not gemini_client.configured:
+        logger.error("GEMINI_API_KEY is not configured")
+        return _create_fallback_response(payload, "AI analysis unavailable - API key not configured", summary_metadata)
     
     try:
-        # Initialize client
-        client = genai.Client(api_key=api_key)
-        
-        # Decode image
+        # Decode image, then trim the empty canvas and downsample before upload
         image_bytes = decode_image_from_base64(payload.finalImageBase64)
-        
-        # Compute summary statistics
-        summary_metadata = compute_summary_statistics(payload)
+        try:
+            image = await asyncio.to_thread(prepare_image, image_bytes, GEMINI_CANVAS_BUDGET)
+            image_bytes, image_mime_type = image.data, image.mime_type
+        except ValueError as e:
+            logger.warning(f"Sending canvas image unprocessed: {e}")
+            image_mime_type = "image/png"
         
         # Build prompt
         prompt = build_analysis_prompt(summary_metadata)
         
-        # Create the request with image and text
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
+        # Create the request with image and text (shared async client)
+        response = await gemini_client.generate_content(
             contents=[
                 types.Content(
                     parts=[
-                        types.Part.from_bytes(data=image_bytes, mime_type="image/png"),
+                        types.Part.from_bytes(data=image_bytes, mime_type=image_mime_type),
                         types.Part.from_text(text=prompt),
                     ]
                 )
@@ -327,6 +585,8 @@ async def analyze_with_gemini(payload: MonerCanvusPayload) -> AnalysisResponse:
             )
         )
         
+        record_gemini_usage(response)
+
         # Parse the response
         response_text = response.text.strip()
         
@@ -348,48 +608,51 @@ async def analyze_with_gemini(payload: MonerCanvusPayload) -> AnalysisResponse:
                 isHighDistress=result.get("riskFlags", {}).get("isHighDistress", False),
                 notes=result.get("riskFlags", {}).get("notes", "")
             ),
-            metrics=AnalysisMetrics(
-                strokeCount=summary_metadata["totalStrokes"],
-                colorCount=summary_metadata["colorCount"],
-                avgSpeed=summary_metadata["avgSpeedPointsPerSec"],
-                sessionDurationMs=summary_metadata["durationMs"],
-                emotionSnapshotCount=summary_metadata["emotionSnapshotCount"],
-            )
+            metrics=_analysis_metrics(summary_metadata),
         )
         
     except json.JSONDecodeError as e:
         logger.error(f"Failed to parse Gemini response as JSON: {e}")
-        return _create_fallback_response(payload, "Could not parse AI response")
+        return _create_fallback_response(payload, "Could not parse AI response", summary_metadata)
+    except asyncio.TimeoutError:
+        logger.error(f"Gemini analysis timed out after {gemini_client.max_attempts} attempts")
+        return _create_fallback_response(payload, "AI analysis timed out", summary_metadata)
     except Exception as e:
         logger.error(f"Gemini API error: {e}")
-        return _create_fallback_response(payload, f"AI analysis error: {str(e)}")
+        return _create_fallback_response(payload, f"AI analysis error: {str(e)}", summary_metadata)
 
 
-def _create_fallback_response(payload: MonerCanvusPayload, error_message: str) -> AnalysisResponse:
-    """Create a fallback response when analysis fails."""
-    summary = compute_summary_statistics(payload)
-    
+def _local_response(
+    payload: MonerCanvusPayload,
+    summary: Dict[str, Any],
+    analysis: Dict[str, Any],
+    source: str,
+) -> AnalysisResponse:
     return AnalysisResponse(
         sessionId=payload.metadata.sessionId,
-        emotionalSummary=f"We couldn't fully analyze your drawing at this time. {error_message}. However, taking time to express yourself creatively is always valuable.",
-        drawingSummary=f"You created a drawing with {summary['totalStrokes']} strokes using {summary['colorCount']} different colors over {summary['durationSeconds']:.1f} seconds.",
-        suggestions=[
-            "Try drawing again when you have a moment",
-            "Consider journaling about what you were feeling",
-            "Take a few deep breaths to center yourself",
-        ],
-        tags=["creative-expression", "self-care"],
-        riskFlags=RiskFlags(isHighDistress=False, notes=""),
-        metrics=AnalysisMetrics(
-            strokeCount=summary["totalStrokes"],
-            colorCount=summary["colorCount"],
-            avgSpeed=summary["avgSpeedPointsPerSec"],
-            sessionDurationMs=summary["durationMs"],
-            emotionSnapshotCount=summary["emotionSnapshotCount"],
-        )
+        emotionalSummary=analysis["emotionalSummary"],
+        drawingSummary=analysis["drawingSummary"],
+        suggestions=analysis["suggestions"],
+        tags=analysis["tags"],
+        riskFlags=RiskFlags(**analysis["riskFlags"]),
+        metrics=_analysis_metrics(summary),
+        source=source,
     )
 
 
+def _create_fallback_response(
+    payload: MonerCanvusPayload,
+    error_message: str,
+    summary: Optional[Dict[str, Any]] = None,
+) -> AnalysisResponse:
+    """Create a fallback response from the local analysis when Gemini fails."""
+    if summary is None:
+        summary = compute_summary_statistics(payload)
+    analysis = local_analysis(summary)
+    analysis["riskFlags"]["notes"] = f"{error_message}. {analysis['riskFlags']['notes']}"
+    return _local_response(payload, summary, analysis, "fallback")
+
+
 # ============================================================================
 # Database Storage Functions
 # ============================================================================
@@ -399,7 +662,9 @@ class StoredCanvusSession(BaseModel):
     id: str
     user_id: str
     session_id: str
-    image_data: str  # Base64 PNG
+    image_data: Optional[str] = None  # WebP thumbnail data URI (full PNG for legacy rows)
+    image_url: Optional[str] = None  # Full image, served by /moner-canvus/images
+    thumbnail_url: Optional[str] = None
     emotional_summary: str
     drawing_summary: str
     suggestions: List[str]
@@ -411,18 +676,192 @@ class StoredCanvusSession(BaseModel):
     created_at: datetime
 
 
-def store_canvus_session(
+class CanvusSessionPage(BaseModel):
+    """A page of stored sessions with the cursor of the next page."""
+    items: List[StoredCanvusSession]
+    next_cursor: Optional[str] = None
+
+
+class CanvusSearchResult(StoredCanvusSession):
+    """A stored session matching a search, with its embedding distance."""
+    distance: float  # cosine distance, lower is closer
+
+
+class CanvusTimelineWeek(BaseModel):
+    """Sessions of one week (Monday to Sunday in ANALYTICS_TIMEZONE)."""
+    week_start: date
+    sessions: int
+    high_distress: int  # sessions flagged as high distress
+    avg_duration_seconds: float
+    tags: Dict[str, int]  # most frequent first
+    dominant_emotions: Dict[str, int]  # sessions per dominant camera emotion
+
+
+class CanvusTimeline(BaseModel):
+    user_id: str
+    start: date
+    end: date
+    total_sessions: int
+    weeks: List[CanvusTimelineWeek]
+
+
+class CanvusEmotionTrajectory(BaseModel):
+    """A session's downsampled camera emotions, ready to plot."""
+    id: str
+    emotions: List[str]  # column order of values
+    t_ms: List[int]  # ms from session start
+    values: List[List[float]]  # one row per time, 0-1
+
+
+def canvas_content_hash(payload: MonerCanvusPayload) -> str:
+    """
+    Hash what the analysis depends on: the decoded image and the stroke,
+    erase and emotion events (canonical JSON, so key order does not matter).
+    """
+    events = json.dumps(
+        {
+            "strokes": [stroke.model_dump() for stroke in payload.strokes],
+            "erases": [erase.model_dump() for erase in payload.erases],
+            "emotions": [snapshot.model_dump() for snapshot in payload.emotions],
+            # Compact payloads: the packed points stand in for stroke points
+            **({"points": payload._encoded_points} if payload._encoded_points is not None else {}),
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    try:
+        image_bytes = decode_image_from_base64(payload.finalImageBase64)
+    except (ValueError, binascii.Error):
+        image_bytes = payload.finalImageBase64.encode("utf-8")
+    return hash_parts([image_bytes, events.encode("utf-8")])
+
+
+async def _find_session_by_hash(user_id: str, content_hash: str):
+    """Return (id, metadata without image) of the user's latest session with this hash."""
+    if not _init_database():
+        return None
+    async with _db_engine.connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT id, cmetadata - 'image_data' AS cmetadata
+                FROM langchain_pg_embedding
+                WHERE cmetadata->>'user_id' = :user_id
+                AND collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'moner_canvus_sessions')
+                AND cmetadata->>'content_hash' = :content_hash
+                ORDER BY cmetadata->>'created_at' DESC
+                LIMIT 1
+            """),
+            {"user_id": user_id, "content_hash": content_hash}
+        )
+        return result.fetchone()
+
+
+async def find_cached_analysis(
+    user_id: str,
+    payload: MonerCanvusPayload,
+    content_hash: Optional[str] = None,
+) -> Optional[AnalysisResponse]:
+    """
+    Return the stored analysis of an identical earlier submission, if any.
+    
+    Lets re-submitted sessions skip the Gemini call.
+    """
+    try:
+        row = await _find_session_by_hash(user_id, content_hash or canvas_content_hash(payload))
+    except Exception as e:
+        logger.warning(f"Duplicate session lookup failed: {str(e)}")
+        return None
+    if row is None or "analysis" not in row.cmetadata:
+        return None
+    
+    analysis = AnalysisResponse(**json.loads(row.cmetadata["analysis"]))
+    if analysis.source == "fallback":
+        # Gemini failed last time; let the re-submission try again
+        return None
+    dedup_stats["canvas_exact_duplicates"] += 1
+    dedup_stats["analyses_skipped"] += 1
+    analysis.sessionId = payload.metadata.sessionId
+    logger.info(f"Reusing analysis of stored session {row.id} for identical submission")
+    return analysis
+
+
+async def find_recent_analysis(
+    fingerprint: CanvasFingerprint,
+    max_distance: int,
+    window_seconds: float,
+):
+    """
+    Return (analysis, stored session id) of a matching session stored within
+    the window: same user and metadata digest, dHash within max_distance.
+    """
+    if not _init_database():
+        return None
+    since = (datetime.utcnow() - timedelta(seconds=window_seconds)).isoformat()
+    async with _db_engine.connect() as conn:
+        result = await conn.execute(
+            text("""
+                SELECT cmetadata->>'id' AS id,
+                       cmetadata->>'image_dhash' AS image_dhash,
+                       cmetadata->>'analysis' AS analysis
+                FROM langchain_pg_embedding
+                WHERE collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'moner_canvus_sessions')
+                AND cmetadata->>'user_id' = :user_id
+                AND cmetadata->>'created_at' >= :since
+                AND cmetadata->>'metadata_digest' = :digest
+                ORDER BY cmetadata->>'created_at' DESC
+                LIMIT 20
+            """),
+            {"user_id": fingerprint.user_id, "since": since, "digest": fingerprint.metadata_digest}
+        )
+        rows = result.fetchall()
+    for row in rows:
+        if not row.image_dhash or not row.analysis:
+            continue
+        if hamming(int(row.image_dhash, 16), fingerprint.dhash) > max_distance:
+            continue
+        analysis = AnalysisResponse(**json.loads(row.analysis))
+        if analysis.source == "fallback":
+            continue
+        analysis.storedSessionId = row.id
+        logger.info(f"Reusing analysis of session {row.id} stored within the last {window_seconds:.0f}s")
+        return analysis, row.id
+    return None
+
+
+async def _copy_session_vector(source_id: str, doc_id: str, document: Dict[str, Any]) -> None:
+    """Store a session under a new id reusing another row's embedding."""
+    async with _db_engine.begin() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO langchain_pg_embedding (id, collection_id, embedding, document, cmetadata)
+                SELECT :doc_id, collection_id, embedding, document, CAST(:metadata AS JSONB)
+                FROM langchain_pg_embedding
+                WHERE id = :source_id
+            """),
+            {"doc_id": doc_id, "source_id": source_id, "metadata": json.dumps(document)}
+        )
+
+
+async def store_canvus_session(
     user_id: str,
     payload: MonerCanvusPayload,
-    analysis: AnalysisResponse
+    analysis: AnalysisResponse,
+    content_hash: Optional[str] = None,
+    fingerprint: Optional[CanvasFingerprint] = None,
 ) -> Optional[StoredCanvusSession]:
     """
     Store a Moner Canvus session in PostgreSQL.
     
+    Identical content is deduplicated: a re-submitted session returns the
+    stored one, and the same drawing under a new session reuses its embedding.
+    
     Args:
         user_id: The user's ID from authentication
         payload: The original session payload
         analysis: The Gemini analysis response
+        content_hash: canvas_content_hash(payload), if already computed
+        fingerprint: The submission's analysis cache fingerprint, stored so
+            other workers can find recent duplicates
         
     Returns:
         The stored session or None if storage failed
@@ -432,16 +871,34 @@ def store_canvus_session(
         return None
     
     try:
+        content_hash = content_hash or canvas_content_hash(payload)
+        duplicate = await _find_session_by_hash(user_id, content_hash)
+        if duplicate is not None and duplicate.cmetadata["session_id"] == payload.metadata.sessionId:
+            dedup_stats["embeddings_skipped"] += 1
+            logger.info(f"Session {payload.metadata.sessionId} already stored as {duplicate.id}")
+            return await get_session_by_id(duplicate.cmetadata["id"], user_id)
+        
         doc_id = str(uuid.uuid4())
         created_at = datetime.utcnow()
         duration_seconds = payload.metadata.durationMs / 1000.0
         
+        # The drawing goes to media storage; metadata keeps a small thumbnail
+        image = await store_canvas_image(user_id, payload.finalImageBase64)
+        if image is not None:
+            image_fields = {
+                "image_file": image["image_file"],
+                "thumbnail_file": image["thumbnail_file"],
+                "thumbnail_data": image["thumbnail_data"],
+            }
+        else:
+            image_fields = {"image_data": payload.finalImageBase64}
+        
         # Create document metadata
         document = {
             "id": doc_id,
             "user_id": user_id,
             "session_id": payload.metadata.sessionId,
-            "image_data": payload.finalImageBase64,
+            **image_fields,
             "emotional_summary": analysis.emotionalSummary,
             "drawing_summary": analysis.drawingSummary,
             "suggestions": json.dumps(analysis.suggestions),
@@ -451,101 +908,199 @@ def store_canvus_session(
             "color_count": analysis.metrics.colorCount,
             "duration_seconds": duration_seconds,
             "created_at": created_at.isoformat(),
+            "content_hash": content_hash,
+            "analysis": analysis.model_dump_json(),
         }
+        if fingerprint is not None:
+            document["metadata_digest"] = fingerprint.metadata_digest
+            document["image_dhash"] = f"{fingerprint.dhash:016x}"
         
-        # Create text for embedding - combine summaries for semantic search
-        text_for_embedding = f"{analysis.emotionalSummary} {analysis.drawingSummary} {' '.join(analysis.tags)}"
-        text_for_embedding = text_for_embedding[:1000]  # Limit for embedding
-        
-        # Store in PostgreSQL
-        _pg_vector_store.add_texts(
-            texts=[text_for_embedding],
-            metadatas=[document],
-            ids=[doc_id]
-        )
+        if duplicate is not None:
+            # Same drawing as an earlier session: its embedding is still valid
+            dedup_stats["embeddings_skipped"] += 1
+            await _copy_session_vector(duplicate.id, doc_id, document)
+        else:
+            # Create text for embedding - combine summaries for semantic search
+            text_for_embedding = f"{analysis.emotionalSummary} {analysis.drawingSummary} {' '.join(analysis.tags)}"
+            text_for_embedding = text_for_embedding[:1000]  # Limit for embedding
+            
+            # Store in PostgreSQL
+            await _pg_vector_store.aadd_texts(
+                texts=[text_for_embedding],
+                metadatas=[document],
+                ids=[doc_id]
+            )
         
         logger.info(f"Stored Moner Canvus session {doc_id} for user {user_id}")
         
-        return StoredCanvusSession(
-            id=doc_id,
-            user_id=user_id,
-            session_id=payload.metadata.sessionId,
-            image_data=payload.finalImageBase64,
-            emotional_summary=analysis.emotionalSummary,
-            drawing_summary=analysis.drawingSummary,
-            suggestions=analysis.suggestions,
-            tags=analysis.tags,
-            high_distress=analysis.riskFlags.isHighDistress,
-            stroke_count=analysis.metrics.strokeCount,
-            color_count=analysis.metrics.colorCount,
-            duration_seconds=duration_seconds,
-            created_at=created_at,
+        mood, confidence = _session_mood(payload)
+        await record_mood(
+            user_id, "canvas", mood, confidence, created_at.replace(tzinfo=timezone.utc)
         )
+        # The trajectory plotted by the UI, at most CANVAS_EMOTION_MAX_POINTS samples
+        series = payload.emotion_series()
+        emotion_bytes = downsample(series).to_bytes() if len(series) else None
+        try:
+            await canvus_repository.insert_session(
+                doc_id,
+                user_id,
+                payload.metadata.sessionId,
+                created_at.replace(tzinfo=timezone.utc),
+                tags=analysis.tags,
+                high_distress=analysis.riskFlags.isHighDistress,
+                dominant_emotion=mood,
+                mood=mood,
+                stroke_count=analysis.metrics.strokeCount,
+                color_count=analysis.metrics.colorCount,
+                duration_seconds=duration_seconds,
+                analysis_source=analysis.source,
+                emotion_series=emotion_bytes,
+            )
+        except Exception as e:
+            # The session is stored; only the timeline misses it
+            logger.error(f"Failed to record canvas session summary {doc_id}: {str(e)}")
+        
+        return _metadata_to_session(document)
         
     except Exception as e:
         logger.error(f"Error storing Moner Canvus session: {str(e)}")
         return None
 
 
-def get_user_sessions(user_id: str, limit: int = 20) -> List[StoredCanvusSession]:
+def _session_mood(payload: MonerCanvusPayload):
     """
-    Get all Moner Canvus sessions for a user.
+    Dominant camera emotion over the session, or (None, None) without the
+    camera: analysis tags are free-form or descriptive (e.g.
+    "creative-expression"), not moods, and would pollute the mood aggregates.
+    """
+    averages = payload.emotion_averages()
+    if not averages:
+        return None, None
+    emotion = max(averages, key=averages.get)
+    return emotion, averages[emotion]
+
+
+def _metadata_to_session(metadata: Dict[str, Any]) -> StoredCanvusSession:
+    """Build a StoredCanvusSession from vector store metadata."""
+    image_file = metadata.get("image_file")
+    thumbnail_file = metadata.get("thumbnail_file")
+    return StoredCanvusSession(
+        id=metadata["id"],
+        user_id=metadata["user_id"],
+        session_id=metadata["session_id"],
+        image_data=metadata.get("thumbnail_data") or metadata.get("image_data"),
+        image_url=canvas_image_url(metadata["user_id"], image_file) if image_file else None,
+        thumbnail_url=canvas_image_url(metadata["user_id"], thumbnail_file) if thumbnail_file else None,
+        emotional_summary=metadata["emotional_summary"],
+        drawing_summary=metadata["drawing_summary"],
+        suggestions=json.loads(metadata["suggestions"]) if isinstance(metadata["suggestions"], str) else metadata["suggestions"],
+        tags=json.loads(metadata["tags"]) if isinstance(metadata["tags"], str) else metadata["tags"],
+        high_distress=metadata["high_distress"],
+        stroke_count=metadata["stroke_count"],
+        color_count=metadata["color_count"],
+        duration_seconds=metadata["duration_seconds"],
+        created_at=datetime.fromisoformat(metadata["created_at"]),
+    )
+
+
+async def get_user_sessions_page(
+    user_id: str,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    include_image: bool = True,
+) -> CanvusSessionPage:
+    """
+    Get one page of a user's Moner Canvus sessions, newest first.
+    
+    Uses keyset pagination on (created_at, id) so deep pages cost the same
+    as the first one.
     
     Args:
         user_id: The user's ID
-        limit: Maximum number of sessions to return
+        limit: Page size
+        cursor: next_cursor from the previous page, if any
+        include_image: Include the inline thumbnail; the full image is only
+            available through image_url
         
     Returns:
-        List of stored sessions, newest first
+        A page of sessions and the cursor of the next page
+        
+    Raises:
+        ValueError: If the cursor is malformed
     """
+    limit = clamp_page_size(limit)
+    after = decode_cursor(cursor)
+    
     if not _init_database():
         logger.warning("Cannot fetch sessions - database not available")
-        return []
+        return CanvusSessionPage(items=[])
+    
+    # Legacy rows still hold the full image inline; never list it
+    excluded = "'{image_data}'" if include_image else "'{image_data,thumbnail_data}'"
+    metadata_column = f"cmetadata - {excluded}::text[] AS cmetadata"
+    params: Dict[str, Any] = {"user_id": user_id, "limit": limit + 1}
+    keyset = ""
+    if after is not None:
+        keyset = "AND (cmetadata->>'created_at', id) < (:after_created_at, :after_id)"
+        params["after_created_at"], params["after_id"] = after
     
     try:
-        with _db_engine.connect() as conn:
-            result = conn.execute(
-                text("""
-                    SELECT id, document, cmetadata 
+        async with _db_engine.connect() as conn:
+            result = await conn.execute(
+                text(f"""
+                    SELECT id, {metadata_column}
                     FROM langchain_pg_embedding 
                     WHERE cmetadata->>'user_id' = :user_id 
                     AND collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'moner_canvus_sessions')
-                    ORDER BY cmetadata->>'created_at' DESC
+                    {keyset}
+                    ORDER BY cmetadata->>'created_at' DESC, id DESC
                     LIMIT :limit
                 """),
-                {"user_id": user_id, "limit": limit}
+                params
             )
-            
-            sessions = []
-            for row in result:
-                metadata = row.cmetadata
-                sessions.append(
-                    StoredCanvusSession(
-                        id=metadata["id"],
-                        user_id=metadata["user_id"],
-                        session_id=metadata["session_id"],
-                        image_data=metadata["image_data"],
-                        emotional_summary=metadata["emotional_summary"],
-                        drawing_summary=metadata["drawing_summary"],
-                        suggestions=json.loads(metadata["suggestions"]) if isinstance(metadata["suggestions"], str) else metadata["suggestions"],
-                        tags=json.loads(metadata["tags"]) if isinstance(metadata["tags"], str) else metadata["tags"],
-                        high_distress=metadata["high_distress"],
-                        stroke_count=metadata["stroke_count"],
-                        color_count=metadata["color_count"],
-                        duration_seconds=metadata["duration_seconds"],
-                        created_at=datetime.fromisoformat(metadata["created_at"]),
-                    )
-                )
-            
-            logger.info(f"Fetched {len(sessions)} Moner Canvus sessions for user {user_id}")
-            return sessions
-            
+            rows = result.fetchall()
+        
+        sessions = [_metadata_to_session(row.cmetadata) for row in rows[:limit]]
+        
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last.cmetadata["created_at"], last.id)
+        
+        logger.info(f"Fetched {len(sessions)} Moner Canvus sessions for user {user_id}")
+        return CanvusSessionPage(items=sessions, next_cursor=next_cursor)
+        
     except Exception as e:
         logger.error(f"Error fetching Moner Canvus sessions: {str(e)}")
-        return []
+        return CanvusSessionPage(items=[])
 
 
-def get_session_by_id(session_id: str, user_id: str) -> Optional[StoredCanvusSession]:
+async def get_user_sessions(user_id: str, limit: int = 20) -> List[StoredCanvusSession]:
+    """
+    Get all Moner Canvus sessions for a user.
+    
+    Pages are capped at MAX_PAGE_SIZE, so a larger limit is served by
+    following the cursor over several pages.
+    
+    Args:
+        user_id: The user's ID
+        limit: Maximum number of sessions to return
+        
+    Returns:
+        List of stored sessions, newest first
+    """
+    sessions: List[StoredCanvusSession] = []
+    cursor = None
+    while len(sessions) < limit:
+        page = await get_user_sessions_page(user_id, limit - len(sessions), cursor)
+        sessions.extend(page.items)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+    return sessions
+
+
+async def get_session_by_id(session_id: str, user_id: str) -> Optional[StoredCanvusSession]:
     """
     Get a specific Moner Canvus session by ID.
     
@@ -560,12 +1115,12 @@ def get_session_by_id(session_id: str, user_id: str) -> Optional[StoredCanvusSes
         return None
     
     try:
-        with _db_engine.connect() as conn:
-            result = conn.execute(
+        async with _db_engine.connect() as conn:
+            result = await conn.execute(
                 text("""
                     SELECT cmetadata 
                     FROM langchain_pg_embedding 
-                    WHERE cmetadata->>'id' = :session_id 
+                    WHERE id = :session_id
                     AND cmetadata->>'user_id' = :user_id
                     AND collection_id = (SELECT uuid FROM langchain_pg_collection WHERE name = 'moner_canvus_sessions')
                     LIMIT 1
@@ -577,23 +1132,88 @@ def get_session_by_id(session_id: str, user_id: str) -> Optional[StoredCanvusSes
             if not row:
                 return None
             
-            metadata = row.cmetadata
-            return StoredCanvusSession(
-                id=metadata["id"],
-                user_id=metadata["user_id"],
-                session_id=metadata["session_id"],
-                image_data=metadata["image_data"],
-                emotional_summary=metadata["emotional_summary"],
-                drawing_summary=metadata["drawing_summary"],
-                suggestions=json.loads(metadata["suggestions"]) if isinstance(metadata["suggestions"], str) else metadata["suggestions"],
-                tags=json.loads(metadata["tags"]) if isinstance(metadata["tags"], str) else metadata["tags"],
-                high_distress=metadata["high_distress"],
-                stroke_count=metadata["stroke_count"],
-                color_count=metadata["color_count"],
-                duration_seconds=metadata["duration_seconds"],
-                created_at=datetime.fromisoformat(metadata["created_at"]),
-            )
+            return _metadata_to_session(row.cmetadata)
             
     except Exception as e:
         logger.error(f"Error fetching session {session_id}: {str(e)}")
         return None
+
+
+async def search_user_sessions(user_id: str, query: str, limit: int = 5) -> List[CanvusSearchResult]:
+    """
+    Find a user's sessions whose analysis is closest to a description
+    ("drawings where I felt calm"), using the collection's vector index
+    filtered to the user.
+    
+    Raises:
+        ValueError: If the query is empty
+    """
+    if not query.strip():
+        raise ValueError("Search query must not be empty")
+    if not _init_database():
+        return []
+    results = await _pg_vector_store.asimilarity_search_with_score(
+        query=query, k=clamp_page_size(limit), filter={"user_id": user_id}
+    )
+    return [
+        CanvusSearchResult(**_metadata_to_session(doc.metadata).model_dump(), distance=score)
+        for doc, score in results
+        if score <= settings.CANVAS_SEARCH_MAX_DISTANCE
+    ]
+
+
+async def get_session_timeline(user_id: str, weeks: int = 12) -> CanvusTimeline:
+    """
+    Tags, distress flags and dominant emotions of a user's sessions per week,
+    for the last `weeks` weeks including the current one.
+    """
+    weeks = max(1, min(weeks, settings.ANALYTICS_MAX_DAYS // 7))
+    tz = ZoneInfo(settings.ANALYTICS_TIMEZONE)
+    today = datetime.now(tz).date()
+    start = today - timedelta(days=today.weekday() + 7 * (weeks - 1))
+    since = datetime.combine(start, datetime.min.time(), tzinfo=tz)
+    
+    rows = await canvus_repository.weekly_timeline(user_id, since, settings.ANALYTICS_TIMEZONE)
+    timeline_weeks = []
+    for row in rows:
+        tags = json.loads(row.tags) if isinstance(row.tags, str) else row.tags
+        emotions = json.loads(row.emotions) if isinstance(row.emotions, str) else row.emotions
+        timeline_weeks.append(
+            CanvusTimelineWeek(
+                week_start=row.week,
+                sessions=row.sessions,
+                high_distress=row.high_distress,
+                avg_duration_seconds=round(row.avg_duration_seconds or 0.0, 1),
+                tags=dict(sorted(tags.items(), key=lambda item: -item[1])),
+                dominant_emotions=dict(sorted(emotions.items(), key=lambda item: -item[1])),
+            )
+        )
+    return CanvusTimeline(
+        user_id=user_id,
+        start=start,
+        end=today,
+        total_sessions=sum(week.sessions for week in timeline_weeks),
+        weeks=timeline_weeks,
+    )
+
+
+async def get_session_emotions(session_id: str, user_id: str) -> Optional[CanvusEmotionTrajectory]:
+    """
+    The stored emotion trajectory of a session.
+    
+    Returns:
+        The trajectory (empty if the camera was not used), or None if the
+        session is not found
+    """
+    row = await canvus_repository.get_emotion_series(session_id, user_id)
+    if row is None:
+        return None
+    if row.emotion_times is None:
+        return CanvusEmotionTrajectory(id=session_id, emotions=list(EMOTIONS), t_ms=[], values=[])
+    series = EmotionSeries.from_bytes(bytes(row.emotion_times), bytes(row.emotion_values))
+    return CanvusEmotionTrajectory(
+        id=session_id,
+        emotions=list(EMOTIONS),
+        t_ms=series.t.astype(int).tolist(),
+        values=series.values.astype(float).round(3).tolist(),
+    )
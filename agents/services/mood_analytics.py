@@ -0,0 +1,228 @@
+"""
+Per-user mood analytics
+
+Every recorded mood (diary analysis, face/voice emotion detection, canvas
+sessions) is upserted into mood_daily_aggregates (see
+migrations/007_mood_daily_aggregates.sql). Trend queries read one row per day,
+source and mood in the requested window, so their cost does not grow with the
+user's history.
+"""
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+from sqlalchemy import text
+from config.settings import settings
+from models.analytics import MoodDay, MoodTrendResponse
+from services.database import get_async_engine
+from utils.logger import logger
+
+MOOD_SOURCES = ("diary", "face", "voice", "canvas")
+TIME_BUCKETS = ("morning", "afternoon", "evening", "night")
+
+
+def _time_bucket(hour: int) -> str:
+    """Same buckets as the emotion journal's time patterns; 00-04 is night."""
+    if 5 <= hour <= 11:
+        return "morning"
+    if 12 <= hour <= 17:
+        return "afternoon"
+    if 18 <= hour <= 23:
+        return "evening"
+    return "night"
+
+
+def _normalise_mood(mood: str) -> str:
+    return mood.strip().lower()[:32]
+
+
+def _local_day(at: Optional[datetime]) -> Tuple[date, str]:
+    """The analytics day and time-of-day bucket of an observation time."""
+    if at is None:
+        at = datetime.now(timezone.utc)
+    elif at.tzinfo is None:
+        at = at.astimezone()  # Naive times are server local time
+    local = at.astimezone(ZoneInfo(settings.ANALYTICS_TIMEZONE))
+    return local.date(), _time_bucket(local.hour)
+
+
+async def _add_observation(
+    conn, user_id: str, day: date, bucket: str, source: str, mood: str, confidence: Optional[float]
+) -> None:
+    await conn.execute(
+        text(f"""
+            INSERT INTO mood_daily_aggregates (
+                user_id, day, source, mood, count, confidence_sum, {bucket}_count
+            )
+            VALUES (:user_id, :day, :source, :mood, 1, :confidence, 1)
+            ON CONFLICT (user_id, day, source, mood) DO UPDATE
+            SET count = mood_daily_aggregates.count + 1,
+                confidence_sum = mood_daily_aggregates.confidence_sum + EXCLUDED.confidence_sum,
+                {bucket}_count = mood_daily_aggregates.{bucket}_count + 1,
+                updated_at = now()
+        """),
+        {
+            "user_id": user_id,
+            "day": day,
+            "source": source,
+            "mood": _normalise_mood(mood),
+            "confidence": confidence if confidence is not None else 0.0,
+        },
+    )
+
+
+async def record_mood(
+    user_id: Optional[str],
+    source: str,
+    mood: Optional[str],
+    confidence: Optional[float],
+    at: Optional[datetime] = None,
+) -> None:
+    """
+    Add one mood observation to the user's daily aggregates.
+
+    Failures are logged and swallowed; analytics must never break the
+    operation that produced the mood.
+    """
+    if not user_id or not mood or not mood.strip():
+        return
+    day, bucket = _local_day(at)
+
+    try:
+        async with get_async_engine().begin() as conn:
+            await _add_observation(conn, user_id, day, bucket, source, mood, confidence)
+    except Exception as e:
+        logger.error(f"Failed to record mood aggregate for user {user_id}: {str(e)}")
+
+
+async def replace_mood(
+    user_id: Optional[str],
+    source: str,
+    old_mood: Optional[str],
+    old_confidence: Optional[float],
+    mood: Optional[str],
+    confidence: Optional[float],
+    at: Optional[datetime] = None,
+) -> None:
+    """
+    Move an observation recorded with old_mood to mood, e.g. when a diary
+    entry is re-analysed. Failures are logged and swallowed, as in record_mood.
+    """
+    if not old_mood or not old_mood.strip():
+        await record_mood(user_id, source, mood, confidence, at)
+        return
+    if not user_id:
+        return
+    day, bucket = _local_day(at)
+    params = {
+        "user_id": user_id,
+        "day": day,
+        "source": source,
+        "mood": _normalise_mood(old_mood),
+        "confidence": old_confidence if old_confidence is not None else 0.0,
+    }
+
+    try:
+        async with get_async_engine().begin() as conn:
+            await conn.execute(
+                text(f"""
+                    UPDATE mood_daily_aggregates
+                    SET count = count - 1,
+                        confidence_sum = confidence_sum - :confidence,
+                        {bucket}_count = {bucket}_count - 1,
+                        updated_at = now()
+                    WHERE user_id = :user_id AND day = :day AND source = :source
+                    AND mood = :mood AND count > 0 AND {bucket}_count > 0
+                """),
+                params,
+            )
+            await conn.execute(
+                text("""
+                    DELETE FROM mood_daily_aggregates
+                    WHERE user_id = :user_id AND day = :day AND source = :source
+                    AND mood = :mood AND count <= 0
+                """),
+                params,
+            )
+            if mood and mood.strip():
+                await _add_observation(conn, user_id, day, bucket, source, mood, confidence)
+    except Exception as e:
+        logger.error(f"Failed to update mood aggregate for user {user_id}: {str(e)}")
+
+
+async def get_mood_trend(
+    user_id: str, days: int = 90, source: Optional[str] = None
+) -> MoodTrendResponse:
+    """
+    Summarise a user's moods over the last `days` days.
+
+    Raises:
+        ValueError: If the source is unknown
+    """
+    if source is not None and source not in MOOD_SOURCES:
+        raise ValueError(f"Unknown source '{source}', expected one of {MOOD_SOURCES}")
+    days = max(1, min(days, settings.ANALYTICS_MAX_DAYS))
+    end = datetime.now(ZoneInfo(settings.ANALYTICS_TIMEZONE)).date()
+    start = end - timedelta(days=days - 1)
+
+    params = {"user_id": user_id, "start": start, "end": end}
+    source_filter = ""
+    if source is not None:
+        source_filter = "AND source = :source"
+        params["source"] = source
+
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text(f"""
+                SELECT day, mood, sum(count) AS count, sum(confidence_sum) AS confidence_sum,
+                       sum(morning_count) AS morning, sum(afternoon_count) AS afternoon,
+                       sum(evening_count) AS evening, sum(night_count) AS night
+                FROM mood_daily_aggregates
+                WHERE user_id = :user_id AND day BETWEEN :start AND :end {source_filter}
+                GROUP BY day, mood
+                ORDER BY day
+            """),
+            params,
+        )
+        rows = result.fetchall()
+
+    mood_counts: Dict[str, int] = defaultdict(int)
+    confidence_sums: Dict[str, float] = defaultdict(float)
+    time_of_day: Dict[str, Dict[str, int]] = {bucket: {} for bucket in TIME_BUCKETS}
+    by_day: Dict[date, MoodDay] = {}
+    day_confidence: Dict[date, float] = defaultdict(float)
+
+    for row in rows:
+        count = int(row.count)
+        mood_counts[row.mood] += count
+        confidence_sums[row.mood] += row.confidence_sum
+        for bucket in TIME_BUCKETS:
+            bucket_count = int(getattr(row, bucket))
+            if bucket_count:
+                time_of_day[bucket][row.mood] = time_of_day[bucket].get(row.mood, 0) + bucket_count
+
+        day = by_day.setdefault(row.day, MoodDay(day=row.day, total=0, moods={}))
+        day.moods[row.mood] = count
+        day.total += count
+        day_confidence[row.day] += row.confidence_sum
+
+    for day in by_day.values():
+        if day.total:
+            day.mean_confidence = round(day_confidence[day.day] / day.total, 3)
+
+    return MoodTrendResponse(
+        user_id=user_id,
+        start=start,
+        end=end,
+        source=source,
+        total=sum(mood_counts.values()),
+        dominant_mood=max(mood_counts, key=mood_counts.get) if mood_counts else None,
+        mood_counts=dict(mood_counts),
+        mean_confidence={
+            mood: round(confidence_sums[mood] / count, 3)
+            for mood, count in mood_counts.items()
+        },
+        time_of_day=time_of_day,
+        days=list(by_day.values()),
+    )
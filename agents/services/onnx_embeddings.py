@@ -0,0 +1,196 @@
+"""
+Quantised ONNX embeddings for CPU-only deployments
+
+Runs an int8 ONNX export of paraphrase-multilingual-MiniLM-L12-v2 (the same
+multilingual model as the HuggingFace fallback, so Bangla is supported) with
+onnxruntime and the Rust tokenizers library; neither PyTorch nor
+sentence-transformers is imported.
+
+Concurrent single-text requests are collected into dynamic batches (up to
+max_batch texts or max_wait_ms) and run on a thread pool. Pooling matches
+sentence-transformers: attention-masked mean over tokens, L2-normalised.
+
+Create the model files with:
+    python export_onnx_embeddings.py
+"""
+
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from utils.logger import logger
+
+MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+DEFAULT_MODEL_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "onnx_models",
+    "paraphrase-multilingual-MiniLM-L12-v2-int8",
+)
+MODEL_FILE = "model_quantized.onnx"
+
+_WARM_UP_TEXTS = [
+    "I have been feeling anxious about my exams.",
+    "আমি আজ খুব ক্লান্ত এবং মন খারাপ লাগছে।",
+    "calm",
+]
+
+
+class OnnxEmbeddings(Embeddings):
+    """LangChain embeddings backed by an ONNX Runtime session with dynamic batching."""
+
+    def __init__(
+        self,
+        model_dir: Optional[str] = None,
+        max_batch: int = 32,
+        max_wait_ms: float = 5.0,
+        workers: int = 2,
+        intra_op_threads: Optional[int] = None,
+        max_length: int = 128,
+    ):
+        """
+        Args:
+            model_dir: Directory with model_quantized.onnx and tokenizer.json
+            max_batch: Texts per inference call
+            max_wait_ms: How long a request waits for others to share its batch
+            workers: Inference threads (batches run in parallel)
+            intra_op_threads: ONNX Runtime threads per inference; defaults to
+                cpu_count / workers
+            max_length: Token limit per text (the model was trained with 128)
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = model_dir or DEFAULT_MODEL_DIR
+        model_path = os.path.join(model_dir, MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found; run: python export_onnx_embeddings.py"
+            )
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads or max(1, (os.cpu_count() or 2) // workers)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="onnx-embed")
+        self._requests: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._batcher = threading.Thread(target=self._collect_batches, daemon=True, name="onnx-batcher")
+        self._batcher.start()
+        self.stats = {"batches": 0, "texts": 0, "inference_ms": 0.0}
+        self._stats_lock = threading.Lock()  # _encode runs on several worker threads
+        logger.info(f"Loaded ONNX embeddings from {model_path}")
+
+    # -- inference ---------------------------------------------------------
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts in one session run."""
+        started = time.perf_counter()
+        # Similar lengths together keep padding small; restore order afterwards
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        encodings = self.tokenizer.encode_batch([texts[i] for i in order])
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            inputs["token_type_ids"] = np.zeros_like(input_ids)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+        result = np.empty_like(pooled)
+        result[order] = pooled
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._stats_lock:
+            self.stats["batches"] += 1
+            self.stats["texts"] += len(texts)
+            self.stats["inference_ms"] += elapsed_ms
+        return result
+
+    def _run_batch(self, batch: List[Tuple[str, Future]]) -> None:
+        # Futures were marked running when the batch was formed, so callers
+        # can no longer cancel them and each is resolved exactly once here
+        try:
+            vectors = self._encode([text for text, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector.tolist())
+
+    def _collect_batches(self) -> None:
+        """
+        Group queued requests into batches and hand them to the thread pool.
+        Requests cancelled while queued (e.g. a cancelled aembed_query) are dropped.
+        """
+        while True:
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if batch:
+                self._executor.submit(self._run_batch, batch)
+
+    def submit(self, text: str) -> Future:
+        """Queue one text for the next dynamic batch."""
+        future: Future = Future()
+        self._requests.put((text, future))
+        return future
+
+    # -- LangChain interface -----------------------------------------------
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit(text).result()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # Already a batch: split into max_batch chunks and run them in parallel
+        chunks = [texts[i:i + self.max_batch] for i in range(0, len(texts), self.max_batch)]
+        results = self._executor.map(self._encode, chunks)
+        return [vector.tolist() for chunk in results for vector in chunk]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.get_running_loop().run_in_executor(None, self.embed_documents, texts)
+
+    def warm_up(self) -> float:
+        """Run a first inference so the first request does not pay for graph setup."""
+        started = time.perf_counter()
+        self._encode(_WARM_UP_TEXTS)
+        elapsed = (time.perf_counter() - started) * 1000
+        logger.info(f"ONNX embeddings warmed up in {elapsed:.0f}ms")
+        return elapsed
+
+    def batch_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        batches = stats["batches"]
+        return {
+            **stats,
+            "mean_batch_size": round(stats["texts"] / batches, 2) if batches else 0.0,
+            "mean_batch_ms": round(stats["inference_ms"] / batches, 2) if batches else 0.0,
+        }
@@ -0,0 +1,41 @@
+"""
+Opaque keyset pagination cursors
+
+A cursor encodes the (sort key, id) of the last row of a page. The next page
+continues strictly after it, so paging cost does not grow with depth the way
+OFFSET does.
+"""
+
+import base64
+import json
+from typing import Optional, Tuple
+
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(sort_key: str, row_id: str) -> str:
+    """Encode the position of the last row of a page."""
+    raw = json.dumps({"k": sort_key, "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return str(data["k"]), str(data["i"])
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+
+
+def clamp_page_size(limit: int) -> int:
+    """Keep requested page sizes within sane bounds."""
+    return max(1, min(limit, MAX_PAGE_SIZE))
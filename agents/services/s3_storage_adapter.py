@@ -31,9 +31,26 @@ logger = logging.getLogger(__name__)
 class S3StorageAdapter:
     """Adapter for S3 temporary file storage"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        bucket_name: Optional[str] = None,
+        key_prefix: str = "temp",
+        expire_days: Optional[int] = 1,
+        local_dir_name: str = "temp_storage",
+    ):
+        """
+        Args:
+            bucket_name: S3 bucket (defaults to settings.S3_TEMP_BUCKET)
+            key_prefix: Prefix of generated S3 keys
+            expire_days: Lifecycle expiry applied when creating the bucket,
+                or None for persistent storage
+            local_dir_name: Directory under services/ used as local fallback
+        """
         self.enabled = settings.USE_S3_STORAGE
-        self.bucket_name = settings.S3_TEMP_BUCKET
+        self.bucket_name = bucket_name or settings.S3_TEMP_BUCKET
+        self.key_prefix = key_prefix
+        self.expire_days = expire_days
+        self.local_dir_name = local_dir_name
         self.s3_client = None
         self.local_temp_dir = None
 
@@ -77,7 +94,7 @@ class S3StorageAdapter:
     def _initialize_local_storage(self):
         """Initialize local filesystem storage as fallback"""
         current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.local_temp_dir = os.path.join(current_dir, "temp_storage")
+        self.local_temp_dir = os.path.join(current_dir, self.local_dir_name)
 
         if not os.path.exists(self.local_temp_dir):
             os.makedirs(self.local_temp_dir, exist_ok=True)
@@ -106,23 +123,25 @@ class S3StorageAdapter:
                             },
                         )
 
-                    # Add lifecycle policy to auto-delete files after 1 day
-                    lifecycle_policy = {
-                        "Rules": [
-                            {
-                                "Id": "DeleteTempFilesAfter1Day",
-                                "Status": "Enabled",
-                                "Prefix": "",
-                                "Expiration": {"Days": 1},
-                            }
-                        ]
-                    }
-                    self.s3_client.put_bucket_lifecycle_configuration(
-                        Bucket=self.bucket_name, LifecycleConfiguration=lifecycle_policy
-                    )
+                    if self.expire_days is not None:
+                        # Add lifecycle policy to auto-delete temporary files
+                        lifecycle_policy = {
+                            "Rules": [
+                                {
+                                    "Id": f"DeleteTempFilesAfter{self.expire_days}Day",
+                                    "Status": "Enabled",
+                                    "Prefix": "",
+                                    "Expiration": {"Days": self.expire_days},
+                                }
+                            ]
+                        }
+                        self.s3_client.put_bucket_lifecycle_configuration(
+                            Bucket=self.bucket_name, LifecycleConfiguration=lifecycle_policy
+                        )
 
                     logger.info(
-                        f"Created S3 bucket '{self.bucket_name}' with 1-day auto-delete policy"
+                        f"Created S3 bucket '{self.bucket_name}' "
+                        f"(expire_days={self.expire_days})"
                     )
                 except Exception as create_error:
                     logger.error(f"Failed to create S3 bucket: {str(create_error)}")
@@ -137,6 +156,7 @@ class S3StorageAdapter:
         user_id: str,
         filename: str,
         content_type: str = "application/octet-stream",
+        key: Optional[str] = None,
     ) -> str:
         """
         Save file to S3 or local storage
@@ -146,6 +166,8 @@ class S3StorageAdapter:
             user_id: User identifier for organizing files
             filename: Original filename
             content_type: MIME type of the file
+            key: Explicit relative key (e.g. content-addressed) instead of a
+                generated timestamped one
 
         Returns:
             S3 key or local filepath for the saved file
@@ -153,9 +175,12 @@ class S3StorageAdapter:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         safe_filename = os.path.basename(filename)  # Security: prevent path traversal
 
+        if key is not None and not self.enabled:
+            return await self._save_local_key(file_data, key)
+
         if self.enabled:
             # S3 storage
-            s3_key = f"temp/{user_id}/{timestamp}_{safe_filename}"
+            s3_key = key or f"{self.key_prefix}/{user_id}/{timestamp}_{safe_filename}"
 
             try:
                 self.s3_client.put_object(
@@ -177,6 +202,8 @@ class S3StorageAdapter:
                 logger.error(f"Failed to upload to S3: {str(e)}")
                 logger.warning("Falling back to local storage for this file")
                 # Fallback to local storage
+                if key is not None:
+                    return await self._save_local_key(file_data, key)
                 return await self._save_local(
                     file_data, user_id, safe_filename, timestamp
                 )
@@ -201,6 +228,26 @@ class S3StorageAdapter:
             logger.error(f"Failed to save file locally: {str(e)}")
             raise
 
+    def _local_path_for_key(self, key: str) -> str:
+        """Map a relative key to a path inside the local storage directory."""
+        if self.local_temp_dir is None:
+            self._initialize_local_storage()
+        root = os.path.realpath(self.local_temp_dir)
+        path = os.path.realpath(os.path.join(root, key))
+        # Security: prevent path traversal outside the storage directory
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Invalid storage key: {key}")
+        return path
+
+    async def _save_local_key(self, file_data: bytes, key: str) -> str:
+        """Save file locally under an explicit relative key"""
+        local_path = self._local_path_for_key(key)
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        with open(local_path, "wb") as f:
+            f.write(file_data)
+        logger.info(f"Saved file locally: {local_path}")
+        return local_path
+
     async def get_file(self, file_key: str) -> Optional[bytes]:
         """
         Retrieve file from S3 or local storage
@@ -225,24 +272,32 @@ class S3StorageAdapter:
                 error_code = e.response["Error"]["Code"]
                 if error_code == "NoSuchKey":
                     logger.warning(f"File not found in S3: {file_key}")
-                    return None
                 else:
                     logger.error(f"Error retrieving file from S3: {str(e)}")
-                    return None
+            except BotoCoreError as e:
+                logger.error(f"Error retrieving file from S3: {str(e)}")
+
+            # save_file falls back to local storage when an upload fails
+            return self._read_local(file_key)
         else:
-            # Local storage
-            try:
-                if os.path.exists(file_key):
-                    with open(file_key, "rb") as f:
-                        file_data = f.read()
-                    logger.info(f"Retrieved file locally: {file_key}")
-                    return file_data
-                else:
-                    logger.warning(f"File not found locally: {file_key}")
-                    return None
-            except Exception as e:
-                logger.error(f"Error reading local file: {str(e)}")
+            return self._read_local(file_key)
+
+    def _read_local(self, file_key: str) -> Optional[bytes]:
+        """Read a file by local path or relative key from the local storage directory"""
+        try:
+            if not os.path.isabs(file_key):
+                file_key = self._local_path_for_key(file_key)
+            if os.path.exists(file_key):
+                with open(file_key, "rb") as f:
+                    file_data = f.read()
+                logger.info(f"Retrieved file locally: {file_key}")
+                return file_data
+            else:
+                logger.warning(f"File not found locally: {file_key}")
                 return None
+        except Exception as e:
+            logger.error(f"Error reading local file: {str(e)}")
+            return None
 
     async def delete_files(self, file_keys: List[str]) -> int:
         """
@@ -309,6 +364,14 @@ class S3StorageAdapter:
 # Create singleton instance
 s3_storage = S3StorageAdapter()
 
+# Persistent storage for user media (diary images, canvas drawings)
+media_storage = S3StorageAdapter(
+    bucket_name=settings.S3_MEDIA_BUCKET,
+    key_prefix="media",
+    expire_days=None,
+    local_dir_name="media_storage",
+)
+
 # Log storage configuration on import
 storage_info = s3_storage.get_storage_info()
 if storage_info["enabled"]:
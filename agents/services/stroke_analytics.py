@@ -0,0 +1,542 @@
+"""
+Vectorised stroke analytics for Moner Canvus sessions
+
+Strokes are converted once into contiguous arrays (all points of all strokes
+back to back, with per-stroke offsets) and every metric is computed with
+NumPy over those arrays, so a session with 100k points is analysed in a few
+milliseconds.
+
+Metrics (canvas pixels and milliseconds as sent by the client):
+- velocity and acceleration of the pen along each stroke
+- curvature (turning angle per pixel) and straightness (chord / path length)
+- pauses inside strokes and between strokes
+- pen vs eraser usage
+- canvas coverage (share of grid cells inked) and spatial density (ink share
+  per region of a 3x3 grid, its entropy and the ink centroid)
+
+StrokeAccumulator computes the same metrics over batches of strokes as they
+arrive (chunked uploads), in constant memory.
+
+Usage:
+    arrays = StrokeArrays.from_strokes(payload.strokes)
+    metrics = analyse_strokes(arrays, canvas_size=(900, 550))
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+# A gap between two consecutive points longer than this is a pause in a stroke
+PAUSE_MS = 300.0
+PAUSE_BUCKETS_MS = (500.0, 2000.0, 5000.0)
+COVERAGE_CELL_PX = 10.0
+DENSITY_GRID = 3
+DEFAULT_CANVAS_SIZE = (900, 550)
+# Larger canvas sides are clamped: the ink grid is (side / COVERAGE_CELL_PX)^2 cells
+MAX_CANVAS_SIDE = 4096
+# Interpolated ink samples are binned in blocks of at most this many points
+INK_SAMPLE_BLOCK = 1 << 18
+# Rounding of the kinematic distributions, by _kinematic_samples key
+STAT_DIGITS = {"speed": 2, "strokeSpeed": 2, "acceleration": 1, "straightness": 3, "duration": 1}
+
+
+class StrokeArrays:
+    """All stroke points of a session as flat arrays."""
+
+    def __init__(
+        self,
+        xy: np.ndarray,
+        t: np.ndarray,
+        offsets: np.ndarray,
+        is_eraser: np.ndarray,
+        widths: np.ndarray,
+        created_at: np.ndarray,
+        colors: Optional[List[str]] = None,
+    ):
+        """
+        Args:
+            xy: (N, 2) float64 point coordinates
+            t: (N,) float64 point times in ms
+            offsets: (S + 1,) int64; stroke i owns points offsets[i]:offsets[i + 1]
+            is_eraser: (S,) bool
+            widths: (S,) float32 brush widths
+            created_at: (S,) float64 stroke start times in ms
+            colors: Per-stroke colour strings
+        """
+        self.xy = xy
+        self.t = t
+        self.offsets = offsets
+        self.is_eraser = is_eraser
+        self.widths = widths
+        self.created_at = created_at
+        self.colors = colors or []
+        self.counts = np.diff(offsets)
+        # Stroke number of every point
+        self.stroke_of_point = np.repeat(np.arange(len(self.counts)), self.counts)
+
+    @property
+    def stroke_count(self) -> int:
+        return len(self.counts)
+
+    @property
+    def point_count(self) -> int:
+        return len(self.t)
+
+    @classmethod
+    def from_strokes(cls, strokes: Iterable[Any]) -> "StrokeArrays":
+        """Build from StrokeEvent models (one pass over the points)."""
+        strokes = list(strokes)
+        counts = np.fromiter((len(s.points) for s in strokes), dtype=np.int64, count=len(strokes))
+        total = int(counts.sum())
+        flat = np.fromiter(
+            (value for s in strokes for p in s.points for value in (p.x, p.y, p.t)),
+            dtype=np.float64,
+            count=total * 3,
+        ).reshape(total, 3)
+        return cls(
+            xy=np.ascontiguousarray(flat[:, :2]),
+            t=np.ascontiguousarray(flat[:, 2]),
+            offsets=np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            is_eraser=np.array([s.tool == "eraser" for s in strokes], dtype=bool),
+            widths=np.array([s.width for s in strokes], dtype=np.float32),
+            created_at=np.array([s.createdAt for s in strokes], dtype=np.float64),
+            colors=[s.color for s in strokes],
+        )
+
+
+def _stats(values: np.ndarray, digits: int = 2) -> Dict[str, float]:
+    if values.size == 0:
+        return {"mean": 0.0, "median": 0.0, "p90": 0.0, "max": 0.0}
+    # Nearest-rank percentiles: one partition instead of np.percentile's interpolation
+    ranks = [(values.size - 1) // 2, int(0.9 * (values.size - 1))]
+    p50, p90 = np.partition(values, ranks)[ranks]
+    return {
+        "mean": round(float(values.mean()), digits),
+        "median": round(float(p50), digits),
+        "p90": round(float(p90), digits),
+        "max": round(float(values.max()), digits),
+    }
+
+
+def _segments(arrays: StrokeArrays):
+    """Consecutive point pairs inside the same stroke: (start index, dxy, dt ms, length)."""
+    same_stroke = arrays.stroke_of_point[1:] == arrays.stroke_of_point[:-1]
+    dxy = np.diff(arrays.xy, axis=0)[same_stroke]
+    dt = np.diff(arrays.t)[same_stroke]
+    return np.flatnonzero(same_stroke), dxy, dt, np.sqrt(np.einsum("ij,ij->i", dxy, dxy))
+
+
+def _kinematic_samples(arrays: StrokeArrays, start, dxy, dt, length) -> Dict[str, np.ndarray]:
+    """Per-segment, per-turn and per-stroke values the kinematic metrics summarise."""
+    strokes = arrays.stroke_of_point[start]
+    moving = dt > 0
+    speed = np.zeros_like(length)
+    speed[moving] = length[moving] / dt[moving] * 1000.0  # px/s
+
+    # Acceleration between consecutive segments of the same stroke
+    adjacent = start[1:] == start[:-1] + 1
+    follows = adjacent & moving[1:] & moving[:-1]
+    mid_dt = (dt[1:] + dt[:-1])[follows] / 2.0 / 1000.0
+    acceleration = np.abs(np.diff(speed)[follows]) / mid_dt  # px/s^2
+
+    # Turning angle between consecutive segments; curvature is angle per pixel
+    cross = dxy[:-1, 0] * dxy[1:, 1] - dxy[:-1, 1] * dxy[1:, 0]
+    dot = np.einsum("ij,ij->i", dxy[:-1], dxy[1:])
+    turning = adjacent & (length[1:] > 0) & (length[:-1] > 0)
+    angles = np.abs(np.arctan2(cross[turning], dot[turning]))
+
+    n = arrays.stroke_count
+    path_length = np.bincount(strokes, weights=length, minlength=n)
+    first, last = arrays.offsets[:-1], np.maximum(arrays.offsets[1:] - 1, arrays.offsets[:-1])
+    has_points = arrays.counts > 0
+    chord = np.zeros(n)
+    duration = np.zeros(n)
+    chord[has_points] = np.hypot(*(arrays.xy[last[has_points]] - arrays.xy[first[has_points]]).T)
+    duration[has_points] = arrays.t[last[has_points]] - arrays.t[first[has_points]]
+    drawn = (path_length > 0) & (duration > 0)
+    return {
+        "speed": speed[moving],
+        "strokeSpeed": path_length[drawn] / duration[drawn] * 1000.0,
+        "acceleration": acceleration,
+        "angles": angles,
+        "pathLength": path_length,
+        "straightness": chord[path_length > 0] / path_length[path_length > 0],
+        "duration": duration[has_points],
+    }
+
+
+def _kinematic_metrics(
+    total_length: float, angle_sum: float, angle_count: int, stats: Dict[str, Dict[str, float]]
+) -> Dict[str, Any]:
+    return {
+        "totalPathLengthPx": round(total_length, 1),
+        "velocityPxPerSec": stats["speed"],
+        "strokeVelocityPxPerSec": stats["strokeSpeed"],
+        "accelerationPxPerSec2": stats["acceleration"],
+        "curvatureRadPerPx": round(angle_sum / total_length, 4) if total_length else 0.0,
+        "meanTurningAngleRad": round(angle_sum / angle_count, 3) if angle_count else 0.0,
+        "straightness": stats["straightness"],
+        "strokeDurationMs": stats["duration"],
+    }
+
+
+def _kinematics(arrays: StrokeArrays, start, dxy, dt, length) -> Dict[str, Any]:
+    samples = _kinematic_samples(arrays, start, dxy, dt, length)
+    angles = samples["angles"]
+    return _kinematic_metrics(
+        float(samples["pathLength"].sum()),
+        float(angles.sum()),
+        angles.size,
+        {name: _stats(samples[name], STAT_DIGITS[name]) for name in STAT_DIGITS},
+    )
+
+
+def _stroke_times(arrays: StrokeArrays) -> Tuple[np.ndarray, np.ndarray]:
+    """Start and end times of the strokes that have points, in drawing order."""
+    has_points = arrays.counts > 0
+    order = np.argsort(arrays.created_at[has_points], kind="stable")
+    starts = arrays.t[arrays.offsets[:-1][has_points]][order]
+    ends = arrays.t[arrays.offsets[1:][has_points] - 1][order]
+    return starts, ends
+
+
+def _pause_buckets(between: np.ndarray) -> np.ndarray:
+    return np.bincount(np.searchsorted(PAUSE_BUCKETS_MS, between, side="right"), minlength=4)
+
+
+def _pause_metrics(
+    between: Dict[str, float], buckets: np.ndarray, in_stroke_count: int, longest_ms: float
+) -> Dict[str, Any]:
+    return {
+        "betweenStrokesMs": between,
+        "inStrokePauseCount": int(in_stroke_count),
+        "longestPauseMs": round(float(longest_ms), 1),
+        "pauseDistribution": {
+            "under0.5s": int(buckets[0]),
+            "0.5to2s": int(buckets[1]),
+            "2to5s": int(buckets[2]),
+            "over5s": int(buckets[3]),
+        },
+    }
+
+
+def _pauses(arrays: StrokeArrays, dt: np.ndarray) -> Dict[str, Any]:
+    in_stroke = dt[dt > PAUSE_MS]
+    starts, ends = _stroke_times(arrays)
+    between = np.clip(starts[1:] - ends[:-1], 0, None)
+    return _pause_metrics(
+        _stats(between, 1),
+        _pause_buckets(between),
+        in_stroke.size,
+        max(between.max(initial=0.0), in_stroke.max(initial=0.0)),
+    )
+
+
+def _canvas_size(canvas_size: Optional[Tuple[int, int]]) -> Tuple[int, int]:
+    """The canvas size to analyse on: the default if unknown or empty, sides clamped to MAX_CANVAS_SIDE."""
+    if not canvas_size or min(canvas_size) < 1:
+        return DEFAULT_CANVAS_SIZE
+    return min(int(canvas_size[0]), MAX_CANVAS_SIDE), min(int(canvas_size[1]), MAX_CANVAS_SIDE)
+
+
+def _ink_samples(
+    arrays: StrokeArrays, start, dxy, canvas_size: Tuple[int, int], step: float
+) -> Iterator[np.ndarray]:
+    """
+    Pen points, then points interpolated every `step` px along pen segments,
+    in blocks of at most INK_SAMPLE_BLOCK interpolated points. Segment ends
+    are clipped to the canvas first, so no segment yields more points than
+    it takes to cross the canvas, however far off it the client's
+    coordinates are.
+    """
+    pen_point = ~arrays.is_eraser[arrays.stroke_of_point]
+    yield arrays.xy[pen_point] if arrays.is_eraser.any() else arrays.xy
+
+    bounds = (canvas_size[0], canvas_size[1])
+    begin = np.clip(arrays.xy[start], 0, bounds)
+    dxy = np.clip(arrays.xy[start] + dxy, 0, bounds) - begin
+    length = np.hypot(dxy[:, 0], dxy[:, 1])
+    # Only segments longer than a step leave gaps; freehand input rarely does
+    gaps = np.flatnonzero(length > step)
+    gaps = gaps[pen_point[start[gaps]]]
+    if gaps.size == 0:
+        return
+    begin, dxy = begin[gaps], dxy[gaps]
+    extra = np.ceil(length[gaps] / step).astype(np.int64) - 1
+
+    # Split the segments where the running sample count passes a block boundary
+    cuts = np.searchsorted(np.cumsum(extra), np.arange(INK_SAMPLE_BLOCK, extra.sum(), INK_SAMPLE_BLOCK))
+    for lo, hi in zip(np.concatenate(([0], cuts)), np.concatenate((cuts, [len(extra)]))):
+        block = extra[lo:hi]
+        segment = np.repeat(np.arange(lo, hi), block)
+        # Position k / (extra + 1) along the segment, k = 1..extra
+        first = np.repeat(np.cumsum(block) - block, block)
+        k = np.arange(len(segment)) - first + 1
+        fraction = (k / (extra[segment] + 1))[:, None]
+        yield begin[segment] + dxy[segment] * fraction
+
+
+def _ink_grid(samples: Iterable[np.ndarray], canvas_size: Tuple[int, int]) -> np.ndarray:
+    """Ink samples (blocks of points) per COVERAGE_CELL_PX cell, as a (rows, columns) grid."""
+    width, height = canvas_size
+    columns = int(np.ceil(width / COVERAGE_CELL_PX))
+    rows = int(np.ceil(height / COVERAGE_CELL_PX))
+    ink = np.zeros(rows * columns, dtype=np.int64)
+    for block in samples:
+        if block.size == 0:
+            continue
+        block = np.clip(block, 0, (width - 1e-6, height - 1e-6))
+        cell = (block * (1.0 / COVERAGE_CELL_PX)).astype(np.int64)  # >= 0, so truncation floors
+        ink += np.bincount(cell[:, 1] * columns + cell[:, 0], minlength=rows * columns)
+    return ink.reshape(rows, columns)
+
+
+def _spatial(grid: np.ndarray, canvas_size: Tuple[int, int]) -> Dict[str, Any]:
+    """
+    Coverage, bounding box, centroid and regions, derived from the ink grid
+    (one pass over the samples in _ink_grid), at cell resolution.
+    """
+    width, height = canvas_size
+    total = int(grid.sum())
+    if total == 0:
+        return {
+            "canvasCoverage": 0.0,
+            "boundingBoxFraction": 0.0,
+            "densityGrid": [[0.0] * DENSITY_GRID for _ in range(DENSITY_GRID)],
+            "spatialEntropy": 0.0,
+            "centroid": [0.5, 0.5],
+        }
+
+    rows, columns = grid.shape
+    coverage = np.count_nonzero(grid) / grid.size
+    inked_rows = np.flatnonzero(grid.any(axis=1))
+    inked_columns = np.flatnonzero(grid.any(axis=0))
+    bbox = (
+        (inked_columns[-1] - inked_columns[0] + 1) * (inked_rows[-1] - inked_rows[0] + 1)
+        * COVERAGE_CELL_PX ** 2 / (width * height)
+    )
+    centres = (np.arange(max(rows, columns)) + 0.5) * COVERAGE_CELL_PX
+    centroid = (
+        float(grid.sum(axis=0) @ centres[:columns]) / total / width,
+        float(grid.sum(axis=1) @ centres[:rows]) / total / height,
+    )
+
+    row_region = np.minimum(np.arange(rows) * COVERAGE_CELL_PX * DENSITY_GRID // height, DENSITY_GRID - 1)
+    column_region = np.minimum(np.arange(columns) * COVERAGE_CELL_PX * DENSITY_GRID // width, DENSITY_GRID - 1)
+    region = (row_region[:, None] * DENSITY_GRID + column_region[None, :]).astype(np.int64).ravel()
+    share = np.bincount(region, weights=grid.ravel(), minlength=DENSITY_GRID ** 2) / total
+    nonzero = share[share > 0]
+    entropy = float(-(nonzero * np.log(nonzero)).sum() / np.log(DENSITY_GRID ** 2))
+
+    return {
+        "canvasCoverage": round(float(coverage), 4),
+        "boundingBoxFraction": round(float(min(bbox, 1.0)), 4),
+        "densityGrid": np.round(share.reshape(DENSITY_GRID, DENSITY_GRID), 3).tolist(),
+        "spatialEntropy": round(entropy, 3),
+        "centroid": [round(float(centroid[0]), 3), round(float(centroid[1]), 3)],
+    }
+
+
+def _counts(
+    stroke_count: int,
+    point_count: int,
+    eraser_strokes: int,
+    eraser_points: int,
+    pen_width_sum: float,
+    erase_events: int,
+) -> Dict[str, Any]:
+    pen_strokes = stroke_count - eraser_strokes
+    return {
+        "strokeCount": stroke_count,
+        "pointCount": point_count,
+        "penStrokes": pen_strokes,
+        "eraserStrokes": eraser_strokes,
+        "eraseEvents": erase_events,
+        "eraserStrokeRatio": round(eraser_strokes / stroke_count, 3) if stroke_count else 0.0,
+        "eraserPointRatio": round(eraser_points / point_count, 3) if point_count else 0.0,
+        "meanBrushWidth": round(pen_width_sum / pen_strokes, 2) if pen_strokes else 0.0,
+    }
+
+
+def analyse_strokes(
+    arrays: StrokeArrays,
+    canvas_size: Optional[Tuple[int, int]] = None,
+    erase_events: int = 0,
+) -> Dict[str, Any]:
+    """
+    Compute the stroke metrics of a session.
+
+    Args:
+        arrays: The session's strokes
+        canvas_size: (width, height) in stroke coordinate units; defaults to
+            the client canvas, and sides over MAX_CANVAS_SIDE are clamped
+        erase_events: Number of object erase events (payload.erases)
+
+    Returns:
+        JSON-serialisable metrics
+    """
+    canvas_size = _canvas_size(canvas_size)
+    start, dxy, dt, length = _segments(arrays)
+    samples = _ink_samples(arrays, start, dxy, canvas_size, COVERAGE_CELL_PX / 2)
+
+    return {
+        **_counts(
+            arrays.stroke_count,
+            arrays.point_count,
+            int(arrays.is_eraser.sum()),
+            int(arrays.counts[arrays.is_eraser].sum()),
+            float(arrays.widths[~arrays.is_eraser].astype(np.float64).sum()),
+            erase_events,
+        ),
+        **_kinematics(arrays, start, dxy, dt, length),
+        "pauses": _pauses(arrays, dt),
+        **_spatial(_ink_grid(samples, canvas_size), canvas_size),
+    }
+
+
+class _Distribution:
+    """
+    Count, sum, max and a log-binned histogram of non-negative values, for
+    _stats-like summaries in constant memory. Percentiles are nearest-rank
+    over the histogram: within half a bin (about 4%) of the exact value.
+    """
+
+    LOW = 1e-3  # Values below this count as zero
+    BINS_PER_DECADE = 32
+    DECADES = 13
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = np.zeros(self.BINS_PER_DECADE * self.DECADES + 1, dtype=np.int64)
+
+    def add(self, values: np.ndarray) -> None:
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.total += float(values.sum())
+        self.max = max(self.max, float(values.max()))
+        with np.errstate(divide="ignore"):
+            bins = np.floor(np.log10(np.maximum(values, 0.0) / self.LOW) * self.BINS_PER_DECADE) + 1
+        bins = np.clip(bins, 0, len(self.histogram) - 1).astype(np.int64)
+        self.histogram += np.bincount(bins, minlength=len(self.histogram))
+
+    def _value(self, rank: int) -> float:
+        """Centre of the bin holding the value of this rank (0 for the zero bin)."""
+        b = int(np.searchsorted(np.cumsum(self.histogram), rank, side="right"))
+        if b == 0:
+            return 0.0
+        centre = self.LOW * 10 ** ((b - 0.5) / self.BINS_PER_DECADE)
+        return min(centre, self.max)
+
+    def stats(self, digits: int = 2) -> Dict[str, float]:
+        if self.count == 0:
+            return {"mean": 0.0, "median": 0.0, "p90": 0.0, "max": 0.0}
+        return {
+            "mean": round(self.total / self.count, digits),
+            "median": round(self._value((self.count - 1) // 2), digits),
+            "p90": round(self._value(int(0.9 * (self.count - 1))), digits),
+            "max": round(self.max, digits),
+        }
+
+
+class StrokeAccumulator:
+    """
+    Stroke metrics of a session that arrives in batches of complete strokes
+    (chunked uploads), in memory independent of the session's length.
+
+    Counts, totals, means, maxima, the pause distribution and the ink grid
+    are exact; medians and p90s come from log-binned histograms (see
+    _Distribution). Batches must arrive in drawing order: the pause before
+    a batch's first stroke is measured from the previous batch's last one.
+
+    Usage:
+        accumulator = StrokeAccumulator(canvas_size=(900, 550))
+        accumulator.add(StrokeArrays.from_strokes(batch))
+        metrics = accumulator.result(erase_events=3)
+    """
+
+    def __init__(self, canvas_size: Optional[Tuple[int, int]] = None):
+        self.canvas_size = _canvas_size(canvas_size)
+        self.stroke_count = 0
+        self.point_count = 0
+        self.eraser_strokes = 0
+        self.eraser_points = 0
+        self.pen_width_sum = 0.0
+        self.total_length = 0.0
+        self.angle_sum = 0.0
+        self.angle_count = 0
+        self.distributions = {name: _Distribution() for name in STAT_DIGITS}
+        self.between = _Distribution()
+        self.pause_buckets = np.zeros(4, dtype=np.int64)
+        self.in_stroke_pauses = 0
+        self.longest_pause_ms = 0.0
+        self.last_stroke_end: Optional[float] = None
+        self.grid = _ink_grid([], self.canvas_size).astype(np.int32)  # held while an upload is open
+
+    def add(self, arrays: StrokeArrays) -> None:
+        """
+        Add a batch of strokes (each stroke complete, with all its points).
+
+        Raises:
+            ValueError: If the batch cannot be analysed; the accumulator is
+                left unchanged
+        """
+        # Compute everything that can fail before updating any state
+        start, dxy, dt, length = _segments(arrays)
+        samples = _kinematic_samples(arrays, start, dxy, dt, length)
+        ink = _ink_grid(_ink_samples(arrays, start, dxy, self.canvas_size, COVERAGE_CELL_PX / 2), self.canvas_size)
+        in_stroke = dt[dt > PAUSE_MS]
+        starts, ends = _stroke_times(arrays)
+        if self.last_stroke_end is not None:
+            # The first stroke of the batch follows the last one of the previous batch
+            ends = np.concatenate(([self.last_stroke_end], ends))
+            between = np.clip(starts - ends[:-1], 0, None)
+        else:
+            between = np.clip(starts[1:] - ends[:-1], 0, None)
+
+        self.stroke_count += arrays.stroke_count
+        self.point_count += arrays.point_count
+        self.eraser_strokes += int(arrays.is_eraser.sum())
+        self.eraser_points += int(arrays.counts[arrays.is_eraser].sum())
+        self.pen_width_sum += float(arrays.widths[~arrays.is_eraser].astype(np.float64).sum())
+
+        self.total_length += float(samples["pathLength"].sum())
+        self.angle_sum += float(samples["angles"].sum())
+        self.angle_count += samples["angles"].size
+        for name, distribution in self.distributions.items():
+            distribution.add(samples[name])
+
+        if ends.size:
+            self.last_stroke_end = float(ends[-1])
+        self.between.add(between)
+        self.pause_buckets += _pause_buckets(between)
+        self.in_stroke_pauses += in_stroke.size
+        self.longest_pause_ms = max(
+            self.longest_pause_ms, between.max(initial=0.0), in_stroke.max(initial=0.0)
+        )
+
+        self.grid += ink
+
+    def result(self, erase_events: int = 0) -> Dict[str, Any]:
+        """The metrics so far, in the format of analyse_strokes."""
+        return {
+            **_counts(
+                self.stroke_count,
+                self.point_count,
+                self.eraser_strokes,
+                self.eraser_points,
+                self.pen_width_sum,
+                erase_events,
+            ),
+            **_kinematic_metrics(
+                self.total_length,
+                self.angle_sum,
+                self.angle_count,
+                {name: d.stats(STAT_DIGITS[name]) for name, d in self.distributions.items()},
+            ),
+            "pauses": _pause_metrics(
+                self.between.stats(1), self.pause_buckets, self.in_stroke_pauses, self.longest_pause_ms
+            ),
+            **_spatial(self.grid, self.canvas_size),
+        }
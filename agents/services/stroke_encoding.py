@@ -0,0 +1,155 @@
+"""
+Compact binary encoding of Moner Canvus stroke points
+
+The JSON payload sends every point as an {x, y, t} object, which costs a
+Python object per point to parse and validate. The compact format keeps the
+per-stroke fields (id, tool, colour, width) as JSON and packs all points of
+all strokes into one base64 string of little-endian int16 triples
+(dx, dy, dt), delta-encoded within each stroke:
+- x and y are in units of 1/scale pixels (scale defaults to 10, i.e. 0.1 px);
+  the first point of a stroke is a delta from the stroke's (x0, y0), in
+  pixels (0 if omitted)
+- t is in milliseconds relative to the stroke's t0; the first point's dt is
+  its offset from t0
+
+Each delta must fit in an int16: at most 32767 units per step, i.e.
+3276.7 px at the default scale, and 32.767 s between two points of a
+stroke. Encoders send the stroke's first point as (x0, y0, t0) and compute
+each delta from the previously decoded position, not the previous input
+point. A step that does not fit is clamped and the remainder carried into
+the following steps, so later points are exact again once the stroke has
+caught up instead of all being shifted by the clamped amount.
+
+Decoding is a single np.frombuffer plus a cumulative sum, straight into
+StrokeArrays.
+"""
+
+import base64
+import binascii
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from services.stroke_analytics import StrokeArrays
+
+DEFAULT_SCALE = 10.0
+_INT16 = np.iinfo(np.int16)
+
+
+def decode_points(
+    encoded: str,
+    counts: Sequence[int],
+    t0: Sequence[float],
+    scale: float = DEFAULT_SCALE,
+    origins: Optional[Sequence[Tuple[float, float]]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Decode the packed points.
+
+    Args:
+        encoded: base64 of int16 (dx, dy, dt) triples
+        counts: Points per stroke
+        t0: Time of each stroke's reference point, in ms
+        scale: Coordinate units per pixel
+        origins: (x0, y0) of each stroke's reference point, in pixels
+
+    Returns:
+        (xy (N, 2) float64, t (N,) float64, offsets (S + 1,) int64)
+
+    Raises:
+        ValueError: If the data is not valid base64 or does not match counts
+    """
+    try:
+        raw = base64.b64decode(encoded, validate=True)
+    except binascii.Error as e:
+        raise ValueError(f"points is not valid base64: {e}")
+    counts = np.asarray(counts, dtype=np.int64)
+    if len(t0) != len(counts) or (counts < 0).any() or (
+        origins is not None and len(origins) != len(counts)
+    ):
+        raise ValueError("stroke headers do not match the points")
+    total = int(counts.sum())
+    if len(raw) != total * 6:
+        raise ValueError(f"points holds {len(raw) // 6} points, stroke headers declare {total}")
+
+    deltas = np.frombuffer(raw, dtype="<i2").reshape(total, 3)
+    absolute = np.cumsum(deltas, axis=0, dtype=np.int64)
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    # Restart the running sum at each stroke: subtract the total before it
+    before = np.zeros((len(counts), 3), dtype=np.int64)
+    starts = offsets[:-1]
+    nonempty = (starts > 0) & (counts > 0)
+    before[nonempty] = absolute[starts[nonempty] - 1]
+    absolute -= np.repeat(before, counts, axis=0)
+
+    xy = absolute[:, :2] / scale
+    if origins is not None and len(counts):
+        xy += np.repeat(np.asarray(origins, dtype=np.float64).reshape(-1, 2), counts, axis=0)
+    t = absolute[:, 2] + np.repeat(np.asarray(t0, dtype=np.float64), counts)
+    return xy, t, offsets
+
+
+def decode_strokes(headers: Sequence[Any], encoded: str, scale: float = DEFAULT_SCALE) -> StrokeArrays:
+    """Build StrokeArrays from compact stroke headers (with n, t0, x0, y0) and packed points."""
+    xy, t, offsets = decode_points(
+        encoded,
+        [h.n for h in headers],
+        [h.t0 for h in headers],
+        scale,
+        [(h.x0, h.y0) for h in headers],
+    )
+    return StrokeArrays(
+        xy=xy,
+        t=t,
+        offsets=offsets,
+        is_eraser=np.array([h.tool == "eraser" for h in headers], dtype=bool),
+        widths=np.array([h.width for h in headers], dtype=np.float32),
+        created_at=np.array([h.createdAt for h in headers], dtype=np.float64),
+        colors=[h.color for h in headers],
+    )
+
+
+def _carried_deltas(quantised: np.ndarray) -> np.ndarray:
+    """
+    int16 deltas between quantised points, each taken from the previously
+    decoded position so a clamped step's remainder is carried forward.
+    """
+    deltas = np.diff(quantised, axis=0, prepend=np.zeros((1, 3), dtype=np.int64))
+    if ((deltas >= _INT16.min) & (deltas <= _INT16.max)).all():
+        return deltas
+    decoded = np.zeros(3, dtype=np.int64)
+    for i, point in enumerate(quantised):
+        deltas[i] = np.clip(point - decoded, _INT16.min, _INT16.max)
+        decoded += deltas[i]
+    return deltas
+
+
+def encode_strokes(strokes: Sequence[Any], scale: float = DEFAULT_SCALE) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    Encode StrokeEvent-like objects into (stroke headers, packed points).
+
+    The reference encoder, used by the benchmark; clients implement the same
+    layout.
+    """
+    headers = []
+    chunks = []
+    for stroke in strokes:
+        points = np.array([(p.x, p.y, p.t) for p in stroke.points], dtype=np.float64)
+        if len(points):
+            x0, y0, t0 = (float(v) for v in points[0])
+            quantised = np.rint((points - (x0, y0, t0)) * (scale, scale, 1)).astype(np.int64)
+            chunks.append(_carried_deltas(quantised).astype("<i2").tobytes())
+        else:
+            x0, y0, t0 = 0.0, 0.0, float(stroke.createdAt)
+        headers.append(
+            {
+                "id": stroke.id,
+                "tool": stroke.tool,
+                "color": stroke.color,
+                "width": stroke.width,
+                "createdAt": stroke.createdAt,
+                "x0": x0,
+                "y0": y0,
+                "t0": t0,
+                "n": len(points),
+            }
+        )
+    return headers, base64.b64encode(b"".join(chunks)).decode("ascii")
@@ -0,0 +1,203 @@
+"""
+Usage accounting for LLM and external tool calls
+
+Collects the actual cost of a request (LLM tokens reported by Groq/Gemini and
+external tool invocations) into a per-request accumulator so the cost limiter
+can charge users by what their request consumed rather than by request count.
+
+Usage:
+    from services.usage_accounting import usage_scope, record_tool_call
+
+    with usage_scope() as usage:
+        ...  # any ChatGroq call with usage_callback attached is recorded
+        record_tool_call("web_search")
+    print(usage.total_cost)
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from config.settings import settings
+from utils.logger import logger
+
+
+class BudgetExceededError(Exception):
+    """Raised when work a request is about to queue would exceed the caller's budget."""
+
+    def __init__(self, required: float, available: float):
+        self.required = required
+        self.available = available
+        super().__init__(
+            f"This request needs {int(required)} budget units but only "
+            f"{max(int(available), 0)} are available"
+        )
+
+
+@dataclass
+class RequestUsage:
+    """Accumulated LLM token and tool usage for a single request."""
+
+    input_tokens: int = 0
+    output_tokens: int = 0
+    llm_calls: int = 0
+    tool_calls: Dict[str, int] = field(default_factory=dict)
+    deferred_tokens: int = 0  # Fixed price of work queued for background workers
+    budget: Optional[float] = None  # Units the caller may still spend; None if unlimited
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add_llm_usage(self, input_tokens: int, output_tokens: int) -> None:
+        with self._lock:
+            self.input_tokens += max(int(input_tokens or 0), 0)
+            self.output_tokens += max(int(output_tokens or 0), 0)
+            self.llm_calls += 1
+
+    def add_tool_call(self, name: str) -> None:
+        with self._lock:
+            self.tool_calls[name] = self.tool_calls.get(name, 0) + 1
+
+    def add_deferred(self, tokens: int) -> None:
+        with self._lock:
+            self.deferred_tokens += max(int(tokens), 0)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def total_tool_calls(self) -> int:
+        return sum(self.tool_calls.values())
+
+    @property
+    def total_cost(self) -> int:
+        """Cost in budget units: LLM tokens plus a fixed token price per tool call and deferred job."""
+        return (
+            self.total_tokens
+            + self.total_tool_calls * settings.COST_TOOL_CALL_TOKENS
+            + self.deferred_tokens
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "llm_calls": self.llm_calls,
+            "tool_calls": dict(self.tool_calls),
+            "deferred_tokens": self.deferred_tokens,
+            "total_cost": self.total_cost,
+        }
+
+
+_current_usage: ContextVar[Optional[RequestUsage]] = ContextVar(
+    "current_usage", default=None
+)
+
+
+@contextmanager
+def usage_scope() -> Iterator[RequestUsage]:
+    """Open a usage accumulator for the current request context."""
+    usage = RequestUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def get_current_usage() -> Optional[RequestUsage]:
+    """Return the accumulator of the current request, if any."""
+    return _current_usage.get()
+
+
+def record_llm_usage(input_tokens: int, output_tokens: int) -> None:
+    """Record token usage of an LLM call against the current request."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_llm_usage(input_tokens, output_tokens)
+
+
+def record_tool_call(name: str) -> None:
+    """Record an external tool invocation against the current request."""
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_tool_call(name)
+
+
+def record_deferred_work(tokens: int) -> None:
+    """
+    Charge the fixed price of a job queued for a background worker, whose own
+    LLM usage runs outside the request and cannot be charged to it.
+    """
+    usage = _current_usage.get()
+    if usage is not None:
+        usage.add_deferred(tokens)
+
+
+def check_budget(tokens: int) -> None:
+    """
+    Ensure the caller can afford `tokens` more units before queuing the work.
+
+    Raises:
+        BudgetExceededError: If the request's cost would exceed its budget
+    """
+    usage = _current_usage.get()
+    if usage is None or usage.budget is None:
+        return
+    required = usage.total_cost + tokens
+    if required > usage.budget:
+        raise BudgetExceededError(required, usage.budget)
+
+
+def record_gemini_usage(response: Any) -> None:
+    """Record token usage from a google-genai GenerateContentResponse."""
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return
+    record_llm_usage(
+        getattr(metadata, "prompt_token_count", 0) or 0,
+        getattr(metadata, "candidates_token_count", 0) or 0,
+    )
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """LangChain callback that records token usage reported by chat models."""
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        try:
+            input_tokens, output_tokens = self._extract_usage(response)
+            record_llm_usage(input_tokens, output_tokens)
+        except Exception as e:
+            logger.warning(f"Failed to record LLM usage: {e}")
+
+    @staticmethod
+    def _extract_usage(response: LLMResult):
+        # Prefer the standardised usage_metadata on the generated messages
+        input_tokens = 0
+        output_tokens = 0
+        found = False
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage_metadata = getattr(message, "usage_metadata", None)
+                if usage_metadata:
+                    input_tokens += usage_metadata.get("input_tokens", 0)
+                    output_tokens += usage_metadata.get("output_tokens", 0)
+                    found = True
+        if found:
+            return input_tokens, output_tokens
+
+        # Fall back to the provider payload (Groq reports OpenAI-style token_usage)
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        return (
+            token_usage.get("prompt_tokens", 0),
+            token_usage.get("completion_tokens", 0),
+        )
+
+
+# Shared handler attached to every chat model instance
+usage_callback = UsageCallbackHandler()
@@ -0,0 +1,93 @@
+"""
+Create the PGVector collections and ingest the knowledge base
+
+Creates the pgvector extension, the langchain tables and the collections used
+by the services (mental_health_resources, diary_entries,
+moner_canvus_sessions), then streams the documents under settings.KB_SOURCE_DIR
+(Markdown, text, HTML web exports, PDF) into mental_health_resources.
+
+Re-runs are incremental: unchanged files are skipped, only new or changed
+chunks are embedded and chunks removed from a file are deleted (see
+services/kb_ingestion.py). Run `python migrate.py` afterwards for the
+per-source lookup index, and `python manage_vector_indexes.py --create` for
+HNSW indexes.
+
+Usage:
+    python setup_vector_store.py                      # collections + knowledge_base/
+    python setup_vector_store.py --source exports/ --prune
+    python setup_vector_store.py --collections-only
+    python setup_vector_store.py --force --backend cohere   # re-embed everything
+"""
+
+import argparse
+import os
+import sys
+from langchain_postgres import PGVector
+from sqlalchemy import text
+from config.settings import settings
+from manage_vector_indexes import COLLECTIONS
+from services.database import get_sync_engine
+from services.embeddings_adapter import EMBEDDING_BACKENDS, create_embeddings
+from services.kb_ingestion import KnowledgeBaseIngestor
+from utils.logger import logger
+
+KB_COLLECTION = "mental_health_resources"
+
+
+def _collection_id(name: str) -> str:
+    with get_sync_engine().connect() as conn:
+        return str(
+            conn.execute(
+                text("SELECT uuid FROM langchain_pg_collection WHERE name = :name"),
+                {"name": name},
+            ).scalar_one()
+        )
+
+
+def setup(args) -> int:
+    # Uncached model: ingestion embeds each chunk once, caching would only evict
+    embeddings, model_name, _ = create_embeddings(args.backend)
+    logger.info(f"Embedding with {model_name}")
+
+    stores = {}
+    for name in COLLECTIONS:
+        stores[name] = PGVector(
+            embeddings=embeddings,
+            collection_name=name,
+            connection=get_sync_engine(),
+            use_jsonb=True,
+        )
+        logger.info(f"Collection {name} is ready")
+
+    if args.collections_only:
+        return 0
+    if not os.path.exists(args.source):
+        logger.warning(f"No knowledge base sources at {args.source}; nothing to ingest")
+        return 0
+
+    ingestor = KnowledgeBaseIngestor(
+        stores[KB_COLLECTION],
+        embeddings,
+        _collection_id(KB_COLLECTION),
+        chunk_size=args.chunk_size,
+        chunk_overlap=args.chunk_overlap,
+        batch_size=args.batch_size,
+        force=args.force,
+    )
+    logger.info(f"Ingesting {args.source} into {KB_COLLECTION}")
+    stats = ingestor.ingest_directory(args.source, prune=args.prune)
+    logger.info(f"Ingestion finished: {stats.summary()}")
+    return 1 if stats.files_failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create vector collections and ingest the knowledge base")
+    parser.add_argument("--source", default=settings.KB_SOURCE_DIR, help="Directory or single file")
+    parser.add_argument("--chunk-size", type=int, default=settings.KB_CHUNK_SIZE)
+    parser.add_argument("--chunk-overlap", type=int, default=settings.KB_CHUNK_OVERLAP)
+    parser.add_argument("--batch-size", type=int, default=settings.EMBEDDING_BATCH_SIZE)
+    parser.add_argument("--backend", choices=EMBEDDING_BACKENDS, default=settings.EMBEDDING_BACKEND)
+    parser.add_argument("--force", action="store_true", help="Re-embed every chunk")
+    parser.add_argument("--prune", action="store_true", help="Delete sources no longer present")
+    parser.add_argument("--collections-only", action="store_true", help="Only create the collections")
+    sys.exit(setup(parser.parse_args()))
@@ -62,6 +62,8 @@ export interface SessionMetadata {
   durationMs: number;
   usedCamera: boolean;
   clientVersion: string;
+  canvasWidth?: number; // drawing canvas size in stroke coordinates
+  canvasHeight?: number;
 }
 
 // Full payload sent to backend